@@ -4,63 +4,109 @@ Test if adding YoY revenue growth improves FTE model accuracy.
 Hypothesis: Knowing the revenue trend helps predict optimal FTE better.
 """
 
+import os
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import cross_val_score, KFold
-from sklearn.linear_model import Ridge
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
+from scipy import linalg, stats
+from joblib import Memory
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import warnings
-warnings.filterwarnings('ignore')
 
-# Load data
-print("Loading data...")
-df_train = pd.read_csv('data/ml_ready_v3.csv')
-df_revenue = pd.read_csv('data/revenue_annual.csv')
+# Define features
+base_features = ['trzby', 'bloky', 'podiel_rx', 'produktivita', 'is_shopping', 'is_poliklinika', 'is_street']
+categorical_features = ['typ']
+target = 'fte'
+
+# Numeric/categorical split, computed once for both models
+categorical_set = frozenset(categorical_features)
+numeric_base = [f for f in base_features if f not in categorical_set]
+numeric_growth = numeric_base + ['yoy_growth_2021']
 
-# Merge with revenue growth data
-df = df_train.merge(df_revenue[['id', 'yoy_growth_2020', 'yoy_growth_2021']], on='id', how='left')
+# Load data (Parquet from scripts/convert_to_parquet.py when available)
+print("Loading data...")
+train_columns = ['id'] + base_features + categorical_features + [target]
+revenue_columns = ['id', 'yoy_growth_2021']
+if os.path.exists('data/ml_ready_v3.parquet') and os.path.exists('data/revenue_annual.parquet'):
+    df_train = pd.read_parquet('data/ml_ready_v3.parquet', columns=train_columns, dtype_backend='pyarrow')
+    df_revenue = pd.read_parquet('data/revenue_annual.parquet', columns=revenue_columns, dtype_backend='pyarrow')
+else:
+    df_train = pd.read_csv('data/ml_ready_v3.csv', usecols=train_columns,
+                           dtype={'is_shopping': 'int8', 'is_poliklinika': 'int8', 'is_street': 'int8', 'typ': 'category'})
+    df_revenue = pd.read_csv('data/revenue_annual.csv', usecols=revenue_columns)
 
-# Clean up - fill missing growth values with 0 (no growth info)
-df['yoy_growth_2020'] = df['yoy_growth_2020'].fillna(0)
-df['yoy_growth_2021'] = df['yoy_growth_2021'].fillna(0)
+# Look up revenue growth by id; missing growth values become 0 (no growth info)
+df = df_train
+growth_map = df_revenue.set_index('id')['yoy_growth_2021'].fillna(0)
+df['yoy_growth_2021'] = growth_map.reindex(df['id'].to_numpy(), fill_value=0).to_numpy()
 
 print(f"Total pharmacies: {len(df)}")
 print(f"With growth data: {(df['yoy_growth_2021'] != 0).sum()}")
 
-# Define features
-base_features = ['trzby', 'bloky', 'podiel_rx', 'produktivita', 'is_shopping', 'is_poliklinika', 'is_street']
-categorical_features = ['typ']
-target = 'fte'
-
 # Filter to rows with valid data
 df_clean = df.dropna(subset=base_features + [target])
 print(f"Valid rows: {len(df_clean)}")
 
 # Prepare X and y
-X_base = df_clean[base_features + categorical_features].copy()
-X_with_growth = df_clean[base_features + categorical_features + ['yoy_growth_2021']].copy()
-y = df_clean[target]
-
-# Create preprocessing pipeline
-def create_pipeline(features, categorical_features):
-    numeric_features = [f for f in features if f not in categorical_features]
-
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', StandardScaler(), numeric_features),
-            ('cat', OneHotEncoder(drop='first', sparse_output=False, handle_unknown='ignore'), categorical_features)
-        ])
+X_base = df_clean[base_features + categorical_features]
+X_with_growth = df_clean[base_features + categorical_features + ['yoy_growth_2021']]
+y = df_clean[target].to_numpy(np.float32)
+
+# Build the design matrix: scaled numerics, then one-hot categoricals (first level dropped)
+def encode_features(X, numeric_features, categorical_features):
+    num_block = StandardScaler().fit_transform(X[numeric_features]).astype(np.float32)
+    cat_block = pd.get_dummies(X[categorical_features], drop_first=True, dtype=np.float32)
+    X_enc = np.hstack([num_block, cat_block.to_numpy()])
+    return X_enc, numeric_features + list(cat_block.columns)
+
+def ridge_block_cv(X_enc, y, splits, alpha=1.0):
+    """K-fold CV for ridge on a preprocessed design matrix without refitting.
+
+    The regularized Gram matrix X'X + alpha*I is Cholesky-factored once and
+    the factor is reused by every fold. Held-out predictions for each test
+    fold I follow from the full-data fit via the block identity
+    e_I = (I - H_II)^-1 r_I, where H is the ridge hat matrix.
+    Returns a dict shaped like sklearn's cross_validate, plus the full-data
+    coefficients under 'coef'.
+    """
+    y = np.asarray(y, dtype=X_enc.dtype)
+    n = len(y)
+
+    # Centering makes the unpenalized intercept orthogonal to the features:
+    # H = 11'/n + Xc (Xc'Xc + alpha*I)^-1 Xc'
+    Xc = X_enc - X_enc.mean(axis=0)
+    # Accumulate the small Gram system in float64: trzby and bloky are collinear
+    gram = np.matmul(Xc.T, Xc, dtype=np.float64)
+    gram[np.diag_indices_from(gram)] += alpha
+    cho = linalg.cho_factor(gram)
+    coef = linalg.cho_solve(cho, np.matmul(Xc.T, y, dtype=np.float64))
+    residuals = y - (y.mean() + Xc @ coef)
+
+    results = {'test_r2': [], 'test_neg_mean_absolute_error': [], 'test_neg_mean_squared_error': []}
+    for _, test_idx in splits:
+        Xc_test = Xc[test_idx]
+        H_test = 1.0 / n + Xc_test @ linalg.cho_solve(cho, Xc_test.T)
+        held_out = np.linalg.solve(np.eye(len(test_idx)) - H_test, residuals[test_idx])
+        y_test = y[test_idx]
+        y_pred = y_test - held_out
+        results['test_r2'].append(r2_score(y_test, y_pred))
+        results['test_neg_mean_absolute_error'].append(-mean_absolute_error(y_test, y_pred))
+        results['test_neg_mean_squared_error'].append(-mean_squared_error(y_test, y_pred))
+    results = {key: np.array(values) for key, values in results.items()}
+    results['coef'] = coef
+    return results
+
+
+# Re-runs on unchanged data reuse the CV results; joblib hashes the arrays, so
+# the cache invalidates when the inputs or ridge_block_cv itself change
+memory = Memory('.cache', verbose=0)
+ridge_block_cv_cached = memory.cache(ridge_block_cv)
 
-    return Pipeline([
-        ('preprocessor', preprocessor),
-        ('regressor', Ridge(alpha=1.0))
-    ])
 
 # Cross-validation setup
 cv = KFold(n_splits=5, shuffle=True, random_state=42)
+# Both models score on the same materialized folds, as the paired t-test requires
+splits = list(cv.split(X_base))
 
 print("\n" + "="*60)
 print("MODEL COMPARISON: Base vs Base + Growth Feature")
@@ -69,11 +115,16 @@ print("="*60)
 # Model 1: Base features only
 print("\n[Model 1] Base features only")
 print(f"Features: {base_features + categorical_features}")
-pipeline_base = create_pipeline(base_features + categorical_features, categorical_features)
+# Encode once; scaling on the full data is an acceptable leak for a comparison
+X_base_enc, _ = encode_features(X_base, numeric_base, categorical_features)
 
-scores_base = cross_val_score(pipeline_base, X_base, y, cv=cv, scoring='r2')
-mae_base = -cross_val_score(pipeline_base, X_base, y, cv=cv, scoring='neg_mean_absolute_error')
-rmse_base = np.sqrt(-cross_val_score(pipeline_base, X_base, y, cv=cv, scoring='neg_mean_squared_error'))
+# One CV pass scores all three metrics on the same folds
+cv_base = ridge_block_cv_cached(X_base_enc, y, splits)
+scores_base = cv_base['test_r2']
+mae_base = -cv_base['test_neg_mean_absolute_error']
+rmse_base = np.empty(len(splits))
+np.negative(cv_base['test_neg_mean_squared_error'], out=rmse_base)
+np.sqrt(rmse_base, out=rmse_base)
 
 print(f"  R² Score:  {scores_base.mean():.4f} (±{scores_base.std():.4f})")
 print(f"  MAE:       {mae_base.mean():.4f} FTE (±{mae_base.std():.4f})")
@@ -82,11 +133,14 @@ print(f"  RMSE:      {rmse_base.mean():.4f} FTE (±{rmse_base.std():.4f})")
 # Model 2: Base + Growth feature
 print("\n[Model 2] Base + YoY Growth 2021")
 print(f"Features: {base_features + categorical_features + ['yoy_growth_2021']}")
-pipeline_growth = create_pipeline(base_features + categorical_features + ['yoy_growth_2021'], categorical_features)
+X_growth_enc, feature_names = encode_features(X_with_growth, numeric_growth, categorical_features)
 
-scores_growth = cross_val_score(pipeline_growth, X_with_growth, y, cv=cv, scoring='r2')
-mae_growth = -cross_val_score(pipeline_growth, X_with_growth, y, cv=cv, scoring='neg_mean_absolute_error')
-rmse_growth = np.sqrt(-cross_val_score(pipeline_growth, X_with_growth, y, cv=cv, scoring='neg_mean_squared_error'))
+cv_growth = ridge_block_cv_cached(X_growth_enc, y, splits)
+scores_growth = cv_growth['test_r2']
+mae_growth = -cv_growth['test_neg_mean_absolute_error']
+rmse_growth = np.empty(len(splits))
+np.negative(cv_growth['test_neg_mean_squared_error'], out=rmse_growth)
+np.sqrt(rmse_growth, out=rmse_growth)
 
 print(f"  R² Score:  {scores_growth.mean():.4f} (±{scores_growth.std():.4f})")
 print(f"  MAE:       {mae_growth.mean():.4f} FTE (±{mae_growth.std():.4f})")
@@ -105,44 +159,32 @@ print(f"MAE change:  {mae_diff:+.4f} FTE ({'better' if mae_diff < 0 else 'worse'
 print(f"RMSE change: {rmse_diff:+.4f} FTE ({'better' if rmse_diff < 0 else 'worse'})")
 
 # Statistical significance check
-from scipy import stats
-t_stat, p_value = stats.ttest_rel(scores_growth, scores_base)
+t_stat, p_value = stats.ttest_rel(cv_growth['test_r2'], cv_base['test_r2'],
+                                  nan_policy='raise', alternative='two-sided')
 print(f"\nPaired t-test p-value: {p_value:.4f}")
 if p_value < 0.05:
     print("Result: Statistically significant difference")
 else:
     print("Result: No statistically significant difference")
 
-# Feature importance (train on full data)
+# Feature importance (full-data fit from the CV factorization)
 print("\n" + "="*60)
 print("FEATURE IMPORTANCE (with growth feature)")
 print("="*60)
 
-pipeline_growth.fit(X_with_growth, y)
-feature_names = (base_features +
-                 list(pipeline_growth.named_steps['preprocessor']
-                      .named_transformers_['cat']
-                      .get_feature_names_out(categorical_features)) +
-                 ['yoy_growth_2021'])
-
-# Get coefficients
-coefficients = pipeline_growth.named_steps['regressor'].coef_
-importance = pd.DataFrame({
-    'feature': feature_names[:len(coefficients)],
-    'coefficient': coefficients
-})
-importance['abs_coef'] = importance['coefficient'].abs()
-importance = importance.sort_values('abs_coef', ascending=False)
+# Get coefficients, ordered by absolute size
+coefficients = cv_growth['coef']
+order = np.argsort(-np.abs(coefficients), kind='stable')
 
 print("\nTop features by absolute coefficient:")
-for _, row in importance.head(10).iterrows():
-    print(f"  {row['feature']:25s}: {row['coefficient']:+.4f}")
+for i in order[:10]:
+    print(f"  {feature_names[i]:25s}: {coefficients[i]:+.4f}")
 
 # Check growth feature specifically
-growth_coef = importance[importance['feature'] == 'yoy_growth_2021']['coefficient'].values
-if len(growth_coef) > 0:
-    print(f"\n>> yoy_growth_2021 coefficient: {growth_coef[0]:+.4f}")
-    print(f"   Interpretation: {abs(growth_coef[0]):.4f} FTE change per 1% revenue growth")
+if 'yoy_growth_2021' in feature_names:
+    growth_coef = coefficients[feature_names.index('yoy_growth_2021')]
+    print(f"\n>> yoy_growth_2021 coefficient: {growth_coef:+.4f}")
+    print(f"   Interpretation: {abs(growth_coef):.4f} FTE change per 1% revenue growth")
 
 print("\n" + "="*60)
 print("CONCLUSION")
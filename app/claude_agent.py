@@ -10,19 +10,172 @@ raw files, protecting proprietary productivity calculations.
 
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator, Optional, Union
 from dataclasses import dataclass
 
+import numpy as np
+import pandas as pd
+
 # Check if SDK is available
 try:
-    from anthropic import Anthropic
+    import httpx
+    from anthropic import Anthropic, DefaultHttpxClient
+    from anthropic.lib.tools import BetaFunctionTool
     ANTHROPIC_AVAILABLE = True
 except ImportError:
     ANTHROPIC_AVAILABLE = False
     print("Warning: anthropic package not installed. Agent features disabled.")
 
-from .data_sanitizer import generate_sanitized_data
+# HTTP/2 for the API connection needs the h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Polars computes the network totals in one multi-threaded columnar
+# select; the pandas code path is the fallback
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+# orjson serializes tool results several times faster; stdlib json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# msgspec checks tool arguments against the AGENT_TOOLS schemas before
+# dispatch; without it, bad arguments surface as TypeErrors inside the tool
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+from .data_sanitizer import load_sanitized_data
+
+
+def _json_dumps(obj) -> str:
+    """Serialize to a JSON str, keeping non-ASCII text and stringifying unknown types.
+
+    DataFrame values in a top-level dict (tool row lists) are written with
+    DataFrame.to_json in one C-level pass instead of going through per-row
+    dicts; they serialize as a list of records.
+    """
+    if isinstance(obj, dict) and any(isinstance(v, pd.DataFrame) for v in obj.values()):
+        return '{' + ', '.join(
+            f'{_json_dumps(key)}: '
+            + (value.to_json(orient='records', force_ascii=False, double_precision=15)
+               if isinstance(value, pd.DataFrame) else _json_dumps(value))
+            for key, value in obj.items()
+        ) + '}'
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def _json_loads(text: str):
+    """Parse JSON; raises json.JSONDecodeError (orjson's error subclasses it)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class ToolResult(str):
+    """A tool result's JSON text that keeps the result it was serialized from.
+
+    It is the str sent to the API and stored in the caches; synthesis trims
+    .data directly instead of parsing the text back.
+    """
+
+    def __new__(cls, data):
+        text = super().__new__(cls, _json_dumps(data))
+        text.data = data
+        return text
+
+
+class _JsonObjectScanner:
+    """
+    Find the first balanced {...} object in text that arrives in chunks.
+
+    Single linear pass; braces inside JSON strings are ignored. feed()
+    returns the object text once its closing brace arrives, else None.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                # Quotes in the prose around the JSON don't open strings
+                self._in_string = self._depth > 0
+            elif c == '{':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif c == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    return text[self._start:i + 1]
+        self._pos = len(text)
+        return None
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """Return the first balanced JSON object in text, or None."""
+    return _JsonObjectScanner().feed(text)
+
+
+_http_client = None
+
+
+def _shared_http_client():
+    """Pooled HTTP client shared by every agent's Anthropic client.
+
+    Plan, worker and synthesis calls reuse kept-alive connections (one
+    multiplexed HTTP/2 connection when h2 is installed) instead of each
+    client paying its own TLS handshakes.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = DefaultHttpxClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=8)
+        )
+    return _http_client
+
+
+def _tool_call_key(tool_name: str, params: dict) -> tuple:
+    """Hashable identity of a tool call, independent of parameter order."""
+    return tool_name, json.dumps(params, sort_keys=True, default=str)
 
 
 @dataclass
@@ -36,6 +189,35 @@ class AgentConfig:
     # P2: Safety limits
     max_tool_calls: int = 10                    # Prevent infinite loops
     max_plan_steps: int = 5                     # Max steps per plan
+    max_parallel_tools: int = 4                 # Concurrent planned-step executions
+    stream_idle_timeout: float = 30.0           # Abort a stream silent for this long (s)
+    # Non-interactive jobs: route analyze_batch through the Message Batches API
+    batch_mode: bool = False
+    batch_poll_initial_delay: float = 5.0
+    batch_poll_max_delay: float = 60.0
+
+
+@dataclass
+class PharmacyStore:
+    """
+    Column-wise copy of the sanitized data for single-pharmacy lookups.
+
+    Each column is a plain list of Python values, so reading one pharmacy is
+    a dict lookup plus one index per column instead of boxing a mixed-dtype
+    DataFrame row into an object Series.
+    """
+    columns: dict      # column name -> list of values, in frame row order
+    row_of_id: dict    # pharmacy id -> row position
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'PharmacyStore':
+        columns = {col: df[col].tolist() for col in df.columns}
+        return cls(columns=columns, row_of_id={pid: i for i, pid in enumerate(columns['id'])})
+
+    def row(self, pharmacy_id: int) -> dict:
+        """Return one pharmacy as a dict; raises KeyError for unknown ids."""
+        i = self.row_of_id[pharmacy_id]
+        return {col: values[i] for col, values in self.columns.items()}
 
 
 # P3: Output Schema Validation
@@ -368,6 +550,318 @@ NESMIEŠ: vzorce, koeficienty, segmentové priemery, presné hodnoty produktivit
 
 WORKER_PROMPT = """Vykonaj nástroj a vráť výsledok. Neinterpretuj, len vráť dáta."""
 
+def _cached_system(prompt: str) -> list:
+    """System prompt as a text block marked for Anthropic prompt caching."""
+    return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+# Tool definitions sent with every worker call; built once at import
+AGENT_TOOLS = [
+    {
+        "name": "search_pharmacies",
+        "description": "Vyhľadaj lekárne podľa kritérií (mesto, typ, región, bloky). Vráti zoznam s indexovanou produktivitou.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "mesto": {
+                    "type": "string",
+                    "description": "Mesto/lokalita lekárne (case-insensitive, partial match). Napr. 'Košice', 'Bratislava', 'Levice'"
+                },
+                "typ": {
+                    "type": "string",
+                    "description": "Typ lekárne (A/B/C/D/E alebo celý názov)"
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Kód regiónu (napr. RR11, RR15)"
+                },
+                "min_bloky": {
+                    "type": "integer",
+                    "description": "Minimálny počet blokov"
+                },
+                "max_bloky": {
+                    "type": "integer",
+                    "description": "Maximálny počet blokov"
+                },
+                "understaffed_only": {
+                    "type": "boolean",
+                    "description": "Len poddimenzované lekárne (fte_gap > 0.5)"
+                },
+                "overstaffed_only": {
+                    "type": "boolean",
+                    "description": "Len naddimenzované lekárne (fte_gap < -0.5) - vhodné pre presun personálu"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet výsledkov (default 10)"
+                }
+            }
+        }
+    },
+    {
+        "name": "get_pharmacy_details",
+        "description": "Získaj detaily konkrétnej lekárne vrátane indexovanej produktivity a odporúčaného FTE.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {
+                    "type": "integer",
+                    "description": "ID lekárne"
+                }
+            },
+            "required": ["pharmacy_id"]
+        }
+    },
+    {
+        "name": "compare_to_peers",
+        "description": "Porovnaj lekáreň s podobnými prevádzkami v segmente (podobný objem blokov A tržieb ±20%). Vráti štatistiky peers a porovnanie s priemerom.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {
+                    "type": "integer",
+                    "description": "ID lekárne na porovnanie"
+                },
+                "n_peers": {
+                    "type": "integer",
+                    "description": "Počet podobných lekární (default 5)"
+                },
+                "higher_fte_only": {
+                    "type": "boolean",
+                    "description": "Len lekárne s vyšším FTE - pre hľadanie zdrojov na presun personálu"
+                }
+            },
+            "required": ["pharmacy_id"]
+        }
+    },
+    {
+        "name": "get_understaffed",
+        "description": "Získaj zoznam poddimenzovaných lekární s ohrozenými tržbami. Podporuje filtre pre mesto, región, vysoké riziko a produktivitu.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "mesto": {
+                    "type": "string",
+                    "description": "Filter podľa mesta/lokality (case-insensitive, partial match). Napr. 'Košice', 'Bratislava'"
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Filter podľa regiónu (napr. RR11)"
+                },
+                "min_gap": {
+                    "type": "number",
+                    "description": "Minimálny FTE deficit (default -0.5)"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet výsledkov (default 20)"
+                },
+                "high_risk_only": {
+                    "type": "boolean",
+                    "description": "Len lekárne s ohrozenými tržbami > 0 EUR"
+                },
+                "high_productivity_only": {
+                    "type": "boolean",
+                    "description": "Len lekárne s nadpriemernou produktivitou (index > 100)"
+                },
+                "sort_by": {
+                    "type": "string",
+                    "enum": ["fte_gap", "revenue_at_risk", "productivity"],
+                    "description": "Zoradiť podľa: fte_gap (default), revenue_at_risk, productivity"
+                }
+            }
+        }
+    },
+    {
+        "name": "get_regional_summary",
+        "description": "Získaj súhrnné štatistiky za jeden región.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "region": {
+                    "type": "string",
+                    "description": "Kód regiónu (napr. RR11, RR15)"
+                }
+            },
+            "required": ["region"]
+        }
+    },
+    {
+        "name": "get_all_regions_summary",
+        "description": "Získaj súhrnné štatistiky za VŠETKY regióny naraz. Použiť pri porovnávaní regiónov.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "sort_by": {
+                    "type": "string",
+                    "enum": ["revenue_at_risk", "productivity", "understaffed"],
+                    "description": "Zoradiť podľa: revenue_at_risk (default), productivity, understaffed"
+                }
+            }
+        }
+    },
+    {
+        "name": "generate_report",
+        "description": "Vygeneruj Markdown report s analýzou a odporúčaniami.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "title": {
+                    "type": "string",
+                    "description": "Názov reportu"
+                },
+                "pharmacy_ids": {
+                    "type": "array",
+                    "items": {"type": "integer"},
+                    "description": "Zoznam ID lekární na zahrnutie"
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Región pre súhrnné štatistiky"
+                },
+                "include_recommendations": {
+                    "type": "boolean",
+                    "description": "Zahrnúť odporúčania (default true)"
+                }
+            },
+            "required": ["title"]
+        }
+    },
+    {
+        "name": "get_segment_comparison",
+        "description": "Porovnaj výkonnosť všetkých segmentov (A-E). Vráti ohrozené tržby, FTE a produktivitu za segment.",
+        "input_schema": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "name": "get_city_summary",
+        "description": "Získaj súhrnné štatistiky za mesto s viacerými lekárňami. Zobrazí aj možnosť presunu personálu.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "mesto": {
+                    "type": "string",
+                    "description": "Názov mesta (napr. 'Košice', 'Bratislava')"
+                }
+            },
+            "required": ["mesto"]
+        }
+    },
+    {
+        "name": "get_network_overview",
+        "description": "Rýchly prehľad zdravia celej siete lekární. Celkové FTE, ohrozené tržby, % poddimenzovaných.",
+        "input_schema": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "name": "get_trend_analysis",
+        "description": "Identifikuj lekárne s významným trendom rastu/poklesu transakcií.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "trend_threshold": {
+                    "type": "number",
+                    "description": "Prahová hodnota trendu v % (default 10)"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet lekární v každej kategórii (default 20)"
+                }
+            }
+        }
+    },
+    {
+        "name": "get_priority_actions",
+        "description": "Získaj prioritizovaný zoznam akcií - kombinuje riziko, produktivitu a FTE gap. Odpoveď na 'Čo riešiť najskôr?'",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet akcií (default 10)"
+                }
+            }
+        },
+        # Prompt-cache breakpoint: caches the whole tool list as a prefix
+        "cache_control": {"type": "ephemeral"}
+    }
+]
+
+AGENT_TOOL_NAMES = frozenset(tool['name'] for tool in AGENT_TOOLS)
+
+_SCHEMA_TYPES = {'string': str, 'integer': int, 'number': float, 'boolean': bool}
+
+
+def _input_struct(tool: dict):
+    """msgspec Struct for a tool's input_schema.
+
+    Parameters keep their JSON schema type (enums are left to the tool);
+    optional ones may be null and stay UNSET when omitted, so the tool's
+    own defaults apply. Unknown parameters are rejected.
+    """
+    schema = tool['input_schema']
+    required = set(schema.get('required', []))
+    fields = []
+    for name, prop in schema.get('properties', {}).items():
+        if prop['type'] == 'array':
+            field_type = list[_SCHEMA_TYPES[prop['items']['type']]]
+        else:
+            field_type = _SCHEMA_TYPES[prop['type']]
+        if name in required:
+            fields.append((name, field_type))
+        else:
+            fields.append((name, Union[field_type, None, msgspec.UnsetType], msgspec.UNSET))
+    return msgspec.defstruct(f"{tool['name']}_input", fields, kw_only=True, forbid_unknown_fields=True)
+
+
+# Tool name -> input Struct (empty without msgspec)
+_TOOL_SCHEMAS = {tool['name']: _input_struct(tool) for tool in AGENT_TOOLS} if MSGSPEC_AVAILABLE else {}
+
+# Tool results are memoized per agent (LRU) since the tools are pure functions
+# of the loaded data; report generation is always run fresh
+TOOL_CACHE_SIZE = 128
+UNCACHED_TOOLS = frozenset({'generate_report'})
+# Tools nearly every plan calls; analyze_sync runs them into the tool cache
+# while the architect model is still planning
+PREFETCH_TOOLS = ('get_network_overview', 'get_all_regions_summary')
+
+# Columns of one get_trend_analysis row, in output order
+TREND_ROW_COLUMNS = ['id', 'mesto', 'typ', 'trend_pct', 'bloky', 'fte_actual', 'fte_gap', 'productivity_index']
+
+
+def _trend_records(rows: pd.DataFrame) -> list:
+    """Format trend analysis rows as dicts, casting and rounding column-wise."""
+    sub = rows[TREND_ROW_COLUMNS].copy()
+    int_cols = ['id', 'bloky', 'productivity_index']
+    sub[int_cols] = sub[int_cols].astype(int)
+    sub[['trend_pct', 'fte_actual', 'fte_gap']] = sub[['trend_pct', 'fte_actual', 'fte_gap']].round(1)
+    return sub.rename(columns={'trend_pct': 'bloky_trend_pct'}).to_dict('records')
+
+
+def _top_k_desc(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest values, largest first; ties keep row order.
+
+    Matches np.argsort(-values, kind='stable')[:k] but selects with an O(n)
+    np.partition and only sorts the k winners. With NaNs, or when k does not
+    cut the array, the full sorted order is returned; callers slice [:k].
+    """
+    n = len(values)
+    if not 0 < k < n or np.isnan(values).any():
+        return np.argsort(-values, kind='stable')
+    kth = np.partition(values, n - k)[n - k]  # k-th largest value
+    above = np.flatnonzero(values > kth)
+    top = np.concatenate([above, np.flatnonzero(values == kth)[:k - len(above)]])
+    return top[np.argsort(-values[top], kind='stable')]
+
+
+# One row of the generate_report pharmacy table
+REPORT_ROW_TEMPLATE = "| {id} | {mesto} | {typ} | {fte_actual:.1f} | {fte_gap:+.1f} | index {productivity_index} |"
+REPORT_ROW_COLUMNS = ['id', 'mesto', 'typ', 'fte_actual', 'fte_gap', 'productivity_index']
+
 
 class DrMaxAgent:
     """
@@ -387,25 +881,124 @@ class DrMaxAgent:
         self.config = AgentConfig()
 
         if ANTHROPIC_AVAILABLE:
-            import httpx
             # Configure longer timeouts for Cloud Run
             self.client = Anthropic(
                 timeout=httpx.Timeout(120.0, connect=30.0),
-                max_retries=2
+                max_retries=2,
+                http_client=_shared_http_client()
             )
         else:
             self.client = None
 
         # Lazy-load sanitized data (includes predictions from CSV)
         self._sanitized_df = None
+        self._region_groups = None
+        self._store = None
+        self._runner_tool_defs = None
+        # Staffing masks and network aggregates, set by _precompute_aggregates
+        self._mask_understaffed = None
+        self._mask_overstaffed = None
+        self._mask_optimal = None
+        self._mask_urgent = None
+        self._total_fte = None
+        self._weighted_prod_num = None
+        self._pl = None  # Polars copy of the sanitized data (POLARS_AVAILABLE only)
+        self._trend_pct = None  # bloky_trend in %, frame row order
+        self._trend_order = None  # row positions by ascending trend (NaN excluded)
+        self._trend_sorted = None  # _trend_pct[_trend_order]
+        self._region_stats = None  # region_code -> staffing aggregates
+        self._region_count = None
+        self._segment_breakdown = None  # typ -> pharmacy count, most common first
+        self._city_rows = {}  # get_city_summary query -> row mask
+
+        # Tool name -> bound method, built once; each AGENT_TOOLS entry maps to tool_<name>
+        self._tool_map = {name: getattr(self, f'tool_{name}') for name in AGENT_TOOL_NAMES}
+        # _tool_call_key -> result string, across analyses; cleared on data load
+        self._tool_cache = OrderedDict()
+        self._tool_cache_lock = threading.Lock()
 
     @property
     def sanitized_data(self):
-        """Lazy-load sanitized data (includes predictions from CSV)."""
+        """Lazy-load sanitized data (includes predictions from CSV).
+
+        Indexed by pharmacy id (the column is kept for output) so single
+        pharmacy lookups are hash lookups instead of full scans.
+        """
         if self._sanitized_df is None:
-            self._sanitized_df = generate_sanitized_data(self.data_path)
+            df = load_sanitized_data(self.data_path).set_index('id', drop=False).sort_index()
+            self._region_groups = {k: v for k, v in df.groupby('region_code', sort=False, observed=True)}
+            self._store = PharmacyStore.from_frame(df)
+            self._city_rows = {}
+            self._precompute_aggregates(df)
+            with self._tool_cache_lock:
+                self._tool_cache.clear()
+            self._sanitized_df = df
         return self._sanitized_df
 
+    def _precompute_aggregates(self, df: pd.DataFrame):
+        """Cache staffing masks and network totals for a freshly loaded frame.
+
+        The sanitized data never changes after loading, so the fte_gap
+        thresholds are evaluated once here as numpy bool arrays (in frame
+        row order) instead of on every tool call.
+        """
+        fte_gap = df['fte_gap'].to_numpy()
+        self._mask_understaffed = fte_gap > 0.5  # Positive gap = understaffed
+        self._mask_overstaffed = fte_gap < -0.5  # Negative gap = overstaffed
+        self._mask_optimal = (fte_gap >= -0.5) & (fte_gap <= 0.5)
+        # Urgent: understaffed + revenue at risk (same criteria as app)
+        self._mask_urgent = self._mask_understaffed & (df['revenue_at_risk_eur'].to_numpy() > 0)
+        self._total_fte = df['fte_actual'].sum()
+        self._weighted_prod_num = (df['productivity_index'] * df['fte_actual']).sum()
+        if POLARS_AVAILABLE:
+            self._pl = pl.from_pandas(df)
+        self._region_count = df['region_code'].nunique()
+        self._segment_breakdown = df['typ'].value_counts().to_dict()
+
+        # Trend analysis thresholds become binary searches on a presorted order
+        self._trend_pct = df['bloky_trend'].to_numpy() * 100
+        order = np.argsort(self._trend_pct, kind='stable')  # NaN sorts last
+        self._trend_order = order[:np.count_nonzero(~np.isnan(self._trend_pct))]
+        self._trend_sorted = self._trend_pct[self._trend_order]
+
+        # Per-region summaries come from one groupby pass instead of
+        # re-filtering each region's frame on every call
+        stats = df.assign(
+            understaffed=self._mask_understaffed,
+            overstaffed=self._mask_overstaffed,
+            urgent=self._mask_urgent,
+            urgent_risk=df['revenue_at_risk_eur'].where(self._mask_urgent, 0),
+            prod_fte=df['productivity_index'] * df['fte_actual'],
+        ).groupby('region_code', observed=True).agg(
+            pharmacy_count=('id', 'size'),
+            total_fte=('fte_actual', 'sum'),
+            total_fte_recommended=('fte_recommended', 'sum'),
+            total_bloky=('bloky', 'sum'),
+            understaffed_count=('understaffed', 'sum'),
+            overstaffed_count=('overstaffed', 'sum'),
+            urgent_count=('urgent', 'sum'),
+            urgent_risk=('urgent_risk', 'sum'),
+            prod_fte=('prod_fte', 'sum'),
+        )
+        self._region_stats = stats.sort_index().to_dict('index')
+        for region, region_df in df.groupby('region_code', observed=True):
+            # astype(str): categorical value_counts would list absent types too
+            self._region_stats[region]['types'] = region_df['typ'].astype(str).value_counts().to_dict()
+
+    @property
+    def store(self) -> PharmacyStore:
+        """Column store of the sanitized data, built once at load time."""
+        if self._store is None:
+            self.sanitized_data
+        return self._store
+
+    @property
+    def region_groups(self):
+        """Sanitized data split by region_code, built once at load time."""
+        if self._region_groups is None:
+            self.sanitized_data
+        return self._region_groups
+
     # === TOOL IMPLEMENTATIONS ===
 
     def tool_search_pharmacies(
@@ -427,43 +1020,48 @@ class DrMaxAgent:
             max_bloky = int(max_bloky)
         limit = int(limit) if limit is not None else 10
 
-        df = self.sanitized_data.copy()
+        df = self.sanitized_data
 
-        if mesto:
-            df = df[df['mesto'].str.contains(mesto, case=False, na=False)]
-        if typ:
-            df = df[df['typ'].str.contains(typ, case=False)]
-        if region:
-            df = df[df['region_code'] == region]
-        if min_bloky:
-            df = df[df['bloky'] >= min_bloky]
-        if max_bloky:
-            df = df[df['bloky'] <= max_bloky]
-        if understaffed_only:
-            df = df[df['fte_gap'] > 0.5]  # Positive gap = understaffed (need more FTE)
-        if overstaffed_only:
-            df = df[df['fte_gap'] < -0.5]  # Negative gap = overstaffed (excess FTE)
+        # Combine all filters into one mask, then filter once; "top N" queries
+        # without any filter skip the mask and just take the head
+        if mesto or typ or region or min_bloky or max_bloky or understaffed_only or overstaffed_only:
+            mask = np.ones(len(df), dtype=bool)
+            if mesto:
+                mask &= df['mesto'].str.contains(mesto, case=False, na=False).to_numpy()
+            if typ:
+                # Match against the few segment names, not every row
+                segments = pd.Series(df['typ'].unique())
+                mask &= df['typ'].isin(segments[segments.str.contains(typ, case=False)]).to_numpy()
+            if region:
+                mask &= (df['region_code'] == region).to_numpy()
+            if min_bloky:
+                mask &= (df['bloky'] >= min_bloky).to_numpy()
+            if max_bloky:
+                mask &= (df['bloky'] <= max_bloky).to_numpy()
+            if understaffed_only:
+                mask &= self._mask_understaffed  # Positive gap = understaffed (need more FTE)
+            if overstaffed_only:
+                mask &= self._mask_overstaffed  # Negative gap = overstaffed (excess FTE)
+
+            df = df[mask]
 
         df = df.head(limit)
 
-        # P3: Validate output schema
+        # P3: Validate output schema (rows stay a DataFrame until execute_tool serializes them)
         return validate_pharmacy_list_output({
             'count': len(df),
-            'pharmacies': df.to_dict('records')
+            'pharmacies': df
         })
 
     def tool_get_pharmacy_details(self, pharmacy_id: int) -> dict:
         """Get details for a specific pharmacy."""
         # Ensure pharmacy_id is int (AI might pass string)
         pharmacy_id = int(pharmacy_id)
-        df = self.sanitized_data
-        pharmacy = df[df['id'] == pharmacy_id]
-
-        if pharmacy.empty:
+        try:
+            result = self.store.row(pharmacy_id)
+        except KeyError:
             return {'error': f'Pharmacy {pharmacy_id} not found'}
 
-        result = pharmacy.iloc[0].to_dict()
-
         # Round FTE values for clarity (avoid AI confusion from long decimals)
         result['fte_actual'] = round(result.get('fte_actual', 0), 1)
         result['fte_F'] = round(result.get('fte_F', 0), 1)
@@ -506,11 +1104,11 @@ class DrMaxAgent:
         df = self.sanitized_data
 
         # Get target pharmacy
-        target = df[df['id'] == pharmacy_id]
-        if target.empty:
+        try:
+            target = self.store.row(pharmacy_id)
+        except KeyError:
             return {'error': f'Pharmacy {pharmacy_id} not found'}
 
-        target = target.iloc[0]
         target_bloky = target['bloky']
         target_trzby = target['trzby']
 
@@ -615,7 +1213,7 @@ class DrMaxAgent:
         # Ensure types (AI might pass strings)
         min_gap = float(min_gap) if min_gap is not None else -0.5
         limit = int(limit) if limit is not None else 20
-        df = self.sanitized_data.copy()
+        df = self.sanitized_data
 
         # Filter understaffed (positive gap = understaffed)
         # Note: min_gap parameter is now interpreted as minimum positive gap
@@ -649,65 +1247,53 @@ class DrMaxAgent:
         return validate_pharmacy_list_output({
             'count': len(df),
             'total_revenue_at_risk_eur': int(df['revenue_at_risk_eur'].sum()),
-            'pharmacies': df.head(limit).to_dict('records')
+            'pharmacies': df.head(limit)
         })
 
     def tool_get_regional_summary(self, region: str) -> dict:
         """Get summary statistics for a region."""
-        df = self.sanitized_data
-        region_df = df[df['region_code'] == region]
+        self.sanitized_data
+        stats = self._region_stats.get(region)
 
-        if region_df.empty:
+        if stats is None:
             return {'error': f'Region {region} not found'}
 
-        understaffed = region_df[region_df['fte_gap'] > 0.5]  # Positive gap = understaffed
-        overstaffed = region_df[region_df['fte_gap'] < -0.5]  # Negative gap = overstaffed
-        # Urgent: understaffed + revenue at risk (same criteria as app)
-        urgent = region_df[(region_df['fte_gap'] > 0.5) & (region_df['revenue_at_risk_eur'] > 0)]
-
         # FTE-weighted productivity
-        total_fte = region_df['fte_actual'].sum()
-        weighted_prod = (region_df['productivity_index'] * region_df['fte_actual']).sum() / total_fte if total_fte > 0 else 100
+        total_fte = stats['total_fte']
+        weighted_prod = stats['prod_fte'] / total_fte if total_fte > 0 else 100
 
         return {
             'region': region,
-            'pharmacy_count': len(region_df),
-            'total_fte': round(region_df['fte_actual'].sum(), 1),
-            'total_bloky': int(region_df['bloky'].sum()),
-            'understaffed_count': len(understaffed),
-            'overstaffed_count': len(overstaffed),
-            'urgent_count': len(urgent),  # Matches app's urgent criteria
-            'total_revenue_at_risk_eur': int(urgent['revenue_at_risk_eur'].sum()),
+            'pharmacy_count': int(stats['pharmacy_count']),
+            'total_fte': round(total_fte, 1),
+            'total_bloky': int(stats['total_bloky']),
+            'understaffed_count': int(stats['understaffed_count']),
+            'overstaffed_count': int(stats['overstaffed_count']),
+            'urgent_count': int(stats['urgent_count']),  # Matches app's urgent criteria
+            'total_revenue_at_risk_eur': int(stats['urgent_risk']),
             'avg_productivity_index': int(weighted_prod),  # FTE-weighted
-            'types': region_df['typ'].value_counts().to_dict()
+            'types': dict(stats['types'])
         }
 
     def tool_get_all_regions_summary(self, sort_by: str = 'revenue_at_risk') -> dict:
         """Get summary statistics for ALL regions at once."""
-        df = self.sanitized_data
-        regions = df['region_code'].unique()
+        self.sanitized_data
 
         summaries = []
-        for region in sorted(regions):
-            region_df = df[df['region_code'] == region]
-            understaffed = region_df[region_df['fte_gap'] > 0.5]  # Positive gap = understaffed
-            overstaffed = region_df[region_df['fte_gap'] < -0.5]  # Negative gap = overstaffed
-            # Urgent: understaffed + revenue at risk (same criteria as app)
-            urgent = region_df[(region_df['fte_gap'] > 0.5) & (region_df['revenue_at_risk_eur'] > 0)]
-
+        for region, stats in self._region_stats.items():
             # FTE-weighted productivity
-            total_fte = region_df['fte_actual'].sum()
-            weighted_prod = (region_df['productivity_index'] * region_df['fte_actual']).sum() / total_fte if total_fte > 0 else 100
+            total_fte = stats['total_fte']
+            weighted_prod = stats['prod_fte'] / total_fte if total_fte > 0 else 100
 
             summaries.append({
                 'region': region,
-                'pharmacy_count': len(region_df),
-                'total_fte_actual': round(region_df['fte_actual'].sum(), 1),
-                'total_fte_recommended': round(region_df['fte_recommended'].sum(), 1),
-                'understaffed_count': len(understaffed),
-                'overstaffed_count': len(overstaffed),
-                'urgent_count': len(urgent),  # Matches app's urgent criteria
-                'revenue_at_risk_eur': int(urgent['revenue_at_risk_eur'].sum()),
+                'pharmacy_count': int(stats['pharmacy_count']),
+                'total_fte_actual': round(total_fte, 1),
+                'total_fte_recommended': round(stats['total_fte_recommended'], 1),
+                'understaffed_count': int(stats['understaffed_count']),
+                'overstaffed_count': int(stats['overstaffed_count']),
+                'urgent_count': int(stats['urgent_count']),  # Matches app's urgent criteria
+                'revenue_at_risk_eur': int(stats['urgent_risk']),
                 'avg_productivity_index': int(weighted_prod)  # FTE-weighted
             })
 
@@ -754,15 +1340,11 @@ class DrMaxAgent:
             lines.append("| ID | Mesto | Typ | FTE | Rozdiel | Produktivita |")
             lines.append("|---|---|---|---|---|---|")
 
-            for pid in pharmacy_ids:
-                p = self.tool_get_pharmacy_details(pid)
-                if 'error' not in p:
-                    lines.append(
-                        f"| {p['id']} | {p['mesto']} | {p['typ']} | "
-                        f"{p.get('fte_actual', 0):.1f} | "
-                        f"{p.get('fte_gap', 0):+.1f} | "
-                        f"index {p['productivity_index']} |"
-                    )
+            # One .loc gather for all rows; unknown ids are skipped
+            ids = [int(pid) for pid in pharmacy_ids]
+            known_ids = [pid for pid in ids if pid in self.store.row_of_id]
+            rows = self.sanitized_data.loc[known_ids, REPORT_ROW_COLUMNS]
+            lines.extend(REPORT_ROW_TEMPLATE.format_map(p) for p in rows.to_dict('records'))
             lines.append("")
 
         if include_recommendations:
@@ -832,15 +1414,21 @@ class DrMaxAgent:
     def tool_get_city_summary(self, mesto: str) -> dict:
         """Get aggregate statistics for a city with multiple pharmacies."""
         df = self.sanitized_data
-        city_df = df[df['mesto'].str.contains(mesto, case=False, na=False)]
+        # Repeated city lookups (plan steps, follow-up questions) reuse the match
+        in_city = self._city_rows.get(mesto)
+        if in_city is None:
+            in_city = df['mesto'].str.contains(mesto, case=False, na=False).to_numpy()
+            if len(self._city_rows) >= 256:
+                self._city_rows.clear()
+            self._city_rows[mesto] = in_city
+        city_df = df[in_city]
 
         if city_df.empty:
             return {'error': f'No pharmacies found in city: {mesto}'}
 
-        understaffed = city_df[city_df['fte_gap'] > 0.5]  # Positive gap = understaffed
-        overstaffed = city_df[city_df['fte_gap'] < -0.5]  # Negative gap = overstaffed
-        # Urgent: understaffed + revenue at risk (same criteria as app)
-        urgent = city_df[(city_df['fte_gap'] > 0.5) & (city_df['revenue_at_risk_eur'] > 0)]
+        understaffed_count = int(np.count_nonzero(in_city & self._mask_understaffed))
+        overstaffed_count = int(np.count_nonzero(in_city & self._mask_overstaffed))
+        urgent = in_city & self._mask_urgent
 
         # Get list of pharmacies in the city
         pharmacies = []
@@ -866,49 +1454,58 @@ class DrMaxAgent:
             'total_fte_actual': round(city_df['fte_actual'].sum(), 1),
             'total_fte_recommended': round(city_df['fte_recommended'].sum(), 1),
             'total_fte_gap': round(city_df['fte_gap'].sum(), 1),
-            'understaffed_count': len(understaffed),
-            'overstaffed_count': len(overstaffed),
-            'urgent_count': len(urgent),  # Matches app's urgent criteria
-            'total_revenue_at_risk_eur': int(urgent['revenue_at_risk_eur'].sum()),
+            'understaffed_count': understaffed_count,
+            'overstaffed_count': overstaffed_count,
+            'urgent_count': int(np.count_nonzero(urgent)),  # Matches app's urgent criteria
+            'total_revenue_at_risk_eur': int(df['revenue_at_risk_eur'].to_numpy()[urgent].sum()),
             'avg_productivity_index': int(weighted_prod),  # FTE-weighted
             'pharmacies': pharmacies,
-            'transfer_possible': len(understaffed) > 0 and len(overstaffed) > 0
+            'transfer_possible': understaffed_count > 0 and overstaffed_count > 0
         }
 
     def tool_get_network_overview(self) -> dict:
         """Get quick health snapshot of the entire pharmacy network."""
         df = self.sanitized_data
 
-        understaffed = df[df['fte_gap'] > 0.5]  # Positive gap = understaffed
-        overstaffed = df[df['fte_gap'] < -0.5]  # Negative gap = overstaffed
-        optimal = df[(df['fte_gap'] >= -0.5) & (df['fte_gap'] <= 0.5)]
-
-        # Urgent: understaffed > 0.5 FTE + revenue at risk (same criteria as app)
-        # This matches server.py lines 745-754
-        urgent = df[(df['fte_gap'] > 0.5) & (df['revenue_at_risk_eur'] > 0)]
+        # Masks are precomputed at load time (see _precompute_aggregates);
+        # urgent matches server.py lines 745-754
+        understaffed_count = int(np.count_nonzero(self._mask_understaffed))
+        overstaffed_count = int(np.count_nonzero(self._mask_overstaffed))
+        optimal_count = int(np.count_nonzero(self._mask_optimal))
 
         # FTE-weighted productivity
-        total_fte = df['fte_actual'].sum()
-        weighted_prod = (df['productivity_index'] * df['fte_actual']).sum() / total_fte if total_fte > 0 else 100
+        total_fte = self._total_fte
+        weighted_prod = self._weighted_prod_num / total_fte if total_fte > 0 else 100
+
+        if self._pl is not None:
+            # One Polars select computes the remaining aggregates in a single pass
+            totals = self._pl.select(
+                pl.col('fte_recommended', 'fte_gap').sum(),
+                pl.col('bloky', 'trzby').cast(pl.Float64).sum(),
+            ).row(0, named=True)
+        else:
+            # One columnar reduction instead of a pass per column
+            totals = df[['fte_recommended', 'fte_gap', 'bloky', 'trzby']].sum().to_dict()
 
         return {
             'total_pharmacies': len(df),
-            'total_fte_actual': round(df['fte_actual'].sum(), 1),
-            'total_fte_recommended': round(df['fte_recommended'].sum(), 1),
-            'total_fte_gap': round(df['fte_gap'].sum(), 1),
-            'understaffed_count': len(understaffed),
-            'overstaffed_count': len(overstaffed),
-            'optimal_count': len(optimal),
-            'understaffed_pct': round(len(understaffed) / len(df) * 100, 1),
-            'overstaffed_pct': round(len(overstaffed) / len(df) * 100, 1),
-            'optimal_pct': round(len(optimal) / len(df) * 100, 1),
-            'total_revenue_at_risk_eur': int(urgent['revenue_at_risk_eur'].sum()),
-            'urgent_count': len(urgent),
+            'total_fte_actual': round(total_fte, 1),
+            'total_fte_recommended': round(totals['fte_recommended'], 1),
+            'total_fte_gap': round(totals['fte_gap'], 1),
+            'understaffed_count': understaffed_count,
+            'overstaffed_count': overstaffed_count,
+            'optimal_count': optimal_count,
+            'understaffed_pct': round(understaffed_count / len(df) * 100, 1),
+            'overstaffed_pct': round(overstaffed_count / len(df) * 100, 1),
+            'optimal_pct': round(optimal_count / len(df) * 100, 1),
+            'total_revenue_at_risk_eur': int(df['revenue_at_risk_eur'].to_numpy()[self._mask_urgent].sum()),
+            'urgent_count': int(np.count_nonzero(self._mask_urgent)),
             'avg_productivity_index': int(weighted_prod),  # FTE-weighted
-            'total_bloky': int(df['bloky'].sum()),
-            'total_trzby': int(df['trzby'].sum()),
-            'region_count': df['region_code'].nunique(),
-            'segment_breakdown': df['typ'].value_counts().to_dict()
+            'total_bloky': int(totals['bloky']),
+            'total_trzby': int(totals['trzby']),
+            'region_count': self._region_count,
+            # Copy so callers never mutate the load-time dict
+            'segment_breakdown': dict(self._segment_breakdown)
         }
 
     def tool_get_trend_analysis(self, trend_threshold: float = 10.0, limit: int = 20) -> dict:
@@ -917,37 +1514,31 @@ class DrMaxAgent:
         trend_threshold = float(trend_threshold) if trend_threshold else 10.0
         limit = int(limit) if limit else 20
 
-        df = self.sanitized_data.copy()
+        df = self.sanitized_data
 
-        # Convert bloky_trend to percentage if needed (stored as decimal)
-        df['trend_pct'] = df['bloky_trend'] * 100
+        # bloky_trend is stored as a decimal; _trend_sorted holds it in %, ascending
+        trend_sorted = self._trend_sorted
+        # Growing: trend >= threshold, i.e. the tail of the ascending order
+        growing_count = len(trend_sorted) - int(np.searchsorted(trend_sorted, trend_threshold, side='left'))
+        # Declining: trend <= -threshold, i.e. the head of the ascending order
+        declining_count = int(np.searchsorted(trend_sorted, -trend_threshold, side='right'))
 
-        # Growing pharmacies (positive trend above threshold)
-        growing = df[df['trend_pct'] >= trend_threshold].copy()
-        growing = growing.sort_values('trend_pct', ascending=False)
+        order = self._trend_order
+        growing_rows = order[len(order) - growing_count:][::-1][:limit]
+        declining_rows = order[:min(declining_count, limit)]
 
-        # Declining pharmacies (negative trend below -threshold)
-        declining = df[df['trend_pct'] <= -trend_threshold].copy()
-        declining = declining.sort_values('trend_pct')
+        def trend_rows(rows):
+            return df.iloc[rows].assign(trend_pct=self._trend_pct[rows])
 
-        def format_pharmacy(row):
-            return {
-                'id': int(row['id']),
-                'mesto': row['mesto'],
-                'typ': row['typ'],
-                'bloky_trend_pct': round(row['trend_pct'], 1),
-                'bloky': int(row['bloky']),
-                'fte_actual': round(row['fte_actual'], 1),
-                'fte_gap': round(row['fte_gap'], 1),
-                'productivity_index': int(row['productivity_index'])
-            }
+        growing_pharmacies = _trend_records(trend_rows(growing_rows))
+        declining_pharmacies = _trend_records(trend_rows(declining_rows))
 
         return {
             'threshold_pct': trend_threshold,
-            'growing_count': len(growing),
-            'declining_count': len(declining),
-            'growing_pharmacies': [format_pharmacy(row) for _, row in growing.head(limit).iterrows()],
-            'declining_pharmacies': [format_pharmacy(row) for _, row in declining.head(limit).iterrows()],
+            'growing_count': growing_count,
+            'declining_count': declining_count,
+            'growing_pharmacies': growing_pharmacies,
+            'declining_pharmacies': declining_pharmacies,
             'recommendation': (
                 'Rastúce lekárne môžu potrebovať navýšenie FTE. '
                 'Klesajúce lekárne zvážiť pre optimalizáciu personálu.'
@@ -957,11 +1548,11 @@ class DrMaxAgent:
     def tool_get_priority_actions(self, limit: int = 10) -> dict:
         """Get prioritized action list combining risk, productivity, and FTE gap."""
         limit = int(limit) if limit else 10
-        df = self.sanitized_data.copy()
+        df = self.sanitized_data
 
         # Only consider understaffed pharmacies with revenue at risk
         # Positive gap = understaffed (need more FTE)
-        candidates = df[(df['fte_gap'] > 0.5) & (df['revenue_at_risk_eur'] > 0)].copy()
+        candidates = df[self._mask_urgent]
 
         if candidates.empty:
             return {
@@ -972,47 +1563,47 @@ class DrMaxAgent:
 
         # Priority score: higher = more urgent
         # Factors: revenue at risk (normalized), productivity (above avg = higher), FTE gap magnitude
-        max_risk = candidates['revenue_at_risk_eur'].max()
-        candidates['risk_score'] = candidates['revenue_at_risk_eur'] / max_risk * 40  # 0-40 points
+        # Scores are local arrays; the urgent slice itself is only read
+        risk = candidates['revenue_at_risk_eur'].to_numpy(dtype=float)
+        risk_score = risk / risk.max() * 40  # 0-40 points
 
         # Productivity bonus: above average gets points
-        candidates['prod_score'] = ((candidates['productivity_index'] - 100) / 20).clip(0, 30)  # 0-30 points
+        prod_score = np.clip((candidates['productivity_index'].to_numpy(dtype=float) - 100) / 20, 0, 30)  # 0-30 points
 
         # FTE gap magnitude: bigger gap = more urgent (positive gap = understaffed)
-        max_gap = candidates['fte_gap'].max()
-        candidates['gap_score'] = (candidates['fte_gap'] / max_gap) * 30 if max_gap > 0 else 0  # 0-30 points
-
-        candidates['priority_score'] = (
-            candidates['risk_score'] +
-            candidates['prod_score'] +
-            candidates['gap_score']
+        gap = candidates['fte_gap'].to_numpy(dtype=float)
+        max_gap = gap.max()
+        gap_score = gap / max_gap * 30 if max_gap > 0 else 0  # 0-30 points
+
+        priority_score = risk_score + prod_score + gap_score
+
+        # Highest priority first; only the selected rows are materialized
+        order = _top_k_desc(priority_score, limit)[:limit]
+
+        # Project and round column-wise, then convert to dicts in one call
+        top = candidates.iloc[order]
+        score = pd.Series(priority_score[order], index=top.index)
+        actions_df = pd.DataFrame({
+            'priority': np.select([score >= 70, score >= 50], ['URGENTNÉ', 'VYSOKÁ'], 'STREDNÁ'),
+            'priority_score': score.round(0),
+            'id': top['id'].astype(int),
+            'mesto': top['mesto'],
+            'typ': top['typ'],
+            'fte_gap': top['fte_gap'].round(1),
+            'fte_needed': top['fte_gap'].abs().round(1),
+            'revenue_at_risk_eur': top['revenue_at_risk_eur'].astype(int),
+            'productivity_index': top['productivity_index'].astype(int),
+        })
+        actions_df['action'] = (
+            'Pridať ' + top['fte_gap'].abs().map('{:.1f}'.format).astype(str)
+            + ' FTE, ohrozené €' + actions_df['revenue_at_risk_eur'].map('{:,}'.format).astype(str)
         )
-
-        # Sort by priority score
-        candidates = candidates.sort_values('priority_score', ascending=False)
-
-        actions = []
-        for _, row in candidates.head(limit).iterrows():
-            action_type = 'URGENTNÉ' if row['priority_score'] >= 70 else (
-                'VYSOKÁ' if row['priority_score'] >= 50 else 'STREDNÁ'
-            )
-            actions.append({
-                'priority': action_type,
-                'priority_score': round(row['priority_score'], 0),
-                'id': int(row['id']),
-                'mesto': row['mesto'],
-                'typ': row['typ'],
-                'fte_gap': round(row['fte_gap'], 1),
-                'fte_needed': round(abs(row['fte_gap']), 1),
-                'revenue_at_risk_eur': int(row['revenue_at_risk_eur']),
-                'productivity_index': int(row['productivity_index']),
-                'action': f"Pridať {abs(row['fte_gap']):.1f} FTE, ohrozené €{int(row['revenue_at_risk_eur']):,}"
-            })
+        actions = actions_df.to_dict('records')
 
         return {
             'count': len(actions),
-            'total_fte_needed': round(sum(a['fte_needed'] for a in actions), 1),
-            'total_revenue_at_risk_eur': sum(a['revenue_at_risk_eur'] for a in actions),
+            'total_fte_needed': round(actions_df['fte_needed'].sum(), 1),
+            'total_revenue_at_risk_eur': int(actions_df['revenue_at_risk_eur'].sum()),
             'actions': actions
         }
 
@@ -1020,271 +1611,55 @@ class DrMaxAgent:
 
     def get_tools(self) -> list:
         """Return tool definitions for Claude API."""
-        return [
-            {
-                "name": "search_pharmacies",
-                "description": "Vyhľadaj lekárne podľa kritérií (mesto, typ, región, bloky). Vráti zoznam s indexovanou produktivitou.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "mesto": {
-                            "type": "string",
-                            "description": "Mesto/lokalita lekárne (case-insensitive, partial match). Napr. 'Košice', 'Bratislava', 'Levice'"
-                        },
-                        "typ": {
-                            "type": "string",
-                            "description": "Typ lekárne (A/B/C/D/E alebo celý názov)"
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Kód regiónu (napr. RR11, RR15)"
-                        },
-                        "min_bloky": {
-                            "type": "integer",
-                            "description": "Minimálny počet blokov"
-                        },
-                        "max_bloky": {
-                            "type": "integer",
-                            "description": "Maximálny počet blokov"
-                        },
-                        "understaffed_only": {
-                            "type": "boolean",
-                            "description": "Len poddimenzované lekárne (fte_gap > 0.5)"
-                        },
-                        "overstaffed_only": {
-                            "type": "boolean",
-                            "description": "Len naddimenzované lekárne (fte_gap < -0.5) - vhodné pre presun personálu"
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet výsledkov (default 10)"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "get_pharmacy_details",
-                "description": "Získaj detaily konkrétnej lekárne vrátane indexovanej produktivity a odporúčaného FTE.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {
-                            "type": "integer",
-                            "description": "ID lekárne"
-                        }
-                    },
-                    "required": ["pharmacy_id"]
-                }
-            },
-            {
-                "name": "compare_to_peers",
-                "description": "Porovnaj lekáreň s podobnými prevádzkami v segmente (podobný objem blokov A tržieb ±20%). Vráti štatistiky peers a porovnanie s priemerom.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {
-                            "type": "integer",
-                            "description": "ID lekárne na porovnanie"
-                        },
-                        "n_peers": {
-                            "type": "integer",
-                            "description": "Počet podobných lekární (default 5)"
-                        },
-                        "higher_fte_only": {
-                            "type": "boolean",
-                            "description": "Len lekárne s vyšším FTE - pre hľadanie zdrojov na presun personálu"
-                        }
-                    },
-                    "required": ["pharmacy_id"]
-                }
-            },
-            {
-                "name": "get_understaffed",
-                "description": "Získaj zoznam poddimenzovaných lekární s ohrozenými tržbami. Podporuje filtre pre mesto, región, vysoké riziko a produktivitu.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "mesto": {
-                            "type": "string",
-                            "description": "Filter podľa mesta/lokality (case-insensitive, partial match). Napr. 'Košice', 'Bratislava'"
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Filter podľa regiónu (napr. RR11)"
-                        },
-                        "min_gap": {
-                            "type": "number",
-                            "description": "Minimálny FTE deficit (default -0.5)"
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet výsledkov (default 20)"
-                        },
-                        "high_risk_only": {
-                            "type": "boolean",
-                            "description": "Len lekárne s ohrozenými tržbami > 0 EUR"
-                        },
-                        "high_productivity_only": {
-                            "type": "boolean",
-                            "description": "Len lekárne s nadpriemernou produktivitou (index > 100)"
-                        },
-                        "sort_by": {
-                            "type": "string",
-                            "enum": ["fte_gap", "revenue_at_risk", "productivity"],
-                            "description": "Zoradiť podľa: fte_gap (default), revenue_at_risk, productivity"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "get_regional_summary",
-                "description": "Získaj súhrnné štatistiky za jeden región.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "region": {
-                            "type": "string",
-                            "description": "Kód regiónu (napr. RR11, RR15)"
-                        }
-                    },
-                    "required": ["region"]
-                }
-            },
-            {
-                "name": "get_all_regions_summary",
-                "description": "Získaj súhrnné štatistiky za VŠETKY regióny naraz. Použiť pri porovnávaní regiónov.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "sort_by": {
-                            "type": "string",
-                            "enum": ["revenue_at_risk", "productivity", "understaffed"],
-                            "description": "Zoradiť podľa: revenue_at_risk (default), productivity, understaffed"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "generate_report",
-                "description": "Vygeneruj Markdown report s analýzou a odporúčaniami.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "title": {
-                            "type": "string",
-                            "description": "Názov reportu"
-                        },
-                        "pharmacy_ids": {
-                            "type": "array",
-                            "items": {"type": "integer"},
-                            "description": "Zoznam ID lekární na zahrnutie"
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Región pre súhrnné štatistiky"
-                        },
-                        "include_recommendations": {
-                            "type": "boolean",
-                            "description": "Zahrnúť odporúčania (default true)"
-                        }
-                    },
-                    "required": ["title"]
-                }
-            },
-            {
-                "name": "get_segment_comparison",
-                "description": "Porovnaj výkonnosť všetkých segmentov (A-E). Vráti ohrozené tržby, FTE a produktivitu za segment.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {}
-                }
-            },
-            {
-                "name": "get_city_summary",
-                "description": "Získaj súhrnné štatistiky za mesto s viacerými lekárňami. Zobrazí aj možnosť presunu personálu.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "mesto": {
-                            "type": "string",
-                            "description": "Názov mesta (napr. 'Košice', 'Bratislava')"
-                        }
-                    },
-                    "required": ["mesto"]
-                }
-            },
-            {
-                "name": "get_network_overview",
-                "description": "Rýchly prehľad zdravia celej siete lekární. Celkové FTE, ohrozené tržby, % poddimenzovaných.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {}
-                }
-            },
-            {
-                "name": "get_trend_analysis",
-                "description": "Identifikuj lekárne s významným trendom rastu/poklesu transakcií.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "trend_threshold": {
-                            "type": "number",
-                            "description": "Prahová hodnota trendu v % (default 10)"
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet lekární v každej kategórii (default 20)"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "get_priority_actions",
-                "description": "Získaj prioritizovaný zoznam akcií - kombinuje riziko, produktivitu a FTE gap. Odpoveď na 'Čo riešiť najskôr?'",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet akcií (default 10)"
-                        }
-                    }
-                }
-            }
-        ]
+        return AGENT_TOOLS
 
     def execute_tool(self, tool_name: str, tool_input: dict, request_id: str = '') -> str:
         """Execute a tool and return result as string."""
-        import time
         start_time = time.time()
 
-        tool_map = {
-            'search_pharmacies': self.tool_search_pharmacies,
-            'get_pharmacy_details': self.tool_get_pharmacy_details,
-            'compare_to_peers': self.tool_compare_to_peers,
-            'get_understaffed': self.tool_get_understaffed,
-            'get_regional_summary': self.tool_get_regional_summary,
-            'get_all_regions_summary': self.tool_get_all_regions_summary,
-            'generate_report': self.tool_generate_report,
-            'get_segment_comparison': self.tool_get_segment_comparison,
-            'get_city_summary': self.tool_get_city_summary,
-            'get_network_overview': self.tool_get_network_overview,
-            'get_trend_analysis': self.tool_get_trend_analysis,
-            'get_priority_actions': self.tool_get_priority_actions
-        }
-
-        if tool_name not in tool_map:
+        tool = self._tool_map.get(tool_name)
+        if tool is None:
             print(f"[{request_id}] TOOL_ERROR: Unknown tool {tool_name}")
             return json.dumps({'error': f'Unknown tool: {tool_name}'})
 
+        schema = _TOOL_SCHEMAS.get(tool_name)
+        if schema is not None:
+            # Reject malformed calls before the tool touches the data;
+            # lax mode still accepts numbers and booleans sent as strings
+            try:
+                validated = msgspec.convert(tool_input, schema, strict=False)
+            except msgspec.ValidationError as e:
+                print(f"[{request_id}] TOOL_ERROR: {tool_name} invalid params: {e}")
+                return json.dumps({'error': 'Invalid tool parameters'})
+            tool_input = {
+                name: getattr(validated, name) for name in schema.__struct_fields__
+                if getattr(validated, name) is not msgspec.UNSET
+            }
+
+        cache_key = None
+        if tool_name not in UNCACHED_TOOLS:
+            cache_key = _tool_call_key(tool_name, tool_input)
+            with self._tool_cache_lock:
+                cached = self._tool_cache.get(cache_key)
+                if cached is not None:
+                    self._tool_cache.move_to_end(cache_key)
+            if cached is not None:
+                print(f"[{request_id}] TOOL_OK: {tool_name} | cached | {len(cached)} chars")
+                return cached
+
         try:
-            result = tool_map[tool_name](**tool_input)
+            result = tool(**tool_input)
             duration = time.time() - start_time
 
             # P2: Audit logging
-            result_str = json.dumps(result, ensure_ascii=False, default=str)
+            result_str = ToolResult(result)
             print(f"[{request_id}] TOOL_OK: {tool_name} | {duration:.2f}s | {len(result_str)} chars")
 
+            if cache_key is not None:
+                with self._tool_cache_lock:
+                    self._tool_cache[cache_key] = result_str
+                    if len(self._tool_cache) > TOOL_CACHE_SIZE:
+                        self._tool_cache.popitem(last=False)
             return result_str
 
         except TypeError as e:
@@ -1302,6 +1677,180 @@ class DrMaxAgent:
             print(f"[{request_id}] TOOL_ERROR: {tool_name} {type(e).__name__}: {e}")
             return json.dumps({'error': 'Tool execution failed'})
 
+    def _stream_timeout(self):
+        """Per-request timeout for streamed calls.
+
+        With streaming, httpx's read timeout bounds the gap between chunks,
+        so a stalled generation fails fast instead of hanging the worker.
+        """
+        return httpx.Timeout(self.config.stream_idle_timeout, connect=30.0)
+
+    def _stream_message(self, **kwargs):
+        """Stream a Messages API call and return the final message."""
+        with self.client.messages.stream(timeout=self._stream_timeout(), **kwargs) as stream:
+            return stream.get_final_message()
+
+    def _stream_text(self, **kwargs) -> str:
+        """Stream a Messages API call and return its text output."""
+        with self.client.messages.stream(timeout=self._stream_timeout(), **kwargs) as stream:
+            return "".join(stream.text_stream)
+
+    def _runner_tools(self) -> list:
+        """AGENT_TOOLS as SDK tool-runner tools, each dispatching to execute_tool."""
+        if self._runner_tool_defs is None:
+            def make_call(tool_name):
+                def call(**tool_input):
+                    return self.execute_tool(tool_name, tool_input)
+                return call
+
+            self._runner_tool_defs = [
+                BetaFunctionTool(
+                    make_call(tool["name"]),
+                    name=tool["name"],
+                    description=tool["description"],
+                    input_schema=tool["input_schema"]
+                )
+                for tool in AGENT_TOOLS
+            ]
+        return self._runner_tool_defs
+
+    def _stream_plan(self, **kwargs) -> str:
+        """Stream the architect's plan, stopping once its JSON object closes.
+
+        Leaving the stream context closes the connection, so Opus stops
+        generating whatever prose would follow the plan JSON.
+        """
+        scanner = _JsonObjectScanner()
+        with self.client.messages.stream(timeout=self._stream_timeout(), **kwargs) as stream:
+            for chunk in stream.text_stream:
+                if scanner.feed(chunk) is not None:
+                    break
+        return scanner.text
+
+    def _execute_steps_parallel(self, steps: list, request_id: str = '', results_cache: dict = None) -> list:
+        """Execute planned steps concurrently, returning results in step order.
+
+        Identical calls (same tool and params) run once; results_cache maps
+        _tool_call_key to result strings and can be shared across calls.
+        """
+        if not steps:
+            return []
+
+        cache = {} if results_cache is None else results_cache
+        keys = [_tool_call_key(step['tool'], step.get('params', {})) for step in steps]
+        pending = {}
+        for key, step in zip(keys, steps):
+            if key not in cache:
+                pending.setdefault(key, step)
+
+        if pending:
+            # Load data once up front so worker threads don't race on the lazy load
+            self.sanitized_data
+
+            with ThreadPoolExecutor(max_workers=self.config.max_parallel_tools) as executor:
+                results = executor.map(
+                    lambda step: self.execute_tool(step['tool'], step.get('params', {}), request_id),
+                    pending.values()
+                )
+                cache.update(zip(pending, results))
+
+        return [cache[key] for key in keys]
+
+    def _prefetch_tools(self, request_id: str = '') -> None:
+        """Warm the tool cache with PREFETCH_TOOLS (default arguments)."""
+        for tool_name in PREFETCH_TOOLS:
+            self.execute_tool(tool_name, {}, request_id)
+
+    def _parse_plan(self, plan_text: str, request_id: str = '') -> tuple:
+        """Extract (steps, analysis, synthesis_focus) from the architect's plan."""
+        steps = []
+        plan_analysis = None
+        synthesis_focus = None
+        try:
+            # Try to extract JSON from response; prose-only replies skip the scan
+            plan_json_text = _find_json_object(plan_text) if '{' in plan_text else None
+            if plan_json_text:
+                plan_json = _json_loads(plan_json_text)
+                steps = plan_json.get('steps', [])
+                plan_analysis = plan_json.get('analysis', None)
+                synthesis_focus = plan_json.get('synthesis_focus', None)
+                print(f"[{request_id}] Plan: {plan_analysis[:100] if plan_analysis else 'No analysis'}")
+                print(f"[{request_id}] Steps: {len(steps)}")
+        except json.JSONDecodeError:
+            print(f"[{request_id}] Could not parse plan, using fallback")
+            pass
+
+        return steps, plan_analysis, synthesis_focus
+
+    def _run_planned_steps(self, steps: list, request_id: str = '', results_cache: dict = None) -> list:
+        """Execute the architect's planned steps, returning tool results in plan order."""
+        # Execute planned steps (respect config limits)
+        max_steps = min(len(steps), self.config.max_plan_steps)
+        planned = [
+            step for step in steps[:max_steps]
+            if step.get('tool', '') in AGENT_TOOL_NAMES
+        ]
+        # P2: Check tool call limit
+        if len(planned) > self.config.max_tool_calls:
+            print(f"[{request_id}] LIMIT: Max tool calls ({self.config.max_tool_calls}) reached")
+            planned = planned[:self.config.max_tool_calls]
+
+        for i, step in enumerate(planned):
+            print(f"[{request_id}]   Step {i+1}: {step['tool']}")
+
+        # Planned steps are independent queries - run them concurrently,
+        # results come back in plan order for synthesis
+        results = self._execute_steps_parallel(planned, request_id, results_cache)
+
+        return [
+            {
+                'tool': step['tool'],
+                'purpose': step.get('purpose', ''),
+                'result': result
+            }
+            for step, result in zip(planned, results)
+        ]
+
+    def _build_synthesis_input(self, prompt: str, tool_results: list) -> str:
+        """Build the synthesizer's user message from the question and tool results."""
+        synthesis_input = f"""PÔVODNÁ OTÁZKA:
+{prompt}
+
+VÝSLEDKY Z NÁSTROJOV:
+"""
+        for tr in tool_results:
+            synthesis_input += f"\n--- {tr['tool']} ---\n"
+            if tr['purpose']:
+                synthesis_input += f"Účel: {tr['purpose']}\n"
+            # Smart truncation for JSON results
+            result_str = tr['result']
+            if len(result_str) > 4000:
+                # Try to truncate JSON smartly (at array item boundary)
+                try:
+                    # Trim a copy of the tool's own result rather than parsing its JSON back
+                    data = getattr(result_str, 'data', None)
+                    result_json = dict(data) if isinstance(data, dict) else _json_loads(result_str)
+                    # Limit arrays to keep size manageable
+                    if 'peers' in result_json:
+                        result_json['peers'] = result_json['peers'][:3]
+                        result_json['_note'] = 'Zobrazené 3 z viacerých peers'
+                    if 'pharmacies' in result_json:
+                        result_json['pharmacies'] = result_json['pharmacies'][:5]
+                        result_json['_note'] = f"Zobrazených 5 z {result_json.get('count', 'viacerých')}"
+                    # Trimmed row frames go out as plain records, as the parsed text did
+                    for key in ('peers', 'pharmacies'):
+                        if isinstance(result_json.get(key), pd.DataFrame):
+                            result_json[key] = result_json[key].to_dict('records')
+                    result_str = _json_dumps(result_json)
+                except (json.JSONDecodeError, KeyError):
+                    # Fallback: just truncate but ensure valid ending
+                    result_str = result_str[:4000] + '... (skrátené)'
+            synthesis_input += f"{result_str}\n"
+
+        synthesis_input += "\nVytvor prehľadnú odpoveď pre používateľa."
+
+        return synthesis_input
+
     async def analyze(
         self,
         prompt: str,
@@ -1324,65 +1873,38 @@ class DrMaxAgent:
             }
             return
 
-        messages = [{"role": "user", "content": prompt}]
+        # The SDK tool runner drives the call -> tool_use -> tool_result loop;
+        # tool results go back in one user turn per round
+        runner = self.client.beta.messages.tool_runner(
+            model=self.config.architect_model,
+            max_tokens=self.config.architect_max_tokens,
+            system=_cached_system(AGENT_SYSTEM_PROMPT),
+            tools=self._runner_tools(),
+            messages=[{"role": "user", "content": prompt}],
+            max_iterations=max_rounds,
+            stream=True,
+            timeout=self._stream_timeout()
+        )
 
-        for round_num in range(max_rounds):
-            # Call Claude (using architect model for async flow)
-            response = self.client.messages.create(
-                model=self.config.architect_model,
-                max_tokens=self.config.architect_max_tokens,
-                system=AGENT_SYSTEM_PROMPT,
-                tools=self.get_tools(),
-                messages=messages
-            )
+        for round_num, stream in enumerate(runner):
+            response = stream.get_final_message()
 
             # Process response
-            assistant_content = []
-            has_tool_use = False
-
+            tool_uses = []
             for block in response.content:
                 if block.type == "text":
-                    yield {"type": "thinking" if has_tool_use else "response", "content": block.text}
-                    assistant_content.append({"type": "text", "text": block.text})
+                    yield {"type": "thinking" if tool_uses else "response", "content": block.text}
 
                 elif block.type == "tool_use":
-                    has_tool_use = True
+                    tool_uses.append(block)
                     yield {
                         "type": "tool_use",
                         "tool": block.name,
                         "input": block.input
                     }
 
-                    # Execute tool
-                    tool_result = self.execute_tool(block.name, block.input)
-
-                    yield {
-                        "type": "tool_result",
-                        "tool": block.name,
-                        "content": tool_result[:500] + "..." if len(tool_result) > 500 else tool_result
-                    }
-
-                    assistant_content.append({
-                        "type": "tool_use",
-                        "id": block.id,
-                        "name": block.name,
-                        "input": block.input
-                    })
-
-                    # Add tool result to messages
-                    messages.append({"role": "assistant", "content": assistant_content})
-                    messages.append({
-                        "role": "user",
-                        "content": [{
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": tool_result
-                        }]
-                    })
-                    assistant_content = []
-
             # If no tool use, we're done
-            if not has_tool_use:
+            if not tool_uses:
                 yield {
                     "type": "done",
                     "content": "Analysis complete",
@@ -1390,6 +1912,16 @@ class DrMaxAgent:
                 }
                 return
 
+            # Executes the tools; the runner reuses this response for the next round
+            tool_response = runner.generate_tool_call_response()
+            for block, result in zip(tool_uses, tool_response["content"]):
+                tool_result = str(result["content"])
+                yield {
+                    "type": "tool_result",
+                    "tool": block.name,
+                    "content": tool_result[:500] + "..." if len(tool_result) > 500 else tool_result
+                }
+
         yield {
             "type": "done",
             "content": f"Reached max rounds ({max_rounds})",
@@ -1406,7 +1938,6 @@ class DrMaxAgent:
 
         Returns final response and metadata.
         """
-        import time
         start_time = time.time()
 
         if not ANTHROPIC_AVAILABLE or not self.client:
@@ -1418,14 +1949,19 @@ class DrMaxAgent:
         tools_used = []
         tool_results = []
         tool_call_count = 0
+        # Repeated identical tool calls within this analysis reuse the first result
+        results_cache = {}
 
         # === STEP 1: OPUS PLANS ===
         print(f"[{request_id}] STEP 1: Opus planning...")
+        # The planning call is network-bound; compute the common tools meanwhile
+        prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        prefetch_pool.submit(self._prefetch_tools, request_id)
         try:
-            plan_response = self.client.messages.create(
+            plan_text = self._stream_plan(
                 model=self.config.architect_model,
                 max_tokens=self.config.architect_max_tokens,
-                system=ARCHITECT_PLAN_PROMPT,
+                system=_cached_system(ARCHITECT_PLAN_PROMPT),
                 messages=[{"role": "user", "content": prompt}]
             )
         except Exception as api_error:
@@ -1433,70 +1969,29 @@ class DrMaxAgent:
             error_msg = str(api_error)
             print(f"[{request_id}] API ERROR in planning: {error_type}: {error_msg}")
             # Check if API key is set
-            import os as agent_os
-            api_key = agent_os.environ.get('ANTHROPIC_API_KEY', '')
+            api_key = os.environ.get('ANTHROPIC_API_KEY', '')
             print(f"[{request_id}] API key set: {bool(api_key)}, length: {len(api_key)}")
             return {
                 "error": f"Anthropic API error: {error_type}",
                 "error_detail": error_msg[:200],
                 "response": None
             }
+        finally:
+            # Steps start after the warm-up, so planned calls to it hit the cache
+            prefetch_pool.shutdown(wait=True)
 
-        plan_text = ""
-        for block in plan_response.content:
-            if block.type == "text":
-                plan_text = block.text
-                break
 
         # Parse plan (extract steps)
-        import re
-        steps = []
-        plan_analysis = None
-        synthesis_focus = None
-        try:
-            # Try to extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', plan_text)
-            if json_match:
-                plan_json = json.loads(json_match.group())
-                steps = plan_json.get('steps', [])
-                plan_analysis = plan_json.get('analysis', None)
-                synthesis_focus = plan_json.get('synthesis_focus', None)
-                print(f"[{request_id}] Plan: {plan_analysis[:100] if plan_analysis else 'No analysis'}")
-                print(f"[{request_id}] Steps: {len(steps)}")
-        except json.JSONDecodeError:
-            print(f"[{request_id}] Could not parse plan, using fallback")
-            pass
+        steps, plan_analysis, synthesis_focus = self._parse_plan(plan_text, request_id)
 
         # === STEP 2: HAIKU EXECUTES TOOLS ===
         print(f"[{request_id}] STEP 2: Executing tools...")
 
         if steps:
-            # Execute planned steps (respect config limit)
-            max_steps = min(len(steps), self.config.max_plan_steps)
-            for i, step in enumerate(steps[:max_steps]):
-                # P2: Check tool call limit
-                if tool_call_count >= self.config.max_tool_calls:
-                    print(f"[{request_id}] LIMIT: Max tool calls ({self.config.max_tool_calls}) reached")
-                    break
-
-                tool_name = step.get('tool', '')
-                tool_params = step.get('params', {})
-
-                if tool_name in ['search_pharmacies', 'get_pharmacy_details',
-                                  'compare_to_peers', 'get_understaffed',
-                                  'get_regional_summary', 'get_all_regions_summary',
-                                  'generate_report', 'get_segment_comparison',
-                                  'get_city_summary', 'get_network_overview',
-                                  'get_trend_analysis', 'get_priority_actions']:
-                    print(f"[{request_id}]   Step {i+1}: {tool_name}")
-                    result = self.execute_tool(tool_name, tool_params, request_id)
-                    tools_used.append(tool_name)
-                    tool_results.append({
-                        'tool': tool_name,
-                        'purpose': step.get('purpose', ''),
-                        'result': result
-                    })
-                    tool_call_count += 1
+            for tr in self._run_planned_steps(steps, request_id, results_cache):
+                tools_used.append(tr['tool'])
+                tool_results.append(tr)
+                tool_call_count += 1
         else:
             # Fallback: Let Haiku decide which tools to use
             print(f"[{request_id}] Fallback: Haiku autonomous mode")
@@ -1508,10 +2003,10 @@ class DrMaxAgent:
                     print(f"[{request_id}] LIMIT: Max tool calls ({self.config.max_tool_calls}) reached")
                     break
 
-                haiku_response = self.client.messages.create(
+                haiku_response = self._stream_message(
                     model=self.config.worker_model,
                     max_tokens=self.config.worker_max_tokens,
-                    system=WORKER_PROMPT,
+                    system=_cached_system(WORKER_PROMPT),
                     tools=self.get_tools(),
                     messages=haiku_messages
                 )
@@ -1528,7 +2023,11 @@ class DrMaxAgent:
 
                         has_tool_use = True
                         print(f"[{request_id}]   Haiku tool: {block.name}")
-                        result = self.execute_tool(block.name, block.input, request_id)
+                        key = _tool_call_key(block.name, block.input)
+                        result = results_cache.get(key)
+                        if result is None:
+                            result = self.execute_tool(block.name, block.input, request_id)
+                            results_cache[key] = result
                         tools_used.append(block.name)
                         tool_results.append({
                             'tool': block.name,
@@ -1566,49 +2065,15 @@ class DrMaxAgent:
             print(f"[{request_id}]   {tr['tool']}: {len(tr['result'])} chars")
 
         # Build synthesis prompt with all results
-        synthesis_input = f"""PÔVODNÁ OTÁZKA:
-{prompt}
-
-VÝSLEDKY Z NÁSTROJOV:
-"""
-        for tr in tool_results:
-            synthesis_input += f"\n--- {tr['tool']} ---\n"
-            if tr['purpose']:
-                synthesis_input += f"Účel: {tr['purpose']}\n"
-            # Smart truncation for JSON results
-            result_str = tr['result']
-            if len(result_str) > 4000:
-                # Try to truncate JSON smartly (at array item boundary)
-                try:
-                    result_json = json.loads(result_str)
-                    # Limit arrays to keep size manageable
-                    if 'peers' in result_json:
-                        result_json['peers'] = result_json['peers'][:3]
-                        result_json['_note'] = 'Zobrazené 3 z viacerých peers'
-                    if 'pharmacies' in result_json:
-                        result_json['pharmacies'] = result_json['pharmacies'][:5]
-                        result_json['_note'] = f"Zobrazených 5 z {result_json.get('count', 'viacerých')}"
-                    result_str = json.dumps(result_json, ensure_ascii=False)
-                except (json.JSONDecodeError, KeyError):
-                    # Fallback: just truncate but ensure valid ending
-                    result_str = result_str[:4000] + '... (skrátené)'
-            synthesis_input += f"{result_str}\n"
-
-        synthesis_input += "\nVytvor prehľadnú odpoveď pre používateľa."
+        synthesis_input = self._build_synthesis_input(prompt, tool_results)
 
-        synthesis_response = self.client.messages.create(
+        final_response = self._stream_text(
             model=self.config.architect_model,
             max_tokens=self.config.architect_max_tokens,
-            system=ARCHITECT_SYNTHESIZE_PROMPT,
+            system=_cached_system(ARCHITECT_SYNTHESIZE_PROMPT),
             messages=[{"role": "user", "content": synthesis_input}]
         )
 
-        final_response = ""
-        for block in synthesis_response.content:
-            if block.type == "text":
-                final_response = block.text
-                break
-
         duration = time.time() - start_time
         print(f"[{request_id}] COMPLETE: {duration:.2f}s, {tool_call_count} tool calls, tools: {tools_used}")
 
@@ -1628,3 +2093,115 @@ VÝSLEDKY Z NÁSTROJOV:
                 "tool_results": tool_results
             }
         }
+
+    def analyze_batch(self, prompts: list, request_id: str = '') -> dict:
+        """
+        Run the plan -> tools -> synthesis pipeline for many prompts at once.
+
+        Intended for non-interactive jobs (e.g. scheduled reports). With
+        config.batch_mode the plan and synthesis calls go through the Message
+        Batches API (cheaper, no per-request rate-limit serialization);
+        otherwise each prompt runs through analyze_sync.
+
+        Returns results keyed by custom_id ("prompt-0", "prompt-1", ...).
+        """
+        custom_ids = [f"prompt-{i}" for i in range(len(prompts))]
+
+        if not self.config.batch_mode:
+            return {
+                custom_id: self.analyze_sync(prompt, request_id=f"{request_id}-{custom_id}")
+                for custom_id, prompt in zip(custom_ids, prompts)
+            }
+
+        if not ANTHROPIC_AVAILABLE or not self.client:
+            return {
+                custom_id: {"error": "Anthropic SDK not available", "response": None}
+                for custom_id in custom_ids
+            }
+
+        # === STEP 1: OPUS PLANS (one batch) ===
+        print(f"[{request_id}] BATCH STEP 1: Planning {len(prompts)} prompts...")
+        plan_texts = self._run_batch(request_id, {
+            custom_id: {
+                "model": self.config.architect_model,
+                "max_tokens": self.config.architect_max_tokens,
+                "system": _cached_system(ARCHITECT_PLAN_PROMPT),
+                "messages": [{"role": "user", "content": prompt}]
+            }
+            for custom_id, prompt in zip(custom_ids, prompts)
+        })
+
+        # === STEP 2: EXECUTE TOOLS (locally) ===
+        print(f"[{request_id}] BATCH STEP 2: Executing tools...")
+        plans = {}
+        synthesis_params = {}
+        # Prompts in one batch often plan the same lookups; run each once
+        results_cache = {}
+        for custom_id, prompt in zip(custom_ids, prompts):
+            plan_text = plan_texts.get(custom_id)
+            if plan_text is None:
+                continue
+            steps, plan_analysis, synthesis_focus = self._parse_plan(plan_text, f"{request_id}-{custom_id}")
+            tool_results = self._run_planned_steps(steps, f"{request_id}-{custom_id}", results_cache) if steps else []
+            plans[custom_id] = (plan_text, plan_analysis, synthesis_focus, steps, tool_results)
+            synthesis_params[custom_id] = {
+                "model": self.config.architect_model,
+                "max_tokens": self.config.architect_max_tokens,
+                "system": _cached_system(ARCHITECT_SYNTHESIZE_PROMPT),
+                "messages": [{"role": "user", "content": self._build_synthesis_input(prompt, tool_results)}]
+            }
+
+        # === STEP 3: OPUS SYNTHESIZES (one batch) ===
+        print(f"[{request_id}] BATCH STEP 3: Synthesizing {len(synthesis_params)} responses...")
+        responses = self._run_batch(request_id, synthesis_params) if synthesis_params else {}
+
+        results = {}
+        for custom_id in custom_ids:
+            if custom_id not in plans:
+                results[custom_id] = {"error": "Batch planning request failed", "response": None}
+                continue
+            plan_text, plan_analysis, synthesis_focus, steps, tool_results = plans[custom_id]
+            if custom_id not in responses:
+                results[custom_id] = {"error": "Batch synthesis request failed", "response": None}
+                continue
+            results[custom_id] = {
+                "response": responses[custom_id],
+                "tools_used": [tr['tool'] for tr in tool_results],
+                "tool_call_count": len(tool_results),
+                "request_id": f"{request_id}-{custom_id}",
+                "architecture": "opus-batch",
+                "_reasoning": {
+                    "plan_raw": plan_text,
+                    "plan_analysis": plan_analysis,
+                    "synthesis_focus": synthesis_focus,
+                    "planned_steps": steps,
+                    "tool_results": tool_results
+                }
+            }
+
+        return results
+
+    def _run_batch(self, request_id: str, params_by_id: dict) -> dict:
+        """Submit one Message Batch, wait for it to end, return text by custom_id."""
+        batch = self.client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": params}
+            for custom_id, params in params_by_id.items()
+        ])
+        print(f"[{request_id}] Batch {batch.id} submitted ({len(params_by_id)} requests)")
+
+        # Poll with exponential backoff
+        delay = self.config.batch_poll_initial_delay
+        while batch.processing_status != "ended":
+            time.sleep(delay)
+            delay = min(delay * 2, self.config.batch_poll_max_delay)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        texts = {}
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type != "succeeded":
+                print(f"[{request_id}] Batch request {entry.custom_id} {entry.result.type}")
+                continue
+            texts[entry.custom_id] = "".join(
+                block.text for block in entry.result.message.content if block.type == "text"
+            )
+        return texts
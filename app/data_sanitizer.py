@@ -8,10 +8,52 @@ to ensure consistent FTE predictions and revenue_at_risk calculations.
 
 import pandas as pd
 import numpy as np
+import os
 import pickle
 import json
 from pathlib import Path
 
+# Parquet cache for sanitized data is optional (needs pyarrow)
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Numba compiles the per-row FTE and index kernels when installed; numpy column ops otherwise
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+SANITIZED_CACHE_NAME = '.sanitized.parquet'
+
+# In-process copy of the sanitized frame per data path: {data_path: (source_mtime, df)}
+_sanitized_memo = {}
+# Last sanitized/predictions join per data path: {data_path: (sanitized, predictions_df, merged)}
+_joined_memo = {}
+# Loaded model and gross factors per data path: {data_path: (mtimes, (model_pkg, factors))}
+_model_memo = {}
+
+# Narrow dtypes for the sanitized frame. Counts and indexes fit easily;
+# region_code and typ are low-cardinality filter/group keys, so equality
+# filters and value_counts work on integer codes. mesto stays object: it
+# is nearly unique per pharmacy and only substring-matched. The FTE and ratio
+# floats stay float64: they are rounded for output and float32 would turn
+# 12.3 into 12.300000190734863 in tool JSON.
+SANITIZED_DTYPES = {
+    'id': 'int32',
+    'region_code': 'category',
+    'typ': 'category',
+    'bloky': 'int32',
+    'productivity_index': 'int16',
+    'productivity_percentile': 'int16',
+    'bloky_index': 'int16',
+    'trzby_index': 'int16',
+    'revenue_at_risk_eur': 'int32',
+}
+
 # Segment productivity averages (used for indexing, not exposed)
 SEGMENT_PRODUCTIVITY_AVG = {
     'A - shopping premium': 7.53,
@@ -39,37 +81,155 @@ SEGMENT_PROPORTIONS = {
     'E - poliklinika': {'prop_F': 0.4715, 'prop_L': 0.3734, 'prop_ZF': 0.2243},
 }
 
+# Fallbacks for segments missing from the tables above
+DEFAULT_PROPORTIONS = {'prop_F': 0.4, 'prop_L': 0.4, 'prop_ZF': 0.2}
+DEFAULT_GROSS_CONVERSION = {'F': 1.21, 'L': 1.22, 'ZF': 1.20}
+
+
+# typ as a categorical over the known segments: segment lookups, groupbys
+# and equality filters run on integer codes instead of strings
+SEGMENT_DTYPE = pd.CategoricalDtype(list(SEGMENT_PRODUCTIVITY_AVG))
+
+# Columns of ml_ready_v3.csv the sanitizer reads: identity and exposed
+# fields, FTE inputs, and the feature columns of fte_model_v5 (keep in sync
+# with the model's feature_cols - missing features are filled with 0)
+RAW_USECOLS = [
+    'id', 'mesto', 'region_code', 'typ',
+    'fte_F', 'fte_L', 'fte_ZF', 'trzby', 'bloky', 'podiel_rx', 'bloky_trend',
+    'produktivita', 'prod_residual',
+    'revenue_per_transaction', 'bloky_range', 'trzby_cv', 'bloky_cv',
+    'kpi_mean', 'seasonal_peak_factor',
+]
+
+# Parse dtypes for the raw columns. Integer counts are narrowed; the float
+# columns stay float64 because they feed the model and the rounded FTE
+# output, where float32 would shift predictions and 0.1 roundings.
+RAW_DTYPES = {
+    'id': 'int32',
+    'region_code': 'category',
+    'typ': SEGMENT_DTYPE,
+    'bloky': 'int32',
+    'bloky_range': 'int32',
+}
+
 
 def load_raw_data(data_path: Path) -> pd.DataFrame:
-    """Load raw pharmacy data."""
-    return pd.read_csv(data_path / 'ml_ready_v3.csv')
+    """
+    Load raw pharmacy data.
+
+    Reads ml_ready_v3.parquet (from scripts/convert_to_parquet.py) when it
+    is at least as new as the CSV, so the text is not re-parsed; otherwise
+    falls back to the CSV.
+    """
+    csv_path = data_path / 'ml_ready_v3.csv'
+    parquet_path = csv_path.with_suffix('.parquet')
+    if PARQUET_AVAILABLE:
+        try:
+            if parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+                return pd.read_parquet(parquet_path, columns=RAW_USECOLS).astype(RAW_DTYPES)
+        except OSError:
+            pass  # No Parquet copy - read the CSV below
+    return pd.read_csv(csv_path, usecols=RAW_USECOLS, dtype=RAW_DTYPES, engine='c')
 
 
 def load_model_and_factors(data_path: Path) -> tuple:
     """
     Load ML model and pharmacy-specific gross factors.
 
+    The pair is kept in memory until either file's mtime changes, so
+    regenerating the sanitized data does not unpickle the model again.
+    Treat both as read-only.
+
     Returns:
         tuple: (model_pkg, pharmacy_gross_factors)
     """
     # Get project root (parent of data directory)
     project_root = data_path.parent
+    model_path = project_root / 'models' / 'fte_model_v5.pkl'
+    gross_factors_path = data_path / 'gross_factors.json'
+
+    mtimes = (model_path.stat().st_mtime_ns, gross_factors_path.stat().st_mtime_ns)
+    memo = _model_memo.get(data_path)
+    if memo is not None and memo[0] == mtimes:
+        return memo[1]
 
     # Load ML model
-    model_path = project_root / 'models' / 'fte_model_v5.pkl'
     with open(model_path, 'rb') as f:
         model_pkg = pickle.load(f)
 
     # Load pharmacy-specific gross factors
-    gross_factors_path = data_path / 'gross_factors.json'
     with open(gross_factors_path, 'r') as f:
         gross_factors_data = json.load(f)
 
     pharmacy_gross_factors = {int(k): v for k, v in gross_factors_data['factors'].items()}
 
+    _model_memo[data_path] = (mtimes, (model_pkg, pharmacy_gross_factors))
     return model_pkg, pharmacy_gross_factors
 
 
+def _lookup_rows(table: dict, keys: pd.Series, columns: list, default: dict) -> np.ndarray:
+    """Look up a {key: {column: value}} table for every row as an (n, len(columns)) array.
+
+    Keys missing from the table get the default values.
+    """
+    frame = pd.DataFrame.from_dict(table, orient='index').reindex(columns=columns)
+    return frame.reindex(keys.to_numpy()).fillna(default).to_numpy(dtype=np.float64)
+
+
+if NUMBA_AVAILABLE:
+    # One pass per row instead of a temporary per column operation. No
+    # fastmath: the sums must associate like the numpy version so the 0.1
+    # roundings (and revenue at risk) come out identical.
+    @njit(parallel=True, cache=True)
+    def _gross_fte_kernel(fte_net, props, conv, fte_roles, trzby, prod_residual):
+        """Gross predicted/actual FTE and revenue at risk per row (see calculate_fte_predictions)."""
+        n = fte_net.shape[0]
+        predicted = np.empty(n, dtype=np.float64)
+        actual = np.empty(n, dtype=np.float64)
+        revenue_at_risk = np.zeros(n, dtype=np.int64)
+        for i in prange(n):
+            pred = (fte_net[i] * props[i, 0] * conv[i, 0]
+                    + fte_net[i] * props[i, 1] * conv[i, 1]
+                    + fte_net[i] * props[i, 2] * conv[i, 2])
+            act = (fte_roles[i, 0] * conv[i, 0]
+                   + fte_roles[i, 1] * conv[i, 1]
+                   + fte_roles[i, 2] * conv[i, 2])
+            predicted[i] = pred
+            actual[i] = act
+            # Same steps as np.round(x, 1)
+            pred_rounded = np.rint(pred * 10.0) / 10.0
+            act_rounded = np.rint(act * 10.0) / 10.0
+            if pred > act and trzby[i] > 0 and prod_residual[i] > 0 and pred_rounded > act_rounded:
+                overload_ratio = pred_rounded / act_rounded if act_rounded > 0 else 1.0
+                revenue_at_risk[i] = int((overload_ratio - 1) * 0.5 * trzby[i])
+        return predicted, actual, revenue_at_risk
+
+else:
+    def _gross_fte_kernel(fte_net, props, conv, fte_roles, trzby, prod_residual):
+        """Gross predicted/actual FTE and revenue at risk per row (see calculate_fte_predictions)."""
+        predicted = (
+            fte_net * props[:, 0] * conv[:, 0]
+            + fte_net * props[:, 1] * conv[:, 1]
+            + fte_net * props[:, 2] * conv[:, 2]
+        )
+        actual = (
+            fte_roles[:, 0] * conv[:, 0]
+            + fte_roles[:, 1] * conv[:, 1]
+            + fte_roles[:, 2] * conv[:, 2]
+        )
+        predicted_rounded = np.round(predicted, 1)
+        actual_rounded = np.round(actual, 1)
+        at_risk = (
+            (predicted > actual) & (trzby > 0) & (prod_residual > 0)
+            & (predicted_rounded > actual_rounded)
+        )
+        overload_ratio = np.divide(predicted_rounded, actual_rounded,
+                                   out=np.ones_like(actual_rounded), where=actual_rounded > 0)
+        revenue_at_risk = np.zeros(len(fte_net), dtype=np.int64)
+        revenue_at_risk[at_risk] = ((overload_ratio[at_risk] - 1) * 0.5 * trzby[at_risk]).astype(np.int64)
+        return predicted, actual, revenue_at_risk
+
+
 def calculate_fte_predictions(df: pd.DataFrame, model_pkg: dict, pharmacy_gross_factors: dict) -> pd.DataFrame:
     """
     Calculate FTE predictions using the same logic as server.py.
@@ -93,85 +253,40 @@ def calculate_fte_predictions(df: pd.DataFrame, model_pkg: dict, pharmacy_gross_
     # This matches how the model was trained (server.py line 600-601)
     df['prod_residual'] = df['prod_residual'].clip(lower=0)
 
-    # Build feature matrix
-    X = pd.DataFrame([{col: row.get(col, 0) for col in feature_cols}
-                      for _, row in df.iterrows()])
+    # Build feature matrix (model column order; features missing from the CSV are 0)
+    X = df.reindex(columns=feature_cols, fill_value=0)
 
     # Predict NET FTE
     df['predicted_fte_net'] = model_pkg['models']['fte'].predict(X)
 
-    def calc_gross_fte_predicted(row):
-        """Calculate predicted GROSS FTE using pharmacy-specific factors."""
-        pharmacy_id = int(row['id'])
-        typ = row['typ']
-        fte_net = row['predicted_fte_net']
-
-        # Get segment proportions (from model or fallback)
-        props = segment_proportions.get(typ, {'prop_F': 0.4, 'prop_L': 0.4, 'prop_ZF': 0.2})
-
-        # Get conversion factors (pharmacy-specific or type-based)
-        if pharmacy_id in pharmacy_gross_factors:
-            conv = pharmacy_gross_factors[pharmacy_id]
-        else:
-            conv = TYPE_GROSS_CONVERSION.get(typ, {'F': 1.21, 'L': 1.22, 'ZF': 1.20})
-
-        # Calculate gross FTE by role (no rounding here - same as server.py)
-        fte_F = fte_net * props['prop_F'] * conv['F']
-        fte_L = fte_net * props['prop_L'] * conv['L']
-        fte_ZF = fte_net * props['prop_ZF'] * conv['ZF']
-
-        return fte_F + fte_L + fte_ZF  # No rounding - diff calculated from unrounded values
-
-    def calc_gross_fte_actual(row):
-        """Calculate actual GROSS FTE using pharmacy-specific factors."""
-        pharmacy_id = int(row['id'])
-        typ = row['typ']
-
-        # Get conversion factors (pharmacy-specific or type-based)
-        if pharmacy_id in pharmacy_gross_factors:
-            conv = pharmacy_gross_factors[pharmacy_id]
-        else:
-            conv = TYPE_GROSS_CONVERSION.get(typ, {'F': 1.21, 'L': 1.22, 'ZF': 1.20})
-
-        # Calculate using actual role breakdown (no rounding - same as server.py)
-        fte_F = row['fte_F'] * conv['F']
-        fte_L = row['fte_L'] * conv['L']
-        fte_ZF = row['fte_ZF'] * conv['ZF']
-
-        return fte_F + fte_L + fte_ZF  # No rounding - diff calculated from unrounded values
+    # Per-row segment proportions and gross conversion factors in F, L, ZF
+    # order; pharmacy-specific factors take precedence over the type-based ones
+    props = _lookup_rows(segment_proportions, df['typ'], ['prop_F', 'prop_L', 'prop_ZF'], DEFAULT_PROPORTIONS)
+    pharmacy_ids = df['id'].astype(int)
+    conv = np.where(
+        pharmacy_ids.isin(pharmacy_gross_factors.keys()).to_numpy()[:, None],
+        _lookup_rows(pharmacy_gross_factors, pharmacy_ids, ['F', 'L', 'ZF'], DEFAULT_GROSS_CONVERSION),
+        _lookup_rows(TYPE_GROSS_CONVERSION, df['typ'], ['F', 'L', 'ZF'], DEFAULT_GROSS_CONVERSION)
+    )
 
-    # Calculate gross FTE values
-    df['predicted_fte_gross'] = df.apply(calc_gross_fte_predicted, axis=1)
-    df['actual_fte_gross_calc'] = df.apply(calc_gross_fte_actual, axis=1)
+    # Gross FTE by role, summed without rounding - diff is calculated from
+    # unrounded values (same as server.py). Revenue at risk (same logic as
+    # server.py line 713-717) only counts understaffed + productive
+    # pharmacies, from FTE values rounded to 0.1
+    predicted, actual, revenue_at_risk = _gross_fte_kernel(
+        df['predicted_fte_net'].to_numpy(dtype=np.float64),
+        props,
+        conv,
+        df[['fte_F', 'fte_L', 'fte_ZF']].to_numpy(dtype=np.float64),
+        df['trzby'].to_numpy(dtype=np.float64),
+        df['prod_residual'].to_numpy(dtype=np.float64)
+    )
+    df['predicted_fte_gross'] = predicted
+    df['actual_fte_gross_calc'] = actual
 
     # Calculate FTE diff (positive = understaffed, same as server.py)
-    df['fte_diff_calc'] = df['predicted_fte_gross'] - df['actual_fte_gross_calc']
-
-    # Calculate revenue at risk (same logic as server.py)
-    def calc_revenue_at_risk(row):
-        """Calculate revenue at risk for understaffed + productive pharmacies."""
-        predicted = row['predicted_fte_gross']
-        actual = row['actual_fte_gross_calc']
-        trzby = row['trzby']
-        is_above_avg = row['prod_residual'] > 0  # Same condition as server.py
-
-        # Only calculate for understaffed + productive pharmacies
-        if predicted <= actual or trzby <= 0 or not is_above_avg:
-            return 0
-
-        # Use rounded values (same as server.py line 713-717)
-        predicted_rounded = round(predicted, 1)
-        actual_rounded = round(actual, 1)
-
-        if predicted_rounded <= actual_rounded:
-            return 0
-
-        overload_ratio = predicted_rounded / actual_rounded if actual_rounded > 0 else 1
-        revenue_at_risk = int((overload_ratio - 1) * 0.5 * trzby)
-
-        return revenue_at_risk
-
-    df['revenue_at_risk_calc'] = df.apply(calc_revenue_at_risk, axis=1)
+    df['fte_diff_calc'] = predicted - actual
+    df['revenue_at_risk_calc'] = revenue_at_risk
 
     return df
 
@@ -188,20 +303,35 @@ def calculate_productivity_index(row: pd.Series) -> int:
     return max(50, min(150, index))  # Clamp to 50-150 range
 
 
-def calculate_peer_rank(df: pd.DataFrame) -> pd.DataFrame:
-    """Calculate percentile rank within segment."""
-    df = df.copy()
+if NUMBA_AVAILABLE:
+    # cache=True keeps the compiled kernel in __pycache__ across processes
+    @njit(parallel=True, cache=True)
+    def _compute_indices(productivity: np.ndarray, segment_avg: np.ndarray) -> np.ndarray:
+        """calculate_productivity_index over whole columns (segment_avg already mapped per row)."""
+        out = np.empty(productivity.shape[0], dtype=np.int64)
+        for i in prange(productivity.shape[0]):
+            if segment_avg[i] == 0:
+                out[i] = 100
+            else:
+                index = np.rint(productivity[i] / segment_avg[i] * 100)
+                out[i] = int(min(150.0, max(50.0, index)))  # Clamp to 50-150 range
+        return out
+
+else:
+    def _compute_indices(productivity: np.ndarray, segment_avg: np.ndarray) -> np.ndarray:
+        """calculate_productivity_index over whole columns (segment_avg already mapped per row)."""
+        no_avg = segment_avg == 0
+        index = np.rint(productivity / np.where(no_avg, 1.0, segment_avg) * 100)
+        return np.where(no_avg, 100, np.clip(index, 50, 150)).astype(np.int64)  # Clamp to 50-150 range
 
-    def rank_in_segment(group):
-        # Rank by productivity (higher = better rank)
-        group['peer_rank'] = group['produktivita'].rank(ascending=False, method='min').astype(int)
-        group['segment_count'] = len(group)
-        return group
 
-    import warnings
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore", FutureWarning)
-        df = df.groupby('typ', group_keys=False).apply(rank_in_segment)
+def calculate_peer_rank(df: pd.DataFrame) -> pd.DataFrame:
+    """Calculate rank by productivity within segment (1 = most productive)."""
+    by_segment = df.groupby('typ', observed=True)['produktivita']
+    df = df.assign(
+        peer_rank=by_segment.rank(ascending=False, method='min').astype(int),
+        segment_count=by_segment.transform('size'),
+    )
     df['peer_rank_str'] = df['peer_rank'].astype(str) + '/' + df['segment_count'].astype(str)
 
     return df
@@ -209,19 +339,8 @@ def calculate_peer_rank(df: pd.DataFrame) -> pd.DataFrame:
 
 def calculate_percentile(df: pd.DataFrame) -> pd.DataFrame:
     """Calculate percentile within segment."""
-    df = df.copy()
-
-    def percentile_in_segment(group):
-        group['productivity_percentile'] = (
-            group['produktivita'].rank(pct=True) * 100
-        ).round().astype(int)
-        return group
-
-    import warnings
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore", FutureWarning)
-        df = df.groupby('typ', group_keys=False).apply(percentile_in_segment)
-    return df
+    percentile = df.groupby('typ', observed=True)['produktivita'].rank(pct=True) * 100
+    return df.assign(productivity_percentile=percentile.round().astype(int))
 
 
 def generate_sanitized_data(data_path: Path, output_path: Path = None) -> pd.DataFrame:
@@ -253,23 +372,27 @@ def generate_sanitized_data(data_path: Path, output_path: Path = None) -> pd.Dat
     df = calculate_fte_predictions(df, model_pkg, pharmacy_gross_factors)
 
     # Calculate productivity index
-    df['productivity_index'] = df.apply(calculate_productivity_index, axis=1)
+    segment_avg = df['typ'].map(SEGMENT_PRODUCTIVITY_AVG).astype(np.float64).fillna(7.0)
+    df['productivity_index'] = _compute_indices(
+        df['produktivita'].to_numpy(dtype=np.float64),
+        segment_avg.to_numpy()
+    )
 
     # Calculate peer rankings
     df = calculate_peer_rank(df)
     df = calculate_percentile(df)
 
-    # Calculate bloky index (100 = segment avg)
-    segment_bloky_avg = df.groupby('typ')['bloky'].transform('mean')
-    df['bloky_index'] = ((df['bloky'] / segment_bloky_avg) * 100).round().astype(int)
-
-    # Calculate trzby index
-    segment_trzby_avg = df.groupby('typ')['trzby'].transform('mean')
-    df['trzby_index'] = ((df['trzby'] / segment_trzby_avg) * 100).round().astype(int)
+    # Calculate bloky and trzby indexes (100 = segment avg), both segment
+    # means from one groupby pass
+    segment_means = df.groupby('typ', observed=True)[['bloky', 'trzby']].transform('mean')
+    df['bloky_index'] = ((df['bloky'] / segment_means['bloky']) * 100).round().astype(int)
+    df['trzby_index'] = ((df['trzby'] / segment_means['trzby']) * 100).round().astype(int)
 
     # Productivity comparison text
-    df['productivity_vs_segment'] = df['productivity_index'].apply(
-        lambda x: 'nadpriemerná' if x > 105 else ('podpriemerná' if x < 95 else 'priemerná')
+    df['productivity_vs_segment'] = np.select(
+        [df['productivity_index'] > 105, df['productivity_index'] < 95],
+        ['nadpriemerná', 'podpriemerná'],
+        default='priemerná'
     )
 
     # Select only safe columns (now using fresh calculations, not CSV values)
@@ -307,6 +430,8 @@ def generate_sanitized_data(data_path: Path, output_path: Path = None) -> pd.Dat
     sanitized['fte_recommended'] = sanitized['fte_recommended'].round(1)
     sanitized['fte_gap'] = sanitized['fte_gap'].round(1)
 
+    sanitized = sanitized.astype(SANITIZED_DTYPES)
+
     if output_path:
         sanitized.to_csv(output_path, index=False)
         print(f"Sanitized data saved to {output_path}")
@@ -314,9 +439,56 @@ def generate_sanitized_data(data_path: Path, output_path: Path = None) -> pd.Dat
     return sanitized
 
 
-def get_sanitized_pharmacy(pharmacy_id: int, data_path: Path) -> dict:
-    """Get sanitized data for a single pharmacy."""
-    df = generate_sanitized_data(data_path)
+def load_sanitized_data(data_path: Path) -> pd.DataFrame:
+    """
+    Load sanitized data, reusing an on-disk Parquet cache when it is fresh.
+
+    The cache is valid while it is newer than every input of the sanitizer
+    (training CSV, model, gross factors and this module), so each worker
+    process skips the model run after the first one has written it. Within
+    a process the loaded frame is also kept in memory and returned as-is
+    until one of those inputs changes; callers must not modify it in place.
+    """
+    cache_path = data_path / SANITIZED_CACHE_NAME
+    sources = [
+        data_path / 'ml_ready_v3.csv',
+        data_path.parent / 'models' / 'fte_model_v5.pkl',
+        data_path / 'gross_factors.json',
+        Path(__file__),
+    ]
+    source_mtime = max(p.stat().st_mtime for p in sources)
+
+    memo = _sanitized_memo.get(data_path)
+    if memo is not None and memo[0] == source_mtime:
+        return memo[1]
+
+    df = None
+    if PARQUET_AVAILABLE:
+        try:
+            if cache_path.stat().st_mtime >= source_mtime:
+                df = pd.read_parquet(cache_path, engine='pyarrow', memory_map=True)
+        except OSError:
+            pass  # No cache yet (or unreadable) - regenerate below
+
+    if df is None:
+        df = generate_sanitized_data(data_path)
+
+        if PARQUET_AVAILABLE:
+            # Write to a temp file and rename so other workers never read a partial file
+            tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            try:
+                df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', row_group_size=4096, index=False)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Warning: could not write sanitized data cache: {e}")
+
+    _sanitized_memo[data_path] = (source_mtime, df)
+    return df
+
+
+def get_sanitized_pharmacy(pharmacy_id: int, data_path: Path, sanitized: pd.DataFrame = None) -> dict:
+    """Get sanitized data for a single pharmacy (from sanitized, when already loaded)."""
+    df = load_sanitized_data(data_path) if sanitized is None else sanitized
     pharmacy = df[df['id'] == pharmacy_id]
 
     if pharmacy.empty:
@@ -325,12 +497,46 @@ def get_sanitized_pharmacy(pharmacy_id: int, data_path: Path) -> dict:
     return pharmacy.iloc[0].to_dict()
 
 
+def join_predictions(
+    data_path: Path,
+    predictions_df: pd.DataFrame,
+    sanitized: pd.DataFrame = None
+) -> pd.DataFrame:
+    """
+    Left-join prediction columns onto the sanitized data by id.
+
+    The last join per data path is reused while both the sanitized frame and
+    the predictions_df object are unchanged, so repeated lookups against the
+    same predictions do not rebuild the merge. Treat the result as read-only.
+
+    Callers that already hold the sanitized frame (e.g. an agent's
+    sanitized_data) pass it as sanitized; otherwise it is loaded from
+    data_path, which checks the source files' mtimes on every call.
+    """
+    if sanitized is None:
+        sanitized = load_sanitized_data(data_path)
+
+    memo = _joined_memo.get(data_path)
+    if memo is not None and memo[0] is sanitized and memo[1] is predictions_df:
+        return memo[2]
+
+    merged = sanitized.merge(
+        predictions_df[['id', 'predicted_fte', 'diff', 'revenue_at_risk']],
+        on='id',
+        how='left'
+    )
+    # Holding predictions_df keeps its id() from being reused by another frame
+    _joined_memo[data_path] = (sanitized, predictions_df, merged)
+    return merged
+
+
 def get_understaffed_pharmacies(
     data_path: Path,
     predictions_df: pd.DataFrame,
     region: str = None,
-    min_gap: float = -0.5
-) -> list:
+    min_gap: float = -0.5,
+    sanitized: pd.DataFrame = None
+) -> pd.DataFrame:
     """
     Get understaffed pharmacies with sanitized data.
 
@@ -339,18 +545,14 @@ def get_understaffed_pharmacies(
         predictions_df: DataFrame with fte_actual, predicted_fte, diff columns
         region: Optional region filter (e.g., 'RR15')
         min_gap: Minimum FTE gap to consider understaffed (default -0.5)
+        sanitized: Already loaded sanitized data (loaded from data_path if None)
 
     Returns:
-        List of sanitized pharmacy dicts with staffing gaps
+        DataFrame of sanitized pharmacies with staffing gaps, most
+        understaffed first. Aggregate over it (e.g. revenue_at_risk.sum())
+        before converting the rows you need with to_dict('records').
     """
-    sanitized = generate_sanitized_data(data_path)
-
-    # Merge with predictions
-    merged = sanitized.merge(
-        predictions_df[['id', 'predicted_fte', 'diff', 'revenue_at_risk']],
-        on='id',
-        how='left'
-    )
+    merged = join_predictions(data_path, predictions_df, sanitized)
 
     # Filter understaffed
     understaffed = merged[merged['diff'] < min_gap].copy()
@@ -367,14 +569,15 @@ def get_understaffed_pharmacies(
     understaffed['diff'] = understaffed['diff'].round(1)
     understaffed['revenue_at_risk'] = understaffed['revenue_at_risk'].round(0)
 
-    return understaffed.to_dict('records')
+    return understaffed
 
 
 def compare_to_peers(
     pharmacy_id: int,
     data_path: Path,
     predictions_df: pd.DataFrame,
-    n_peers: int = 5
+    n_peers: int = 5,
+    sanitized: pd.DataFrame = None
 ) -> dict:
     """
     Compare pharmacy to similar peers using indexed values.
@@ -384,14 +587,7 @@ def compare_to_peers(
     - N most similar peers by bloky volume
     - All using indexed productivity (no raw values)
     """
-    sanitized = generate_sanitized_data(data_path)
-
-    # Merge with predictions
-    merged = sanitized.merge(
-        predictions_df[['id', 'predicted_fte', 'diff', 'revenue_at_risk']],
-        on='id',
-        how='left'
-    )
+    merged = join_predictions(data_path, predictions_df, sanitized)
 
     # Get target pharmacy
     target = merged[merged['id'] == pharmacy_id]
@@ -8,17 +8,30 @@ The agent uses custom tools that access pre-sanitized data rather than
 raw files, protecting proprietary productivity calculations.
 """
 
+import asyncio
+import functools
+import inspect
 import json
 import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator, Optional, Union, get_args, get_origin, get_type_hints
+
+import numpy as np
+import pandas as pd
 
 from app_v2.config import (
     AGENT_ARCHITECT_MAX_TOKENS,
     AGENT_ARCHITECT_MODEL,
     AGENT_MAX_PLAN_STEPS,
     AGENT_MAX_TOOL_CALLS,
+    AGENT_STREAM_IDLE_TIMEOUT,
     AGENT_WORKER_MAX_TOKENS,
     AGENT_WORKER_MODEL,
     CONTEXT_LIMITS,
@@ -31,9 +44,26 @@ from app_v2.config import (
 from app_v2.core import calculate_fte_from_inputs, ensure_model_loaded, FTE_GAP_NOTABLE, FTE_GAP_URGENT
 from app_v2.data_sanitizer import generate_sanitized_data
 
+# Numba compiles the group-sum kernel when installed; np.bincount otherwise
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# orjson parses plans and serializes tool results faster; stdlib json is the fallback
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Check if SDK is available
 try:
-    from anthropic import Anthropic
+    import httpx
+    from anthropic import Anthropic, APITimeoutError, AsyncAnthropic
 
     ANTHROPIC_AVAILABLE = True
 except ImportError:
@@ -139,6 +169,67 @@ def summarize_tool_result(tool_name: str, result: dict) -> dict:
     return result
 
 
+def _json_dumps(obj) -> str:
+    """Serialize to a JSON str, keeping non-ASCII text and stringifying unknown types."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+def _json_loads(text: str):
+    """Parse JSON; raises json.JSONDecodeError (orjson's error subclasses it)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class ToolResult(str):
+    """JSON text of a tool result, carrying the dict it was serialized from.
+
+    Passes anywhere the result string goes (API payloads, tool cache); the
+    synthesis step trims ``data`` instead of re-parsing large results.
+    """
+
+    def __new__(cls, data):
+        text = super().__new__(cls, _json_dumps(data))
+        text.data = data
+        return text
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """Return the first balanced {...} object in text, or None.
+
+    One linear scan from the first brace, skipping braces inside JSON
+    strings. Unlike a greedy regex it cannot backtrack, and prose after
+    the object (even with braces in it) is ignored.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = escape = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+    return None
+
+
 def validate_plan(
     plan_dict: dict, allowed_tools: frozenset, request_id: str = ""
 ) -> tuple:
@@ -330,6 +421,44 @@ ROI = Chránené tržby / Náklady
 }
 
 
+def _folded_words(text: str) -> frozenset:
+    """Words of text with case and diacritics folded ("Košice" -> "kosice")."""
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return frozenset(re.findall(r"\w+", folded))
+
+
+class PlanCache:
+    """Cache of architect plans for repeated questions.
+
+    Questions are normalized (case, diacritics, punctuation) into word sets,
+    and a lookup only hits when the word set is identical. A single swapped
+    word can change the meaning ("poddimenzované" vs "naddimenzované",
+    "Košice" vs "Nitra", "RR11" vs "RR12"), so near-duplicates are misses.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # folded word set -> plan text
+        self._lock = threading.Lock()
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = _folded_words(prompt)
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is not None:
+                self._entries.move_to_end(key)
+            return plan
+
+    def put(self, prompt: str, plan_text: str) -> None:
+        key = _folded_words(prompt)
+        with self._lock:
+            self._entries[key] = plan_text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
 @dataclass
 class AgentConfig:
     """Configuration for the hybrid agent architecture.
@@ -348,11 +477,15 @@ class AgentConfig:
     # P2: Safety limits
     max_tool_calls: int = field(default_factory=lambda: AGENT_MAX_TOOL_CALLS)
     max_plan_steps: int = field(default_factory=lambda: AGENT_MAX_PLAN_STEPS)
+    # Streaming dead-man switch: max silence between chunks, retries on stall
+    stream_idle_timeout: float = field(default_factory=lambda: AGENT_STREAM_IDLE_TIMEOUT)
+    stream_stall_retries: int = 1
+    max_parallel_tools: int = 4  # Concurrent planned-step executions
 
 
 # P3: Output Schema Validation
-PHARMACY_REQUIRED_FIELDS = ["id", "mesto", "fte_actual", "fte_recommended", "fte_gap"]
-PHARMACY_LIST_REQUIRED_FIELDS = ["count", "pharmacies"]
+PHARMACY_REQUIRED_FIELDS = frozenset({"id", "mesto", "fte_actual", "fte_recommended", "fte_gap"})
+PHARMACY_LIST_REQUIRED_FIELDS = frozenset({"count", "pharmacies"})
 
 
 def validate_pharmacy_output(result: dict) -> dict:
@@ -360,9 +493,9 @@ def validate_pharmacy_output(result: dict) -> dict:
     if "error" in result:
         return result
 
-    missing = [f for f in PHARMACY_REQUIRED_FIELDS if f not in result]
+    missing = PHARMACY_REQUIRED_FIELDS - result.keys()
     if missing:
-        return {"error": f"Missing fields: {missing}", "partial_data": result}
+        return {"error": f"Missing fields: {sorted(missing)}", "partial_data": result}
 
     return result
 
@@ -372,13 +505,63 @@ def validate_pharmacy_list_output(result: dict) -> dict:
     if "error" in result:
         return result
 
-    missing = [f for f in PHARMACY_LIST_REQUIRED_FIELDS if f not in result]
+    missing = PHARMACY_LIST_REQUIRED_FIELDS - result.keys()
     if missing:
-        return {"error": f"Missing list fields: {missing}", "partial_data": result}
+        return {"error": f"Missing list fields: {sorted(missing)}", "partial_data": result}
 
     return result
 
 
+# Tool argument coercion - Claude often sends numbers and flags as strings
+def _to_bool(value) -> bool:
+    """Parse a tool flag; bool("false") would be True."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "áno")
+    return bool(value)
+
+
+_ARG_CASTERS = {int: int, float: float, bool: _to_bool}
+
+
+def coerce_args(method):
+    """Coerce keyword arguments of a tool_* method to their annotated types.
+
+    The {name: (type, caster, default)} schema is derived from the signature
+    once, at decoration time. An explicit None falls back to the parameter
+    default; values already of the right type pass through untouched.
+    """
+    hints = get_type_hints(method)
+    schema = {}
+    for name, param in inspect.signature(method).parameters.items():
+        target = hints.get(name)
+        if get_origin(target) is Union:
+            target = next((a for a in get_args(target) if a is not type(None)), None)
+        if target in _ARG_CASTERS:
+            default = None if param.default is inspect.Parameter.empty else param.default
+            schema[name] = (target, _ARG_CASTERS[target], default)
+
+    def coerce(kwargs: dict) -> dict:
+        kwargs = dict(kwargs)
+        for name, value in kwargs.items():
+            spec = schema.get(name)
+            if spec is None:
+                continue
+            target, caster, default = spec
+            if value is None:
+                kwargs[name] = default
+            elif type(value) is not target:
+                kwargs[name] = caster(value)
+        return kwargs
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return method(self, *args, **coerce(kwargs))
+
+    # execute_tool builds tool cache keys from the coerced arguments
+    wrapper.coerce_kwargs = coerce
+    return wrapper
+
+
 # System prompt for the agent - emphasizes using indexed values
 AGENT_SYSTEM_PROMPT = """Si expertný FTE analytik pre sieť lekární Dr.Max na Slovensku.
 
@@ -716,6 +899,620 @@ NESMIEŠ: vzorce, koeficienty, segmentové priemery, presné hodnoty produktivit
 WORKER_PROMPT = """Vykonaj nástroj a vráť výsledok. Neinterpretuj, len vráť dáta."""
 
 
+def _cached_system(prompt: str) -> list:
+    """System prompt as a text block marked for Anthropic prompt caching."""
+    return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+# System blocks built once at import. The breakpoint caches the whole
+# request prefix (tools + system) server-side across requests.
+AGENT_SYSTEM_BLOCKS = _cached_system(AGENT_SYSTEM_PROMPT)
+ARCHITECT_PLAN_BLOCKS = _cached_system(ARCHITECT_PLAN_PROMPT)
+ARCHITECT_SYNTHESIZE_BLOCKS = _cached_system(ARCHITECT_SYNTHESIZE_PROMPT)
+WORKER_BLOCKS = _cached_system(WORKER_PROMPT)
+
+
+# Tool definitions for the Claude API, built once at import
+AGENT_TOOLS = [
+    {
+        "name": "search_pharmacies",
+        "description": "Vyhľadaj lekárne podľa kritérií (mesto, typ, región, bloky). Výsledky sú zoradené podľa blokov (najväčšie prvé). Pre 'top/najväčšie' lekárne použi sort_by='bloky'.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "mesto": {
+                    "type": "string",
+                    "description": "Mesto/lokalita lekárne (case-insensitive, partial match). Napr. 'Košice', 'Bratislava', 'Levice'",
+                },
+                "typ": {
+                    "type": "string",
+                    "description": "Typ lekárne (A/B/C/D/E alebo celý názov)",
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Kód regiónu (napr. RR11, RR15)",
+                },
+                "min_bloky": {
+                    "type": "integer",
+                    "description": "Minimálny počet blokov",
+                },
+                "max_bloky": {
+                    "type": "integer",
+                    "description": "Maximálny počet blokov",
+                },
+                "understaffed_only": {
+                    "type": "boolean",
+                    "description": "Len poddimenzované lekárne (fte_gap > 0.5)",
+                },
+                "overstaffed_only": {
+                    "type": "boolean",
+                    "description": "Len naddimenzované lekárne (fte_gap < -0.5) - vhodné pre presun personálu",
+                },
+                "sort_by": {
+                    "type": "string",
+                    "description": "Stĺpec pre zoradenie: 'bloky', 'trzby', 'fte_actual', 'productivity_index', 'revenue_at_risk_eur'. Default: 'bloky'",
+                },
+                "sort_desc": {
+                    "type": "boolean",
+                    "description": "Zoradiť zostupne (true=najväčšie prvé). Default: true",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet výsledkov (default 15, max 20)",
+                },
+            },
+        },
+    },
+    {
+        "name": "get_pharmacy_details",
+        "description": "Získaj detaily konkrétnej lekárne vrátane indexovanej produktivity a odporúčaného FTE.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {"type": "integer", "description": "ID lekárne"}
+            },
+            "required": ["pharmacy_id"],
+        },
+    },
+    {
+        "name": "get_pharmacy_revenue_trend",
+        "description": "Získaj historický vývoj tržieb lekárne (2019-2021) vrátane mesačných dát a medziročného rastu (YoY).",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {"type": "integer", "description": "ID lekárne"}
+            },
+            "required": ["pharmacy_id"],
+        },
+    },
+    {
+        "name": "get_segment_position",
+        "description": "Získaj pozíciu lekárne v rámci jej segmentu pre všetky KPI (bloky, tržby, Rx%, FTE, bloky/h, tržby/h, košík, produktivita). Vráti min/max/avg segmentu a percentil lekárne.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {"type": "integer", "description": "ID lekárne"}
+            },
+            "required": ["pharmacy_id"],
+        },
+    },
+    {
+        "name": "simulate_fte",
+        "description": "Simulácia 'čo ak?' - vypočítaj potrebné FTE pri zmene blokov alebo tržieb. Môžeš použiť: 1) s pharmacy_id a percentuálnou zmenou (bloky_change_pct, trzby_change_pct), 2) s pharmacy_id a absolútnymi hodnotami, 3) bez pharmacy_id s absolútnymi hodnotami a typom.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {
+                    "type": "integer",
+                    "description": "ID lekárne (voliteľné - ak nie je zadané, musíš zadať bloky, trzby a typ)",
+                },
+                "bloky": {
+                    "type": "number",
+                    "description": "Absolútny počet blokov (voliteľné)",
+                },
+                "trzby": {
+                    "type": "number",
+                    "description": "Absolútne tržby v EUR (voliteľné)",
+                },
+                "bloky_change_pct": {
+                    "type": "number",
+                    "description": "Percentuálna zmena blokov oproti súčasnosti (napr. 20 pre +20%, -10 pre -10%)",
+                },
+                "trzby_change_pct": {
+                    "type": "number",
+                    "description": "Percentuálna zmena tržieb oproti súčasnosti (napr. 15 pre +15%)",
+                },
+                "typ": {
+                    "type": "string",
+                    "description": "Typ lekárne (A-E), povinné ak nie je pharmacy_id",
+                },
+            },
+            "required": [],
+        },
+    },
+    {
+        "name": "compare_to_peers",
+        "description": "Porovnaj lekáreň s podobnými prevádzkami v segmente pomocou porovnania TRŽIEB. Kritériá: rovnaký segment, tržby ±15%, Rx ratio ±10pp. Vracia similarity_score, benchmarky a insights. Matching by revenue je presnejší než bloky.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "pharmacy_id": {
+                    "type": "integer",
+                    "description": "ID lekárne na porovnanie",
+                },
+                "n_peers": {
+                    "type": "integer",
+                    "description": "Počet podobných lekární (default 10)",
+                },
+                "higher_fte_only": {
+                    "type": "boolean",
+                    "description": "Len lekárne s vyšším FTE - pre hľadanie zdrojov na presun personálu",
+                },
+                "trzby_tolerance": {
+                    "type": "number",
+                    "description": "Tolerancia pre tržby ako desatinné číslo (default 0.15 = ±15%)",
+                },
+                "rx_tolerance": {
+                    "type": "number",
+                    "description": "Tolerancia pre Rx ratio v percentuálnych bodoch (default 0.10 = ±10pp)",
+                },
+            },
+            "required": ["pharmacy_id"],
+        },
+    },
+    {
+        "name": "get_understaffed",
+        "description": "Získaj lekárne s konkrétnym FTE odporúčaním a ohrozenými tržbami v EUR. Vracia presný počet FTE na pridanie a finančný dopad.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "mesto": {
+                    "type": "string",
+                    "description": "Filter podľa mesta/lokality (case-insensitive, partial match). Napr. 'Košice', 'Bratislava'",
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Filter podľa regiónu (napr. RR11)",
+                },
+                "min_gap": {
+                    "type": "number",
+                    "description": "Minimálny FTE deficit (default -0.5)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet výsledkov (default 20)",
+                },
+                "high_risk_only": {
+                    "type": "boolean",
+                    "description": "Len lekárne s ohrozenými tržbami > 0 EUR",
+                },
+                "high_productivity_only": {
+                    "type": "boolean",
+                    "description": "Len lekárne s nadpriemernou produktivitou (index > 100)",
+                },
+                "sort_by": {
+                    "type": "string",
+                    "enum": ["fte_gap", "revenue_at_risk", "productivity"],
+                    "description": "Zoradiť podľa: fte_gap (default), revenue_at_risk, productivity",
+                },
+            },
+        },
+    },
+    {
+        "name": "get_regional_summary",
+        "description": "Získaj súhrnné štatistiky za jeden región.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "region": {
+                    "type": "string",
+                    "description": "Kód regiónu (napr. RR11, RR15)",
+                }
+            },
+            "required": ["region"],
+        },
+    },
+    {
+        "name": "get_all_regions_summary",
+        "description": "Získaj súhrnné štatistiky za VŠETKY regióny naraz. Použiť pri porovnávaní regiónov.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "sort_by": {
+                    "type": "string",
+                    "enum": ["revenue_at_risk", "productivity", "understaffed"],
+                    "description": "Zoradiť podľa: revenue_at_risk (default), productivity, understaffed",
+                }
+            },
+        },
+    },
+    {
+        "name": "generate_report",
+        "description": "Vygeneruj Markdown report s analýzou a odporúčaniami.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string", "description": "Názov reportu"},
+                "pharmacy_ids": {
+                    "type": "array",
+                    "items": {"type": "integer"},
+                    "description": "Zoznam ID lekární na zahrnutie",
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Región pre súhrnné štatistiky",
+                },
+                "include_recommendations": {
+                    "type": "boolean",
+                    "description": "Zahrnúť odporúčania (default true)",
+                },
+            },
+            "required": ["title"],
+        },
+    },
+    {
+        "name": "get_segment_comparison",
+        "description": "Porovnaj výkonnosť všetkých segmentov (A-E). Vráti ohrozené tržby, FTE a produktivitu za segment.",
+        "input_schema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "get_city_summary",
+        "description": "Získaj súhrnné štatistiky za mesto s viacerými lekárňami. Zobrazí aj možnosť presunu personálu.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "mesto": {
+                    "type": "string",
+                    "description": "Názov mesta (napr. 'Košice', 'Bratislava')",
+                }
+            },
+            "required": ["mesto"],
+        },
+    },
+    {
+        "name": "get_cities_pharmacy_count",
+        "description": "Počet lekární v jednotlivých mestách, zoradené zostupne. Použiť pri otázkach 'koľko lekární v mestách', 'mestá s najviac lekárňami'.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "min_count": {
+                    "type": "integer",
+                    "description": "Minimálny počet lekární v meste (default 1)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet miest vo výsledku (default 50)",
+                },
+            },
+        },
+    },
+    {
+        "name": "get_network_overview",
+        "description": "Rýchly prehľad zdravia celej siete lekární. Celkové FTE, ohrozené tržby, % poddimenzovaných.",
+        "input_schema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "get_trend_analysis",
+        "description": "Identifikuj lekárne s významným trendom rastu/poklesu transakcií.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "trend_threshold": {
+                    "type": "number",
+                    "description": "Prahová hodnota trendu v % (default 10)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet lekární v každej kategórii (default 20)",
+                },
+            },
+        },
+    },
+    {
+        "name": "get_priority_actions",
+        "description": "Získaj prioritizovaný zoznam akcií - kombinuje riziko, produktivitu a FTE gap. Odpoveď na 'Čo riešiť najskôr?'",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet akcií (default 10)",
+                }
+            },
+        },
+    },
+    {
+        "name": "get_zastup_analysis",
+        "description": "POVINNÉ pre otázky o zastupe/zástupe! Analýza ZÁSTUPU = personál zapožičaný Z INÝCH lekární. VŽDY použiť ak otázka obsahuje: 'zastup', 'zástup', 'zapožičaný', 'borrowed'. ZASTUP ≠ prebytok! Vracia presné hodnoty zastup_fte a zastup_pct pre každú lekáreň.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "segment": {
+                    "type": "string",
+                    "description": "Filter podľa segmentu (A/B/C/D/E)",
+                },
+                "region": {
+                    "type": "string",
+                    "description": "Filter podľa regiónu (napr. RR11)",
+                },
+                "min_zastup_pct": {
+                    "type": "number",
+                    "description": "Min. podiel zástupu v % (default 5)",
+                },
+                "min_zastup_fte": {
+                    "type": "number",
+                    "description": "Min. zastup v FTE (default 0.1)",
+                },
+                "max_productivity": {
+                    "type": "number",
+                    "description": "Max produktivita index (pre 'nízka produktivita' použiť 100)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet výsledkov (default 20)",
+                },
+            },
+        },
+    },
+    {
+        "name": "get_overstaffed_with_zastup",
+        "description": "⚠️ POVINNÉ pre: 'prebytok + zástup', 'overstaffed + zastup', 'naddimenzované so zástupom'. Kombinovaný nástroj - vracia lekárne s PREBYTKOM FTE a VYSOKÝM ZÁSTUPOM v jednom výstupe. Rieši problém cross-reference medzi dvoma nástrojmi.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "min_zastup_pct": {
+                    "type": "number",
+                    "description": "Min. podiel zástupu v % (default 10)",
+                },
+                "max_productivity": {
+                    "type": "number",
+                    "description": "Max produktivita index (napr. 110 pre 'nízka produktivita')",
+                },
+                "segment": {
+                    "type": "string",
+                    "description": "Filter podľa segmentu (A/B/C/D/E)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Max počet výsledkov (default 20)",
+                },
+            },
+        },
+    },
+    {
+        "name": "get_knowledge",
+        "description": "⚠️ POVINNÉ pre vysvetľovacie otázky: 'ako funguje model', 'výhody aplikácie', 'čo znamená FTE/produktivita', 'prečo...'. Vráti štruktúrované znalosti pre odpoveď používateľovi.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "topic": {
+                    "type": "string",
+                    "enum": [
+                        "model_explanation",
+                        "app_benefits",
+                        "fte_interpretation",
+                        "action_planning",
+                        "faq",
+                    ],
+                    "description": "Téma: model_explanation (ako funguje model), app_benefits (výhody aplikácie), fte_interpretation (FTE, produktivita, gap), action_planning (čo robiť, prioritizácia), faq (časté otázky)",
+                },
+            },
+            "required": ["topic"],
+        },
+    },
+]
+
+
+@dataclass(frozen=True)
+class SanitizedIndex:
+    """Sanitized DataFrame with lookups built once at load time."""
+
+    df: pd.DataFrame
+    by_region: dict  # region_code -> sub-DataFrame
+    by_typ: dict  # typ -> sub-DataFrame
+    id_to_iloc: dict  # pharmacy id -> row position in df
+    # Staffing flags aligned with df.index (kept out of df so they never
+    # leak into tool output)
+    understaffed: pd.Series  # fte_gap > FTE_GAP_NOTABLE
+    overstaffed: pd.Series  # fte_gap < -FTE_GAP_NOTABLE
+    urgent: pd.Series  # understaffed with revenue at risk (same criteria as app)
+    mesto_lc: pd.Series  # lowercased mesto for literal substring search
+    columns: dict  # column name -> list of native Python values, for row dicts
+    # LRU of (tool name, canonical params) -> result string, see
+    # CACHEABLE_TOOLS. Lives on the index so a reloaded CSV starts with an
+    # empty cache; shared by every agent, hence the lock.
+    tool_results: OrderedDict = field(default_factory=OrderedDict)
+    tool_results_lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def mesto_contains(self, mesto: str) -> pd.Series:
+        """Case-insensitive literal substring match on mesto."""
+        return self.mesto_lc.str.contains(mesto.lower(), regex=False)
+
+    def get_tool_result(self, key: tuple) -> Optional[str]:
+        """Cached tool result for key, or None."""
+        with self.tool_results_lock:
+            result = self.tool_results.get(key)
+            if result is not None:
+                self.tool_results.move_to_end(key)
+            return result
+
+    def put_tool_result(self, key: tuple, result: str) -> None:
+        """Store a tool result, evicting the least recently used past TOOL_CACHE_SIZE."""
+        with self.tool_results_lock:
+            self.tool_results[key] = result
+            self.tool_results.move_to_end(key)
+            if len(self.tool_results) > TOOL_CACHE_SIZE:
+                self.tool_results.popitem(last=False)
+
+
+# Bound on cached tool results per loaded index (LRU)
+TOOL_CACHE_SIZE = 128
+
+# Tools whose output depends only on the sanitized data and their arguments
+CACHEABLE_TOOLS = frozenset(
+    {
+        "get_network_overview",
+        "get_all_regions_summary",
+        "get_segment_comparison",
+        "get_regional_summary",
+        "get_cities_pharmacy_count",
+    }
+)
+
+# Tools nearly every plan calls; analyze_sync computes them into the tool
+# cache while the architect call is in flight
+PREFETCH_TOOLS = ("get_network_overview", "get_all_regions_summary")
+
+
+# Narrow dtypes for the cached frame: integer columns fit in 32/16 bits and
+# the low-cardinality keys become categoricals. FTE and revenue floats stay
+# float64 because they are rounded and shown to users.
+SANITIZED_DTYPES = {
+    "id": "int32",
+    "bloky": "int32",
+    "revenue_at_risk_eur": "int32",
+    "productivity_index": "int16",
+    "productivity_percentile": "int16",
+    "bloky_index": "int16",
+    "trzby_index": "int16",
+    "typ": "category",
+    "region_code": "category",
+}
+
+
+@functools.lru_cache(maxsize=4)
+def _load_sanitized(path_str: str, mtime_ns: int) -> SanitizedIndex:
+    """Load sanitized data once per (data dir, CSV mtime).
+
+    Cloud Run may create a fresh DrMaxAgent per request; keying on the CSV
+    mtime lets them share one DataFrame until the file is regenerated.
+    """
+    df = generate_sanitized_data(Path(path_str))
+    df = df.astype({col: dtype for col, dtype in SANITIZED_DTYPES.items() if col in df.columns})
+    understaffed = df["fte_gap"] > FTE_GAP_NOTABLE  # Positive gap = understaffed
+    return SanitizedIndex(
+        df=df,
+        by_region=dict(list(df.groupby("region_code", observed=True))),
+        by_typ=dict(list(df.groupby("typ", observed=True))),
+        id_to_iloc={int(v): i for i, v in enumerate(df["id"].to_numpy())},
+        understaffed=understaffed,
+        overstaffed=df["fte_gap"] < -FTE_GAP_NOTABLE,  # Negative gap = overstaffed
+        urgent=understaffed & (df["revenue_at_risk_eur"] > 0),
+        mesto_lc=df["mesto"].str.lower().fillna(""),
+        columns={col: df[col].tolist() for col in df.columns},
+    )
+
+
+# Fixed closing section of tool_generate_report
+REPORT_RECOMMENDATIONS_MD = """## Odporúčania
+
+1. Prioritizovať lekárne s najvyššími ohrozenými tržbami
+2. Zvážiť prerozdelenie z naddimenzovaných prevádzok
+3. Pri vysokom raste (+15%) proaktívne navýšiť personál
+"""
+
+NETWORK_TOTAL_COLUMNS = ["fte_actual", "fte_recommended", "fte_gap", "bloky", "trzby"]
+
+REGION_STAT_COLUMNS = ["fte_actual", "productivity_index", "bloky", "revenue_at_risk_eur"]
+
+PEER_STAT_COLUMNS = [
+    "fte_actual", "fte_recommended", "productivity_index", "fte_gap", "trzby", "bloky",
+]
+
+# Per-pharmacy fields listed by tool_get_city_summary, in output order
+CITY_PHARMACY_COLUMNS = [
+    "id",
+    "mesto",
+    "typ",
+    "fte_actual",
+    "fte_recommended",
+    "fte_gap",
+    "revenue_at_risk_eur",
+    "productivity_index",
+]
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def _group_sums(codes: np.ndarray, n_groups: int, values: np.ndarray) -> np.ndarray:
+        """Sum each column of ``values`` into the group given by ``codes``.
+
+        A single pass over the rows; serial on purpose, since parallel
+        row chunks would race on the shared per-group accumulators.
+        """
+        out = np.zeros((n_groups, values.shape[1]))
+        for i in range(codes.shape[0]):
+            g = codes[i]
+            for j in range(values.shape[1]):
+                out[g, j] += values[i, j]
+        return out
+
+else:
+
+    def _group_sums(codes: np.ndarray, n_groups: int, values: np.ndarray) -> np.ndarray:
+        """Sum each column of ``values`` into the group given by ``codes``."""
+        return np.column_stack(
+            [
+                np.bincount(codes, weights=values[:, j], minlength=n_groups)
+                for j in range(values.shape[1])
+            ]
+        )
+
+
+def _staffing_group_stats(index: SanitizedIndex, key: str) -> pd.DataFrame:
+    """Per-group staffing totals for the all-regions and segment tools.
+
+    Stacks the summed columns (including the precomputed flags) into one
+    float matrix and reduces it per group in a single pass, instead of
+    masking the frame three times per group. Weighted columns
+    (``prod_fte``, ``trend_fte``) are sums to be divided by ``total_fte``.
+    """
+    df = index.df
+    codes, groups = pd.factorize(df[key], sort=True)
+    fte = df["fte_actual"].to_numpy(np.float64)
+    risk = df["revenue_at_risk_eur"].to_numpy(np.float64)
+    urgent = index.urgent.to_numpy()
+    columns = {
+        "pharmacy_count": np.ones(len(df)),
+        "total_fte": fte,
+        "total_fte_recommended": df["fte_recommended"].to_numpy(np.float64),
+        "total_trzby": df["trzby"].to_numpy(np.float64),
+        "total_bloky": df["bloky"].to_numpy(np.float64),
+        "understaffed_count": index.understaffed.to_numpy(np.float64),
+        "overstaffed_count": index.overstaffed.to_numpy(np.float64),
+        "urgent_count": urgent.astype(np.float64),
+        "urgent_risk": np.where(urgent, risk, 0.0),
+        "prod_fte": df["productivity_index"].to_numpy(np.float64) * fte,
+        "trend_fte": df["bloky_trend"].to_numpy(np.float64) * fte,
+    }
+    values = np.column_stack(list(columns.values()))
+    # Rows with a missing key get code -1; drop them like groupby does
+    keyed = codes >= 0
+    sums = _group_sums(codes[keyed], len(groups), values[keyed])
+    stats = pd.DataFrame(sums, index=np.asarray(groups), columns=list(columns))
+    stats["avg_bloky"] = stats["total_bloky"] / stats["pharmacy_count"]
+    stats["avg_trzby"] = stats["total_trzby"] / stats["pharmacy_count"]
+    return stats
+
+
+def _top_k_desc(values: np.ndarray, k: int) -> np.ndarray:
+    """Row positions of the k largest values, descending, ties in row order.
+
+    Same positions as ``np.argsort(-values, kind="stable")[:k]``, found with
+    an O(n) ``np.partition`` plus a sort of the k selected values only. If k
+    does not cut the array, or values has NaNs, the whole stable order comes
+    back and the caller's ``[:k]`` slice trims it.
+    """
+    n = len(values)
+    if not 0 < k < n or np.isnan(values).any():
+        return np.argsort(-values, kind="stable")
+    kth = np.partition(values, n - k)[n - k]  # k-th largest value
+    above = np.flatnonzero(values > kth)
+    top = np.concatenate([above, np.flatnonzero(values == kth)[: k - len(above)]])
+    return top[np.argsort(-values[top], kind="stable")]
+
+
 class DrMaxAgent:
     """
     Autonomous agent for pharmacy staffing analysis.
@@ -734,27 +1531,61 @@ class DrMaxAgent:
         self.config = AgentConfig()
 
         if ANTHROPIC_AVAILABLE:
-            import httpx
-
-            # Configure longer timeouts for Cloud Run
+            # Configure longer timeouts for Cloud Run (streamed calls override
+            # the read timeout per request, see _stream_message)
             self.client = Anthropic(
                 timeout=httpx.Timeout(120.0, connect=30.0), max_retries=2
             )
+            # analyze() is a coroutine; the async client keeps it off the loop thread
+            self.async_client = AsyncAnthropic(
+                timeout=httpx.Timeout(120.0, connect=30.0), max_retries=2
+            )
         else:
             self.client = None
+            self.async_client = None
 
         # Lazy-load sanitized data (includes predictions from CSV)
-        self._sanitized_df = None
+        self._sanitized_index = None
+
+        # Validated architect plans, keyed by normalized question
+        self._plan_cache = PlanCache()
+
+        # Dispatch table built once; every allowed tool must be implemented
+        self._tools = self._get_tool_map()
+        missing_tools = ALLOWED_TOOLS - self._tools.keys()
+        if missing_tools:
+            raise RuntimeError(f"Tools without implementation: {sorted(missing_tools)}")
+
+    @property
+    def data_index(self) -> SanitizedIndex:
+        """Lazy-load sanitized data together with its id/region/typ lookups."""
+        if self._sanitized_index is None:
+            csv_path = Path(self.data_path) / "ml_ready_v3.csv"
+            self._sanitized_index = _load_sanitized(
+                str(self.data_path), os.stat(csv_path).st_mtime_ns
+            )
+        return self._sanitized_index
 
     @property
     def sanitized_data(self):
         """Lazy-load sanitized data (includes predictions from CSV)."""
-        if self._sanitized_df is None:
-            self._sanitized_df = generate_sanitized_data(self.data_path)
-        return self._sanitized_df
+        return self.data_index.df
+
+    def _pharmacy_row(self, pharmacy_id: int) -> Optional[dict]:
+        """Return the sanitized row for a pharmacy as a dict, or None if unknown.
+
+        Built from the per-column value lists, so no intermediate Series
+        is created and every value is already a native Python scalar.
+        """
+        index = self.data_index
+        iloc = index.id_to_iloc.get(pharmacy_id)
+        if iloc is None:
+            return None
+        return {col: values[iloc] for col, values in index.columns.items()}
 
     # === TOOL IMPLEMENTATIONS ===
 
+    @coerce_args
     def tool_search_pharmacies(
         self,
         mesto: str = None,
@@ -769,29 +1600,28 @@ class DrMaxAgent:
         limit: int = 15,
     ) -> dict:
         """Search pharmacies with filters."""
-        # Ensure types (AI might pass strings)
-        if min_bloky is not None:
-            min_bloky = int(min_bloky)
-        if max_bloky is not None:
-            max_bloky = int(max_bloky)
-        limit = int(limit) if limit is not None else 10
-
-        df = self.sanitized_data.copy()
+        # Masks and sort_values return new frames, so no defensive copy
+        index = self.data_index
+        df = index.df
 
+        # Combine filters into one mask over the full frame, which also lets
+        # the precomputed staffing flags apply without reindexing
+        mask = pd.Series(True, index=df.index)
         if mesto:
-            df = df[df["mesto"].str.contains(mesto, case=False, na=False)]
+            mask &= index.mesto_contains(mesto)
         if typ:
-            df = df[df["typ"].str.contains(typ, case=False)]
+            mask &= df["typ"].str.contains(typ, case=False)
         if region:
-            df = df[df["region_code"] == region]
+            mask &= df["region_code"] == region
         if min_bloky:
-            df = df[df["bloky"] >= min_bloky]
+            mask &= df["bloky"] >= min_bloky
         if max_bloky:
-            df = df[df["bloky"] <= max_bloky]
+            mask &= df["bloky"] <= max_bloky
         if understaffed_only:
-            df = df[df["fte_gap"] > FTE_GAP_NOTABLE]  # Positive gap = understaffed (need more FTE)
+            mask &= index.understaffed  # Positive gap = understaffed (need more FTE)
         if overstaffed_only:
-            df = df[df["fte_gap"] < -FTE_GAP_NOTABLE]  # Negative gap = overstaffed (excess FTE)
+            mask &= index.overstaffed  # Negative gap = overstaffed (excess FTE)
+        df = df[mask]
 
         # Sort by specified column (default: bloky descending for "top/najväčšie" queries)
         if sort_by and sort_by in df.columns:
@@ -807,21 +1637,19 @@ class DrMaxAgent:
             {"count": len(df), "pharmacies": df.to_dict("records")}
         )
 
+    @coerce_args
     def tool_get_pharmacy_details(self, pharmacy_id: int) -> dict:
         """Get details for a specific pharmacy."""
-        # Ensure pharmacy_id is int (AI might pass string)
-        pharmacy_id = int(pharmacy_id)
-        df = self.sanitized_data
-        pharmacy = df[df["id"] == pharmacy_id]
+        pharmacy = self._pharmacy_row(pharmacy_id)
 
-        if pharmacy.empty:
+        if pharmacy is None:
             raise DataNotFoundError(
                 f"Pharmacy {pharmacy_id} not found",
                 tool_name="get_pharmacy_details",
                 hint="Use search_pharmacies to find valid pharmacy IDs",
             )
 
-        result = pharmacy.iloc[0].to_dict()
+        result = pharmacy
 
         # Round FTE values for clarity (avoid AI confusion from long decimals)
         result["fte_actual"] = round(result.get("fte_actual", 0), 1)
@@ -856,12 +1684,9 @@ class DrMaxAgent:
         # P3: Validate output schema
         return validate_pharmacy_output(result)
 
+    @coerce_args
     def tool_get_pharmacy_revenue_trend(self, pharmacy_id: int) -> dict:
         """Get historical revenue trend data for a pharmacy (2019-2021)."""
-        import pandas as pd
-
-        pharmacy_id = int(pharmacy_id)
-
         # Check if revenue data files exist
         if not REVENUE_MONTHLY_PATH.exists() or not REVENUE_ANNUAL_PATH.exists():
             raise DataNotFoundError(
@@ -917,8 +1742,8 @@ class DrMaxAgent:
             )
 
         # Get pharmacy name from sanitized data
-        pharmacy = self.sanitized_data[self.sanitized_data["id"] == pharmacy_id]
-        mesto = pharmacy.iloc[0]["mesto"] if not pharmacy.empty else "Neznáme"
+        pharmacy = self._pharmacy_row(pharmacy_id)
+        mesto = pharmacy["mesto"] if pharmacy is not None else "Neznáme"
 
         return {
             "pharmacy_id": pharmacy_id,
@@ -941,18 +1766,16 @@ class DrMaxAgent:
             ),
         }
 
+    @coerce_args
     def tool_get_segment_position(self, pharmacy_id: int) -> dict:
         """Get pharmacy's position within its segment for all KPIs."""
-        pharmacy_id = int(pharmacy_id)
-        df = self.sanitized_data
-        pharmacy = df[df["id"] == pharmacy_id]
+        p = self._pharmacy_row(pharmacy_id)
 
-        if pharmacy.empty:
+        if p is None:
             return {"error": f"Lekáreň {pharmacy_id} nenájdená"}
 
-        p = pharmacy.iloc[0]
         typ = p["typ"]
-        segment_data = df[df["typ"] == typ].copy()
+        segment_data = self.data_index.by_typ[typ].copy()
 
         # Constants for hourly calculations
         HOURS_PER_FTE_YEAR = 2112  # 176 hours/month * 12
@@ -1085,6 +1908,7 @@ class DrMaxAgent:
             "_summary": f"Lekáreň {pharmacy_id} ({p['mesto']}) v segmente {typ} ({len(segment_data)} lekární)",
         }
 
+    @coerce_args
     def tool_simulate_fte(
         self,
         pharmacy_id: int = None,
@@ -1103,14 +1927,11 @@ class DrMaxAgent:
         """
         # If pharmacy_id provided, get current values as base
         if pharmacy_id is not None:
-            pharmacy_id = int(pharmacy_id)
-            df = self.sanitized_data
-            pharmacy = df[df["id"] == pharmacy_id]
+            p = self._pharmacy_row(pharmacy_id)
 
-            if pharmacy.empty:
+            if p is None:
                 return {"error": f"Lekáreň {pharmacy_id} nenájdená"}
 
-            p = pharmacy.iloc[0]
             base_bloky = p["bloky"]
             base_trzby = p["trzby"]
             base_typ = p["typ"]
@@ -1122,14 +1943,14 @@ class DrMaxAgent:
             if bloky_change_pct is not None:
                 sim_bloky = base_bloky * (1 + bloky_change_pct / 100)
             elif bloky is not None:
-                sim_bloky = float(bloky)
+                sim_bloky = bloky
             else:
                 sim_bloky = base_bloky
 
             if trzby_change_pct is not None:
                 sim_trzby = base_trzby * (1 + trzby_change_pct / 100)
             elif trzby is not None:
-                sim_trzby = float(trzby)
+                sim_trzby = trzby
             else:
                 sim_trzby = base_trzby
 
@@ -1141,8 +1962,8 @@ class DrMaxAgent:
             if bloky is None or trzby is None:
                 return {"error": "Bez pharmacy_id musíš zadať bloky aj trzby"}
 
-            sim_bloky = float(bloky)
-            sim_trzby = float(trzby)
+            sim_bloky = bloky
+            sim_trzby = trzby
             sim_typ = typ if typ else "B - shopping"
             sim_rx = 0.5
             base_bloky = None
@@ -1223,6 +2044,7 @@ class DrMaxAgent:
 
         return response
 
+    @coerce_args
     def tool_compare_to_peers(
         self, pharmacy_id: int, n_peers: int = 10, higher_fte_only: bool = False,
         trzby_tolerance: float = 0.15, rx_tolerance: float = 0.10
@@ -1241,25 +2063,17 @@ class DrMaxAgent:
         100 - (40 × |trzby_diff_%| + 30 × |rx_diff| + 10 × |bloky_diff_%|)
         Higher score = more similar peer
         """
-        # Ensure types (AI might pass strings)
-        pharmacy_id = int(pharmacy_id)
-        n_peers = int(n_peers)
-        trzby_tolerance = float(trzby_tolerance)
-        rx_tolerance = float(rx_tolerance)
-        df = self.sanitized_data
-
         # Get target pharmacy
-        target = df[df["id"] == pharmacy_id]
-        if target.empty:
+        target = self._pharmacy_row(pharmacy_id)
+        if target is None:
             return {"error": f"Pharmacy {pharmacy_id} not found"}
 
-        target = target.iloc[0]
         target_bloky = target["bloky"]
         target_trzby = target["trzby"]
         target_rx = target.get("podiel_rx", 0.5)  # Default to 50% if not available
 
         # Find peers in same segment with similar REVENUE (trzby)
-        same_segment = df[df["typ"] == target["typ"]]
+        same_segment = self.data_index.by_typ[target["typ"]]
         trzby_min = target_trzby * (1 - trzby_tolerance)
         trzby_max = target_trzby * (1 + trzby_tolerance)
 
@@ -1294,18 +2108,23 @@ class DrMaxAgent:
         )
         peers["similarity_score"] = peers["similarity_score"].clip(lower=0)
 
-        # Sort by similarity (highest first) and limit
-        peers = peers.sort_values("similarity_score", ascending=False).head(n_peers)
+        # Top n_peers by similarity (highest first); a partial selection
+        # instead of sorting every candidate
+        peers = peers.nlargest(n_peers, "similarity_score")
 
         # Calculate peer statistics
         peer_count = len(peers)
         if peer_count > 0:
-            avg_fte = round(peers["fte_actual"].mean(), 1)
-            avg_fte_recommended = round(peers["fte_recommended"].mean(), 1)
-            avg_productivity = int(peers["productivity_index"].mean())
-            avg_gap = round(peers["fte_gap"].mean(), 1)
-            avg_trzby = int(peers["trzby"].mean())
-            avg_bloky = int(peers["bloky"].mean())
+            # One column-wise mean over the raw block instead of six Series.mean()
+            fte, fte_rec, prod, gap, trzby, bloky = (
+                peers[PEER_STAT_COLUMNS].to_numpy(np.float64).mean(axis=0)
+            )
+            avg_fte = round(fte, 1)
+            avg_fte_recommended = round(fte_rec, 1)
+            avg_productivity = int(prod)
+            avg_gap = round(gap, 1)
+            avg_trzby = int(trzby)
+            avg_bloky = int(bloky)
 
             # Comparison with target
             fte_vs_peers = round(target["fte_actual"] - avg_fte, 1)
@@ -1399,6 +2218,7 @@ class DrMaxAgent:
             "_summary": f"Porovnanie s {peer_count} podobnými lekárňami v segmente {target['typ']} (tržby ±{int(trzby_tolerance*100)}%, Rx ±{int(rx_tolerance*100)}pp)",
         }
 
+    @coerce_args
     def tool_get_understaffed(
         self,
         mesto: str = None,
@@ -1410,30 +2230,30 @@ class DrMaxAgent:
         sort_by: str = "fte_gap",
     ) -> dict:
         """Get list of understaffed pharmacies with optional filters."""
-        # Ensure types (AI might pass strings)
-        min_gap = float(min_gap) if min_gap is not None else -0.5
-        limit = int(limit) if limit is not None else 20
-        df = self.sanitized_data.copy()
+        index = self.data_index
+        df = index.df
 
         # Filter understaffed (positive gap = understaffed)
         # Note: min_gap parameter is now interpreted as minimum positive gap
-        df = df[df["fte_gap"] > abs(min_gap)]
+        mask = df["fte_gap"] > abs(min_gap)
 
         # Filter by mesto (city) if specified
         if mesto:
-            df = df[df["mesto"].str.contains(mesto, case=False, na=False)]
+            mask &= index.mesto_contains(mesto)
 
         # Filter by region if specified
         if region:
-            df = df[df["region_code"] == region]
+            mask &= df["region_code"] == region
 
         # Filter high risk only (revenue_at_risk > 0)
         if high_risk_only:
-            df = df[df["revenue_at_risk_eur"] > 0]
+            mask &= df["revenue_at_risk_eur"] > 0
 
         # Filter high productivity only (index > 100)
         if high_productivity_only:
-            df = df[df["productivity_index"] > 100]
+            mask &= df["productivity_index"] > 100
+
+        df = df[mask]
 
         # Sort by specified field
         if sort_by == "revenue_at_risk":
@@ -1456,89 +2276,63 @@ class DrMaxAgent:
 
     def tool_get_regional_summary(self, region: str) -> dict:
         """Get summary statistics for a region."""
-        df = self.sanitized_data
-        region_df = df[df["region_code"] == region]
+        region_df = self.data_index.by_region.get(region)
 
-        if region_df.empty:
+        if region_df is None:
             raise DataNotFoundError(
                 f"Region {region} not found",
                 tool_name="get_regional_summary",
                 hint="Use get_all_regions_summary to see available regions",
             )
 
-        understaffed = region_df[
-            region_df["fte_gap"] > FTE_GAP_NOTABLE
-        ]  # Positive gap = understaffed
-        overstaffed = region_df[
-            region_df["fte_gap"] < -FTE_GAP_NOTABLE
-        ]  # Negative gap = overstaffed
+        index = self.data_index
+        rows = region_df.index
+        understaffed = index.understaffed[rows].to_numpy()  # Positive gap = understaffed
+        overstaffed = index.overstaffed[rows].to_numpy()  # Negative gap = overstaffed
         # Urgent: understaffed + revenue at risk (same criteria as app)
-        urgent = region_df[
-            (region_df["fte_gap"] > FTE_GAP_NOTABLE) & (region_df["revenue_at_risk_eur"] > 0)
-        ]
+        urgent = index.urgent[rows].to_numpy()
+
+        # Raw numeric block; reductions below are plain numpy calls
+        arr = region_df[REGION_STAT_COLUMNS].to_numpy(np.float64)
+        fte = arr[:, 0]
 
         # FTE-weighted productivity
-        total_fte = region_df["fte_actual"].sum()
-        weighted_prod = (
-            (region_df["productivity_index"] * region_df["fte_actual"]).sum()
-            / total_fte
-            if total_fte > 0
-            else 100
-        )
+        total_fte = np.add.reduce(fte)
+        weighted_prod = np.dot(fte, arr[:, 1]) / total_fte if total_fte > 0 else 100
 
         return {
             "region": region,
             "pharmacy_count": len(region_df),
-            "total_fte": round(region_df["fte_actual"].sum(), 1),
-            "total_bloky": int(region_df["bloky"].sum()),
-            "understaffed_count": len(understaffed),
-            "overstaffed_count": len(overstaffed),
-            "urgent_count": len(urgent),  # Matches app's urgent criteria
-            "total_revenue_at_risk_eur": int(urgent["revenue_at_risk_eur"].sum()),
+            "total_fte": round(total_fte, 1),
+            "total_bloky": int(np.add.reduce(arr[:, 2])),
+            "understaffed_count": int(np.count_nonzero(understaffed)),
+            "overstaffed_count": int(np.count_nonzero(overstaffed)),
+            "urgent_count": int(np.count_nonzero(urgent)),  # Matches app's urgent criteria
+            "total_revenue_at_risk_eur": int(np.add.reduce(arr[urgent, 3])),
             "avg_productivity_index": int(weighted_prod),  # FTE-weighted
-            "types": region_df["typ"].value_counts().to_dict(),
+            # astype(str): categorical value_counts would list absent types too
+            "types": region_df["typ"].astype(str).value_counts().to_dict(),
         }
 
     def tool_get_all_regions_summary(self, sort_by: str = "revenue_at_risk") -> dict:
         """Get summary statistics for ALL regions at once."""
-        df = self.sanitized_data
-        regions = df["region_code"].unique()
+        stats = _staffing_group_stats(self.data_index, "region_code")
 
         summaries = []
-        for region in sorted(regions):
-            region_df = df[df["region_code"] == region]
-            understaffed = region_df[
-                region_df["fte_gap"] > FTE_GAP_NOTABLE
-            ]  # Positive gap = understaffed
-            overstaffed = region_df[
-                region_df["fte_gap"] < -FTE_GAP_NOTABLE
-            ]  # Negative gap = overstaffed
-            # Urgent: understaffed + revenue at risk (same criteria as app)
-            urgent = region_df[
-                (region_df["fte_gap"] > FTE_GAP_NOTABLE) & (region_df["revenue_at_risk_eur"] > 0)
-            ]
-
+        for region, g in zip(stats.index, stats.itertuples(index=False)):
             # FTE-weighted productivity
-            total_fte = region_df["fte_actual"].sum()
-            weighted_prod = (
-                (region_df["productivity_index"] * region_df["fte_actual"]).sum()
-                / total_fte
-                if total_fte > 0
-                else 100
-            )
+            weighted_prod = g.prod_fte / g.total_fte if g.total_fte > 0 else 100
 
             summaries.append(
                 {
                     "region": region,
-                    "pharmacy_count": len(region_df),
-                    "total_fte_actual": round(region_df["fte_actual"].sum(), 1),
-                    "total_fte_recommended": round(
-                        region_df["fte_recommended"].sum(), 1
-                    ),
-                    "understaffed_count": len(understaffed),
-                    "overstaffed_count": len(overstaffed),
-                    "urgent_count": len(urgent),  # Matches app's urgent criteria
-                    "revenue_at_risk_eur": int(urgent["revenue_at_risk_eur"].sum()),
+                    "pharmacy_count": int(g.pharmacy_count),
+                    "total_fte_actual": round(g.total_fte, 1),
+                    "total_fte_recommended": round(g.total_fte_recommended, 1),
+                    "understaffed_count": int(g.understaffed_count),
+                    "overstaffed_count": int(g.overstaffed_count),
+                    "urgent_count": int(g.urgent_count),  # Matches app's urgent criteria
+                    "revenue_at_risk_eur": int(g.urgent_risk),
                     "avg_productivity_index": int(weighted_prod),  # FTE-weighted
                 }
             )
@@ -1559,6 +2353,7 @@ class DrMaxAgent:
             "regions": summaries,
         }
 
+    @coerce_args
     def tool_generate_report(
         self,
         title: str,
@@ -1588,28 +2383,27 @@ class DrMaxAgent:
             lines.append("| ID | Mesto | Typ | FTE | Rozdiel | Produktivita |")
             lines.append("|---|---|---|---|---|---|")
 
-            for pid in pharmacy_ids:
-                p = self.tool_get_pharmacy_details(pid)
-                if "error" not in p:
-                    lines.append(
-                        f"| {p['id']} | {p['mesto']} | {p['typ']} | "
-                        f"{p.get('fte_actual', 0):.1f} | "
-                        f"{p.get('fte_gap', 0):+.1f} | "
-                        f"index {p['productivity_index']} |"
-                    )
+            # Gather all rows at once and format column-wise; unknown IDs are skipped
+            index = self.data_index
+            ilocs = [
+                index.id_to_iloc[pid]
+                for pid in map(int, pharmacy_ids)
+                if pid in index.id_to_iloc
+            ]
+            rows = index.df.iloc[ilocs]
+            lines.extend(
+                "| " + rows["id"].astype(str)
+                + " | " + rows["mesto"].astype(str)
+                + " | " + rows["typ"].astype(str)
+                + " | " + rows["fte_actual"].map("{:.1f}".format)
+                + " | " + rows["fte_gap"].map("{:+.1f}".format)
+                + " | index " + rows["productivity_index"].astype(str)
+                + " |"
+            )
             lines.append("")
 
         if include_recommendations:
-            lines.extend(
-                [
-                    "## Odporúčania",
-                    "",
-                    "1. Prioritizovať lekárne s najvyššími ohrozenými tržbami",
-                    "2. Zvážiť prerozdelenie z naddimenzovaných prevádzok",
-                    "3. Pri vysokom raste (+15%) proaktívne navýšiť personál",
-                    "",
-                ]
-            )
+            lines.append(REPORT_RECOMMENDATIONS_MD)
 
         report_content = "\n".join(lines)
 
@@ -1621,55 +2415,36 @@ class DrMaxAgent:
 
     def tool_get_segment_comparison(self) -> dict:
         """Compare performance across all segments (A-E)."""
-        df = self.sanitized_data
-        segments = df["typ"].unique()
+        stats = _staffing_group_stats(self.data_index, "typ")
 
         summaries = []
-        for segment in sorted(segments):
-            seg_df = df[df["typ"] == segment]
-            understaffed = seg_df[
-                seg_df["fte_gap"] > FTE_GAP_NOTABLE
-            ]  # Positive gap = understaffed
-            overstaffed = seg_df[seg_df["fte_gap"] < -FTE_GAP_NOTABLE]  # Negative gap = overstaffed
-            # Urgent: understaffed + revenue at risk (same criteria as app)
-            urgent = seg_df[
-                (seg_df["fte_gap"] > FTE_GAP_NOTABLE) & (seg_df["revenue_at_risk_eur"] > 0)
-            ]
-
-            # FTE-weighted productivity (more accurate than simple average)
-            total_fte = seg_df["fte_actual"].sum()
-            weighted_prod = (
-                (seg_df["productivity_index"] * seg_df["fte_actual"]).sum() / total_fte
-                if total_fte > 0
-                else 100
-            )
-
-            # Average growth (bloky_trend) - FTE-weighted
-            weighted_trend = (
-                (seg_df["bloky_trend"] * seg_df["fte_actual"]).sum() / total_fte
-                if total_fte > 0
-                else 0
-            )
+        for segment, g in zip(stats.index, stats.itertuples(index=False)):
+            # FTE-weighted productivity and growth (more accurate than simple average)
+            if g.total_fte > 0:
+                weighted_prod = g.prod_fte / g.total_fte
+                weighted_trend = g.trend_fte / g.total_fte
+            else:
+                weighted_prod, weighted_trend = 100, 0
 
             summaries.append(
                 {
                     "segment": segment,
-                    "pharmacy_count": len(seg_df),
-                    "total_trzby": int(seg_df["trzby"].sum()),
-                    "total_fte_actual": round(seg_df["fte_actual"].sum(), 1),
-                    "total_fte_recommended": round(seg_df["fte_recommended"].sum(), 1),
-                    "understaffed_count": len(understaffed),
-                    "overstaffed_count": len(overstaffed),
-                    "urgent_count": len(urgent),  # Matches app's urgent criteria
-                    "revenue_at_risk_eur": int(urgent["revenue_at_risk_eur"].sum()),
+                    "pharmacy_count": int(g.pharmacy_count),
+                    "total_trzby": int(g.total_trzby),
+                    "total_fte_actual": round(g.total_fte, 1),
+                    "total_fte_recommended": round(g.total_fte_recommended, 1),
+                    "understaffed_count": int(g.understaffed_count),
+                    "overstaffed_count": int(g.overstaffed_count),
+                    "urgent_count": int(g.urgent_count),  # Matches app's urgent criteria
+                    "revenue_at_risk_eur": int(g.urgent_risk),
                     "avg_productivity_index": int(
                         weighted_prod
                     ),  # FTE-weighted average
                     "avg_bloky_trend_pct": round(
                         weighted_trend * 100, 1
                     ),  # FTE-weighted, as %
-                    "avg_bloky": int(seg_df["bloky"].mean()),
-                    "avg_trzby": int(seg_df["trzby"].mean()),
+                    "avg_bloky": int(g.avg_bloky),
+                    "avg_trzby": int(g.avg_trzby),
                 }
             )
 
@@ -1685,8 +2460,10 @@ class DrMaxAgent:
 
     def tool_get_city_summary(self, mesto: str) -> dict:
         """Get aggregate statistics for a city with multiple pharmacies."""
-        df = self.sanitized_data
-        city_df = df[df["mesto"].str.contains(mesto, case=False, na=False)]
+        index = self.data_index
+        df = index.df
+        in_city = index.mesto_contains(mesto)
+        city_df = df[in_city]
 
         if city_df.empty:
             raise DataNotFoundError(
@@ -1695,28 +2472,18 @@ class DrMaxAgent:
                 hint="Use get_cities_pharmacy_count to see available cities",
             )
 
-        understaffed = city_df[city_df["fte_gap"] > FTE_GAP_NOTABLE]  # Positive gap = understaffed
-        overstaffed = city_df[city_df["fte_gap"] < -FTE_GAP_NOTABLE]  # Negative gap = overstaffed
+        understaffed = df[in_city & index.understaffed]  # Positive gap = understaffed
+        overstaffed = df[in_city & index.overstaffed]  # Negative gap = overstaffed
         # Urgent: understaffed + revenue at risk (same criteria as app)
-        urgent = city_df[
-            (city_df["fte_gap"] > FTE_GAP_NOTABLE) & (city_df["revenue_at_risk_eur"] > 0)
-        ]
+        urgent = df[in_city & index.urgent]
 
-        # Get list of pharmacies in the city
-        pharmacies = []
-        for _, row in city_df.iterrows():
-            pharmacies.append(
-                {
-                    "id": int(row["id"]),
-                    "mesto": row["mesto"],
-                    "typ": row["typ"],
-                    "fte_actual": round(row["fte_actual"], 1),
-                    "fte_recommended": round(row["fte_recommended"], 1),
-                    "fte_gap": round(row["fte_gap"], 1),
-                    "revenue_at_risk_eur": int(row["revenue_at_risk_eur"]),
-                    "productivity_index": int(row["productivity_index"]),
-                }
-            )
+        # Get list of pharmacies in the city (cast column-wise, not per row)
+        sub = city_df[CITY_PHARMACY_COLUMNS].copy()
+        int_cols = ["id", "revenue_at_risk_eur", "productivity_index"]
+        fte_cols = ["fte_actual", "fte_recommended", "fte_gap"]
+        sub[int_cols] = sub[int_cols].astype(int)
+        sub[fte_cols] = sub[fte_cols].round(1)
+        pharmacies = sub.to_dict("records")
 
         # FTE-weighted productivity
         total_fte = city_df["fte_actual"].sum()
@@ -1741,6 +2508,7 @@ class DrMaxAgent:
             "transfer_possible": len(understaffed) > 0 and len(overstaffed) > 0,
         }
 
+    @coerce_args
     def tool_get_cities_pharmacy_count(
         self, min_count: int = 1, limit: int = 50
     ) -> dict:
@@ -1757,7 +2525,8 @@ class DrMaxAgent:
                     return str(mesto).split(" - ")[0].strip()
                 return str(mesto).strip()
 
-            df["city"] = df["mesto"].apply(extract_city)
+            # assign() keeps the shared cached frame unmodified
+            df = df.assign(city=df["mesto"].apply(extract_city))
 
         city_counts = df["city"].value_counts()
 
@@ -1784,22 +2553,29 @@ class DrMaxAgent:
 
     def tool_get_network_overview(self) -> dict:
         """Get quick health snapshot of the entire pharmacy network."""
-        df = self.sanitized_data
+        index = self.data_index
+        df = index.df
+        n = len(df)
 
-        understaffed = df[df["fte_gap"] > FTE_GAP_NOTABLE]  # Positive gap = understaffed
-        overstaffed = df[df["fte_gap"] < -FTE_GAP_NOTABLE]  # Negative gap = overstaffed
-        optimal = df[(df["fte_gap"] >= -FTE_GAP_NOTABLE) & (df["fte_gap"] <= FTE_GAP_NOTABLE)]
+        # Counts straight from the bool masks; the two states are disjoint
+        understaffed = index.understaffed.to_numpy()  # Positive gap = understaffed
+        understaffed_count = int(np.count_nonzero(understaffed))
+        overstaffed_count = int(np.count_nonzero(index.overstaffed.to_numpy()))
+        optimal_count = n - understaffed_count - overstaffed_count
 
         # Urgent: understaffed + above-avg productivity (same criteria as app)
         # Only above-avg productivity pharmacies have real "revenue at risk"
         # Use is_above_avg_gross if available (matches app exactly), else fallback to productivity_index
         if "is_above_avg_gross" in df.columns:
-            urgent = df[(df["fte_gap"] > FTE_GAP_NOTABLE) & (df["is_above_avg_gross"] == True)]
+            urgent = understaffed & (df["is_above_avg_gross"].to_numpy() == True)
         else:
-            urgent = df[(df["fte_gap"] > FTE_GAP_NOTABLE) & (df["productivity_index"] > 100)]
+            urgent = understaffed & (df["productivity_index"].to_numpy() > 100)
+
+        # One columnar reduction for all the network totals
+        totals = df[NETWORK_TOTAL_COLUMNS].sum()
 
         # FTE-weighted productivity
-        total_fte = df["fte_actual"].sum()
+        total_fte = totals["fte_actual"]
         weighted_prod = (
             (df["productivity_index"] * df["fte_actual"]).sum() / total_fte
             if total_fte > 0
@@ -1807,45 +2583,47 @@ class DrMaxAgent:
         )
 
         return {
-            "total_pharmacies": len(df),
-            "total_fte_actual": round(df["fte_actual"].sum(), 1),
-            "total_fte_recommended": round(df["fte_recommended"].sum(), 1),
-            "total_fte_gap": round(df["fte_gap"].sum(), 1),
-            "understaffed_count": len(understaffed),
-            "overstaffed_count": len(overstaffed),
-            "optimal_count": len(optimal),
-            "understaffed_pct": round(len(understaffed) / len(df) * 100, 1),
-            "overstaffed_pct": round(len(overstaffed) / len(df) * 100, 1),
-            "optimal_pct": round(len(optimal) / len(df) * 100, 1),
-            "total_revenue_at_risk_eur": int(urgent["revenue_at_risk_eur"].sum()),
-            "urgent_count": len(urgent),
+            "total_pharmacies": n,
+            "total_fte_actual": round(total_fte, 1),
+            "total_fte_recommended": round(totals["fte_recommended"], 1),
+            "total_fte_gap": round(totals["fte_gap"], 1),
+            "understaffed_count": understaffed_count,
+            "overstaffed_count": overstaffed_count,
+            "optimal_count": optimal_count,
+            "understaffed_pct": round(understaffed_count / n * 100, 1),
+            "overstaffed_pct": round(overstaffed_count / n * 100, 1),
+            "optimal_pct": round(optimal_count / n * 100, 1),
+            "total_revenue_at_risk_eur": int(df["revenue_at_risk_eur"].to_numpy()[urgent].sum()),
+            "urgent_count": int(np.count_nonzero(urgent)),
             "avg_productivity_index": int(weighted_prod),  # FTE-weighted
-            "total_bloky": int(df["bloky"].sum()),
-            "total_trzby": int(df["trzby"].sum()),
+            "total_bloky": int(totals["bloky"]),
+            "total_trzby": int(totals["trzby"]),
             "region_count": df["region_code"].nunique(),
-            "segment_breakdown": df["typ"].value_counts().to_dict(),
+            "segment_breakdown": df["typ"].astype(str).value_counts().to_dict(),
         }
 
+    @coerce_args
     def tool_get_trend_analysis(
         self, trend_threshold: float = 10.0, limit: int = 20
     ) -> dict:
         """Identify pharmacies with significant transaction trends (growing/declining)."""
-        # Ensure types
-        trend_threshold = float(trend_threshold) if trend_threshold else 10.0
-        limit = int(limit) if limit else 20
-
-        df = self.sanitized_data.copy()
+        df = self.sanitized_data
 
-        # Convert bloky_trend to percentage if needed (stored as decimal)
-        df["trend_pct"] = df["bloky_trend"] * 100
+        # Convert bloky_trend to percentage (stored as decimal); kept as a
+        # local array so the shared frame is never copied or mutated
+        trend_pct = df["bloky_trend"].to_numpy(dtype=float) * 100
 
         # Growing pharmacies (positive trend above threshold)
-        growing = df[df["trend_pct"] >= trend_threshold].copy()
-        growing = growing.sort_values("trend_pct", ascending=False)
+        growing = np.flatnonzero(trend_pct >= trend_threshold)
+        growing_top = growing[_top_k_desc(trend_pct[growing], limit)]
 
         # Declining pharmacies (negative trend below -threshold)
-        declining = df[df["trend_pct"] <= -trend_threshold].copy()
-        declining = declining.sort_values("trend_pct")
+        declining = np.flatnonzero(trend_pct <= -trend_threshold)
+        declining_top = declining[_top_k_desc(-trend_pct[declining], limit)]
+
+        def top_rows(rows):
+            rows = rows[:limit]
+            return df.iloc[rows].assign(trend_pct=trend_pct[rows])
 
         def format_pharmacy(row):
             return {
@@ -1864,10 +2642,10 @@ class DrMaxAgent:
             "growing_count": len(growing),
             "declining_count": len(declining),
             "growing_pharmacies": [
-                format_pharmacy(row) for _, row in growing.head(limit).iterrows()
+                format_pharmacy(row) for _, row in top_rows(growing_top).iterrows()
             ],
             "declining_pharmacies": [
-                format_pharmacy(row) for _, row in declining.head(limit).iterrows()
+                format_pharmacy(row) for _, row in top_rows(declining_top).iterrows()
             ],
             "recommendation": (
                 "Rastúce lekárne môžu potrebovať navýšenie FTE. "
@@ -1875,14 +2653,14 @@ class DrMaxAgent:
             ),
         }
 
+    @coerce_args
     def tool_get_priority_actions(self, limit: int = 10) -> dict:
         """Get prioritized action list combining risk, productivity, and FTE gap."""
-        limit = int(limit) if limit else 10
-        df = self.sanitized_data.copy()
+        index = self.data_index
 
         # Only consider understaffed pharmacies with revenue at risk
         # Positive gap = understaffed (need more FTE)
-        candidates = df[(df["fte_gap"] > FTE_GAP_NOTABLE) & (df["revenue_at_risk_eur"] > 0)].copy()
+        candidates = index.df[index.urgent]
 
         if candidates.empty:
             return {
@@ -1893,60 +2671,62 @@ class DrMaxAgent:
 
         # Priority score: higher = more urgent
         # Factors: revenue at risk (normalized), productivity (above avg = higher), FTE gap magnitude
-        max_risk = candidates["revenue_at_risk_eur"].max()
-        candidates["risk_score"] = (
-            candidates["revenue_at_risk_eur"] / max_risk * 40
-        )  # 0-40 points
+        # Scores are local arrays; the urgent slice itself is only read
+        risk = candidates["revenue_at_risk_eur"].to_numpy(dtype=float)
+        risk_score = risk / risk.max() * 40  # 0-40 points
 
         # Productivity bonus: above average gets points
-        candidates["prod_score"] = ((candidates["productivity_index"] - 100) / 20).clip(
-            0, 30
+        prod_score = np.clip(
+            (candidates["productivity_index"].to_numpy(dtype=float) - 100) / 20, 0, 30
         )  # 0-30 points
 
         # FTE gap magnitude: bigger gap = more urgent (positive gap = understaffed)
-        max_gap = candidates["fte_gap"].max()
-        candidates["gap_score"] = (
-            (candidates["fte_gap"] / max_gap) * 30 if max_gap > 0 else 0
-        )  # 0-30 points
+        gap = candidates["fte_gap"].to_numpy(dtype=float)
+        max_gap = gap.max()
+        gap_score = gap / max_gap * 30 if max_gap > 0 else 0  # 0-30 points
 
-        candidates["priority_score"] = (
-            candidates["risk_score"]
-            + candidates["prod_score"]
-            + candidates["gap_score"]
-        )
+        priority_score = risk_score + prod_score + gap_score
 
-        # Sort by priority score
-        candidates = candidates.sort_values("priority_score", ascending=False)
+        # Highest priority first; only the selected rows are materialized
+        order = _top_k_desc(priority_score, limit)[:limit]
+        top = candidates.iloc[order].assign(priority_score=priority_score[order])
 
-        actions = []
-        for _, row in candidates.head(limit).iterrows():
-            action_type = (
-                "URGENTNÉ"
-                if row["priority_score"] >= 70
-                else ("VYSOKÁ" if row["priority_score"] >= 50 else "STREDNÁ")
-            )
-            actions.append(
-                {
-                    "priority": action_type,
-                    "priority_score": round(row["priority_score"], 0),
-                    "id": int(row["id"]),
-                    "mesto": row["mesto"],
-                    "typ": row["typ"],
-                    "fte_gap": round(row["fte_gap"], 1),
-                    "fte_needed": round(abs(row["fte_gap"]), 1),
-                    "revenue_at_risk_eur": int(row["revenue_at_risk_eur"]),
-                    "productivity_index": int(row["productivity_index"]),
-                    "action": f"Pridať {abs(row['fte_gap']):.1f} FTE, ohrozené €{int(row['revenue_at_risk_eur']):,}",
-                }
-            )
+        # Totals straight from the top rows (vectorized, before the per-row dicts)
+        total_fte_needed = round(top["fte_gap"].abs().round(1).sum(), 1)
+        total_revenue_at_risk = int(top["revenue_at_risk_eur"].sum())
+
+        # Build the action rows column-wise, then convert to dicts in one call
+        score = top["priority_score"]
+        fte_needed = top["fte_gap"].abs()
+        revenue = top["revenue_at_risk_eur"].astype(int)
+        actions = pd.DataFrame(
+            {
+                "priority": np.where(
+                    score >= 70, "URGENTNÉ", np.where(score >= 50, "VYSOKÁ", "STREDNÁ")
+                ),
+                "priority_score": score.round(0),
+                "id": top["id"].astype(int),
+                "mesto": top["mesto"],
+                "typ": top["typ"],
+                "fte_gap": top["fte_gap"].round(1),
+                "fte_needed": fte_needed.round(1),
+                "revenue_at_risk_eur": revenue,
+                "productivity_index": top["productivity_index"].astype(int),
+                "action": "Pridať "
+                + fte_needed.map("{:.1f}".format).astype(str)
+                + " FTE, ohrozené €"
+                + revenue.map("{:,}".format).astype(str),
+            }
+        ).to_dict("records")
 
         return {
             "count": len(actions),
-            "total_fte_needed": round(sum(a["fte_needed"] for a in actions), 1),
-            "total_revenue_at_risk_eur": sum(a["revenue_at_risk_eur"] for a in actions),
+            "total_fte_needed": total_fte_needed,
+            "total_revenue_at_risk_eur": total_revenue_at_risk,
             "actions": actions,
         }
 
+    @coerce_args
     def tool_get_zastup_analysis(
         self,
         segment: str = None,
@@ -1977,21 +2757,20 @@ class DrMaxAgent:
             }
 
         # Filter by min zastup (FTE or percentage)
-        min_fte = float(min_zastup_fte) if min_zastup_fte else 0.1
-        limit = int(limit) if limit else 20
+        min_fte = min_zastup_fte or 0.1
 
         pharmacies_with_zastup = df[df["zastup"] >= min_fte].copy()
 
         # Additional filter by percentage if specified
         if min_zastup_pct:
             pharmacies_with_zastup = pharmacies_with_zastup[
-                pharmacies_with_zastup["zastup_pct"] >= float(min_zastup_pct)
+                pharmacies_with_zastup["zastup_pct"] >= min_zastup_pct
             ]
 
         # Filter by max productivity if specified (for "low productivity" queries)
         if max_productivity:
             pharmacies_with_zastup = pharmacies_with_zastup[
-                pharmacies_with_zastup["productivity_index"] <= float(max_productivity)
+                pharmacies_with_zastup["productivity_index"] <= max_productivity
             ]
 
         # Segment summary
@@ -2072,6 +2851,7 @@ class DrMaxAgent:
             "insight": insight,
         }
 
+    @coerce_args
     def tool_get_overstaffed_with_zastup(
         self,
         min_zastup_pct: float = 10.0,
@@ -2102,20 +2882,19 @@ class DrMaxAgent:
         overstaffed = df[df["fte_gap"] < -0.3].copy()
 
         # Filter by minimum zastup percentage
-        min_pct = float(min_zastup_pct) if min_zastup_pct else 10.0
+        min_pct = min_zastup_pct or 10.0
         overstaffed = overstaffed[overstaffed["zastup_pct"] >= min_pct]
 
         # Filter by max productivity if specified
         if max_productivity:
             overstaffed = overstaffed[
-                overstaffed["productivity_index"] <= float(max_productivity)
+                overstaffed["productivity_index"] <= max_productivity
             ]
 
         # Sort by zastup percentage descending
         overstaffed = overstaffed.sort_values("zastup_pct", ascending=False)
 
         # Build result list
-        limit = int(limit) if limit else 20
         pharmacies = []
         for _, row in overstaffed.head(limit).iterrows():
             pharmacies.append(
@@ -2205,397 +2984,13 @@ class DrMaxAgent:
 
     def get_tools(self) -> list:
         """Return tool definitions for Claude API."""
-        return [
-            {
-                "name": "search_pharmacies",
-                "description": "Vyhľadaj lekárne podľa kritérií (mesto, typ, región, bloky). Výsledky sú zoradené podľa blokov (najväčšie prvé). Pre 'top/najväčšie' lekárne použi sort_by='bloky'.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "mesto": {
-                            "type": "string",
-                            "description": "Mesto/lokalita lekárne (case-insensitive, partial match). Napr. 'Košice', 'Bratislava', 'Levice'",
-                        },
-                        "typ": {
-                            "type": "string",
-                            "description": "Typ lekárne (A/B/C/D/E alebo celý názov)",
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Kód regiónu (napr. RR11, RR15)",
-                        },
-                        "min_bloky": {
-                            "type": "integer",
-                            "description": "Minimálny počet blokov",
-                        },
-                        "max_bloky": {
-                            "type": "integer",
-                            "description": "Maximálny počet blokov",
-                        },
-                        "understaffed_only": {
-                            "type": "boolean",
-                            "description": "Len poddimenzované lekárne (fte_gap > 0.5)",
-                        },
-                        "overstaffed_only": {
-                            "type": "boolean",
-                            "description": "Len naddimenzované lekárne (fte_gap < -0.5) - vhodné pre presun personálu",
-                        },
-                        "sort_by": {
-                            "type": "string",
-                            "description": "Stĺpec pre zoradenie: 'bloky', 'trzby', 'fte_actual', 'productivity_index', 'revenue_at_risk_eur'. Default: 'bloky'",
-                        },
-                        "sort_desc": {
-                            "type": "boolean",
-                            "description": "Zoradiť zostupne (true=najväčšie prvé). Default: true",
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet výsledkov (default 15, max 20)",
-                        },
-                    },
-                },
-            },
-            {
-                "name": "get_pharmacy_details",
-                "description": "Získaj detaily konkrétnej lekárne vrátane indexovanej produktivity a odporúčaného FTE.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {"type": "integer", "description": "ID lekárne"}
-                    },
-                    "required": ["pharmacy_id"],
-                },
-            },
-            {
-                "name": "get_pharmacy_revenue_trend",
-                "description": "Získaj historický vývoj tržieb lekárne (2019-2021) vrátane mesačných dát a medziročného rastu (YoY).",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {"type": "integer", "description": "ID lekárne"}
-                    },
-                    "required": ["pharmacy_id"],
-                },
-            },
-            {
-                "name": "get_segment_position",
-                "description": "Získaj pozíciu lekárne v rámci jej segmentu pre všetky KPI (bloky, tržby, Rx%, FTE, bloky/h, tržby/h, košík, produktivita). Vráti min/max/avg segmentu a percentil lekárne.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {"type": "integer", "description": "ID lekárne"}
-                    },
-                    "required": ["pharmacy_id"],
-                },
-            },
-            {
-                "name": "simulate_fte",
-                "description": "Simulácia 'čo ak?' - vypočítaj potrebné FTE pri zmene blokov alebo tržieb. Môžeš použiť: 1) s pharmacy_id a percentuálnou zmenou (bloky_change_pct, trzby_change_pct), 2) s pharmacy_id a absolútnymi hodnotami, 3) bez pharmacy_id s absolútnymi hodnotami a typom.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {
-                            "type": "integer",
-                            "description": "ID lekárne (voliteľné - ak nie je zadané, musíš zadať bloky, trzby a typ)",
-                        },
-                        "bloky": {
-                            "type": "number",
-                            "description": "Absolútny počet blokov (voliteľné)",
-                        },
-                        "trzby": {
-                            "type": "number",
-                            "description": "Absolútne tržby v EUR (voliteľné)",
-                        },
-                        "bloky_change_pct": {
-                            "type": "number",
-                            "description": "Percentuálna zmena blokov oproti súčasnosti (napr. 20 pre +20%, -10 pre -10%)",
-                        },
-                        "trzby_change_pct": {
-                            "type": "number",
-                            "description": "Percentuálna zmena tržieb oproti súčasnosti (napr. 15 pre +15%)",
-                        },
-                        "typ": {
-                            "type": "string",
-                            "description": "Typ lekárne (A-E), povinné ak nie je pharmacy_id",
-                        },
-                    },
-                    "required": [],
-                },
-            },
-            {
-                "name": "compare_to_peers",
-                "description": "Porovnaj lekáreň s podobnými prevádzkami v segmente pomocou porovnania TRŽIEB. Kritériá: rovnaký segment, tržby ±15%, Rx ratio ±10pp. Vracia similarity_score, benchmarky a insights. Matching by revenue je presnejší než bloky.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "pharmacy_id": {
-                            "type": "integer",
-                            "description": "ID lekárne na porovnanie",
-                        },
-                        "n_peers": {
-                            "type": "integer",
-                            "description": "Počet podobných lekární (default 10)",
-                        },
-                        "higher_fte_only": {
-                            "type": "boolean",
-                            "description": "Len lekárne s vyšším FTE - pre hľadanie zdrojov na presun personálu",
-                        },
-                        "trzby_tolerance": {
-                            "type": "number",
-                            "description": "Tolerancia pre tržby ako desatinné číslo (default 0.15 = ±15%)",
-                        },
-                        "rx_tolerance": {
-                            "type": "number",
-                            "description": "Tolerancia pre Rx ratio v percentuálnych bodoch (default 0.10 = ±10pp)",
-                        },
-                    },
-                    "required": ["pharmacy_id"],
-                },
-            },
-            {
-                "name": "get_understaffed",
-                "description": "Získaj lekárne s konkrétnym FTE odporúčaním a ohrozenými tržbami v EUR. Vracia presný počet FTE na pridanie a finančný dopad.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "mesto": {
-                            "type": "string",
-                            "description": "Filter podľa mesta/lokality (case-insensitive, partial match). Napr. 'Košice', 'Bratislava'",
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Filter podľa regiónu (napr. RR11)",
-                        },
-                        "min_gap": {
-                            "type": "number",
-                            "description": "Minimálny FTE deficit (default -0.5)",
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet výsledkov (default 20)",
-                        },
-                        "high_risk_only": {
-                            "type": "boolean",
-                            "description": "Len lekárne s ohrozenými tržbami > 0 EUR",
-                        },
-                        "high_productivity_only": {
-                            "type": "boolean",
-                            "description": "Len lekárne s nadpriemernou produktivitou (index > 100)",
-                        },
-                        "sort_by": {
-                            "type": "string",
-                            "enum": ["fte_gap", "revenue_at_risk", "productivity"],
-                            "description": "Zoradiť podľa: fte_gap (default), revenue_at_risk, productivity",
-                        },
-                    },
-                },
-            },
-            {
-                "name": "get_regional_summary",
-                "description": "Získaj súhrnné štatistiky za jeden región.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "region": {
-                            "type": "string",
-                            "description": "Kód regiónu (napr. RR11, RR15)",
-                        }
-                    },
-                    "required": ["region"],
-                },
-            },
-            {
-                "name": "get_all_regions_summary",
-                "description": "Získaj súhrnné štatistiky za VŠETKY regióny naraz. Použiť pri porovnávaní regiónov.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "sort_by": {
-                            "type": "string",
-                            "enum": ["revenue_at_risk", "productivity", "understaffed"],
-                            "description": "Zoradiť podľa: revenue_at_risk (default), productivity, understaffed",
-                        }
-                    },
-                },
-            },
-            {
-                "name": "generate_report",
-                "description": "Vygeneruj Markdown report s analýzou a odporúčaniami.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "title": {"type": "string", "description": "Názov reportu"},
-                        "pharmacy_ids": {
-                            "type": "array",
-                            "items": {"type": "integer"},
-                            "description": "Zoznam ID lekární na zahrnutie",
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Región pre súhrnné štatistiky",
-                        },
-                        "include_recommendations": {
-                            "type": "boolean",
-                            "description": "Zahrnúť odporúčania (default true)",
-                        },
-                    },
-                    "required": ["title"],
-                },
-            },
-            {
-                "name": "get_segment_comparison",
-                "description": "Porovnaj výkonnosť všetkých segmentov (A-E). Vráti ohrozené tržby, FTE a produktivitu za segment.",
-                "input_schema": {"type": "object", "properties": {}},
-            },
-            {
-                "name": "get_city_summary",
-                "description": "Získaj súhrnné štatistiky za mesto s viacerými lekárňami. Zobrazí aj možnosť presunu personálu.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "mesto": {
-                            "type": "string",
-                            "description": "Názov mesta (napr. 'Košice', 'Bratislava')",
-                        }
-                    },
-                    "required": ["mesto"],
-                },
-            },
-            {
-                "name": "get_cities_pharmacy_count",
-                "description": "Počet lekární v jednotlivých mestách, zoradené zostupne. Použiť pri otázkach 'koľko lekární v mestách', 'mestá s najviac lekárňami'.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "min_count": {
-                            "type": "integer",
-                            "description": "Minimálny počet lekární v meste (default 1)",
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet miest vo výsledku (default 50)",
-                        },
-                    },
-                },
-            },
-            {
-                "name": "get_network_overview",
-                "description": "Rýchly prehľad zdravia celej siete lekární. Celkové FTE, ohrozené tržby, % poddimenzovaných.",
-                "input_schema": {"type": "object", "properties": {}},
-            },
-            {
-                "name": "get_trend_analysis",
-                "description": "Identifikuj lekárne s významným trendom rastu/poklesu transakcií.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "trend_threshold": {
-                            "type": "number",
-                            "description": "Prahová hodnota trendu v % (default 10)",
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet lekární v každej kategórii (default 20)",
-                        },
-                    },
-                },
-            },
-            {
-                "name": "get_priority_actions",
-                "description": "Získaj prioritizovaný zoznam akcií - kombinuje riziko, produktivitu a FTE gap. Odpoveď na 'Čo riešiť najskôr?'",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet akcií (default 10)",
-                        }
-                    },
-                },
-            },
-            {
-                "name": "get_zastup_analysis",
-                "description": "POVINNÉ pre otázky o zastupe/zástupe! Analýza ZÁSTUPU = personál zapožičaný Z INÝCH lekární. VŽDY použiť ak otázka obsahuje: 'zastup', 'zástup', 'zapožičaný', 'borrowed'. ZASTUP ≠ prebytok! Vracia presné hodnoty zastup_fte a zastup_pct pre každú lekáreň.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "segment": {
-                            "type": "string",
-                            "description": "Filter podľa segmentu (A/B/C/D/E)",
-                        },
-                        "region": {
-                            "type": "string",
-                            "description": "Filter podľa regiónu (napr. RR11)",
-                        },
-                        "min_zastup_pct": {
-                            "type": "number",
-                            "description": "Min. podiel zástupu v % (default 5)",
-                        },
-                        "min_zastup_fte": {
-                            "type": "number",
-                            "description": "Min. zastup v FTE (default 0.1)",
-                        },
-                        "max_productivity": {
-                            "type": "number",
-                            "description": "Max produktivita index (pre 'nízka produktivita' použiť 100)",
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet výsledkov (default 20)",
-                        },
-                    },
-                },
-            },
-            {
-                "name": "get_overstaffed_with_zastup",
-                "description": "⚠️ POVINNÉ pre: 'prebytok + zástup', 'overstaffed + zastup', 'naddimenzované so zástupom'. Kombinovaný nástroj - vracia lekárne s PREBYTKOM FTE a VYSOKÝM ZÁSTUPOM v jednom výstupe. Rieši problém cross-reference medzi dvoma nástrojmi.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "min_zastup_pct": {
-                            "type": "number",
-                            "description": "Min. podiel zástupu v % (default 10)",
-                        },
-                        "max_productivity": {
-                            "type": "number",
-                            "description": "Max produktivita index (napr. 110 pre 'nízka produktivita')",
-                        },
-                        "segment": {
-                            "type": "string",
-                            "description": "Filter podľa segmentu (A/B/C/D/E)",
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Max počet výsledkov (default 20)",
-                        },
-                    },
-                },
-            },
-            {
-                "name": "get_knowledge",
-                "description": "⚠️ POVINNÉ pre vysvetľovacie otázky: 'ako funguje model', 'výhody aplikácie', 'čo znamená FTE/produktivita', 'prečo...'. Vráti štruktúrované znalosti pre odpoveď používateľovi.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "topic": {
-                            "type": "string",
-                            "enum": [
-                                "model_explanation",
-                                "app_benefits",
-                                "fte_interpretation",
-                                "action_planning",
-                                "faq",
-                            ],
-                            "description": "Téma: model_explanation (ako funguje model), app_benefits (výhody aplikácie), fte_interpretation (FTE, produktivita, gap), action_planning (čo robiť, prioritizácia), faq (časté otázky)",
-                        },
-                    },
-                    "required": ["topic"],
-                },
-            },
-        ]
+        return AGENT_TOOLS
 
     def _get_tool_map(self) -> dict:
-        """Get mapping of tool names to methods. Single source of truth."""
+        """Get mapping of tool names to methods. Single source of truth.
+
+        Called once from __init__; execute_tool dispatches via ``self._tools``.
+        """
         return {
             "search_pharmacies": self.tool_search_pharmacies,
             "get_pharmacy_details": self.tool_get_pharmacy_details,
@@ -2622,8 +3017,6 @@ class DrMaxAgent:
         self, tool_name: str, tool_input: dict, request_id: str = ""
     ) -> str:
         """Execute a tool and return result as string."""
-        import time
-
         start_time = time.time()
 
         # Use ALLOWED_TOOLS for validation
@@ -2633,10 +3026,24 @@ class DrMaxAgent:
             )
             return json.dumps({"error": f"Unknown tool: {tool_name}"})
 
-        tool_map = self._get_tool_map()
+        tool = self._tools[tool_name]
 
         try:
-            result = tool_map[tool_name](**tool_input)
+            cache_key = None
+            if tool_name in CACHEABLE_TOOLS:
+                # Key on the coerced arguments so {"limit": "5"} and {"limit": 5} share an entry
+                coerce = getattr(tool, "coerce_kwargs", None)
+                key_input = coerce(tool_input) if coerce else tool_input
+                cache_key = (tool_name, json.dumps(key_input, sort_keys=True, default=str))
+                cached = self.data_index.get_tool_result(cache_key)
+                if cached is not None:
+                    logger.info(
+                        f"Tool OK: {tool_name} | cached | {len(cached)} chars",
+                        extra={"request_id": request_id},
+                    )
+                    return cached
+
+            result = tool(**tool_input)
             duration = time.time() - start_time
 
             # Apply context summarization to prevent overflow
@@ -2644,12 +3051,14 @@ class DrMaxAgent:
                 result = summarize_tool_result(tool_name, result)
 
             # P2: Audit logging
-            result_str = json.dumps(result, ensure_ascii=False, default=str)
+            result_str = ToolResult(result)
             logger.info(
                 f"Tool OK: {tool_name} | {duration:.2f}s | {len(result_str)} chars",
                 extra={"request_id": request_id},
             )
 
+            if cache_key is not None:
+                self.data_index.put_tool_result(cache_key, result_str)
             return result_str
 
         except ToolExecutionError as e:
@@ -2691,6 +3100,93 @@ class DrMaxAgent:
                 {"error": "Tool execution failed", "error_type": "ToolExecutionError"}
             )
 
+    def _prefetch_tools(self, request_id: str = "") -> None:
+        """Warm the tool cache with PREFETCH_TOOLS (default arguments)."""
+        for tool_name in PREFETCH_TOOLS:
+            self.execute_tool(tool_name, {}, request_id)
+
+    def _stream_message(self, **kwargs):
+        """Stream a Messages API call and return the final message.
+
+        httpx's read timeout bounds the gap between chunks, and the loop
+        below also tracks time since the last non-ping event, so a stalled
+        generation fails fast instead of pinning the worker for the full
+        client timeout. A stalled stream is retried
+        ``config.stream_stall_retries`` times before the error propagates.
+        """
+        idle_timeout = self.config.stream_idle_timeout
+        timeout = httpx.Timeout(idle_timeout, connect=30.0)
+        for attempt in range(self.config.stream_stall_retries + 1):
+            try:
+                with self.client.messages.stream(timeout=timeout, **kwargs) as stream:
+                    last_chunk_time = time.monotonic()
+                    for event in stream:
+                        now = time.monotonic()
+                        if now - last_chunk_time > idle_timeout:
+                            raise APITimeoutError(request=stream.response.request)
+                        if event.type != "ping":
+                            last_chunk_time = now
+                    return stream.get_final_message()
+            except (APITimeoutError, httpx.TimeoutException):
+                if attempt == self.config.stream_stall_retries:
+                    raise
+                logger.warning(
+                    f"Stream stalled for {idle_timeout:.0f}s, retrying "
+                    f"({attempt + 1}/{self.config.stream_stall_retries})"
+                )
+
+    async def _astream_message(self, **kwargs):
+        """Async counterpart of _stream_message, using ``async_client``."""
+        idle_timeout = self.config.stream_idle_timeout
+        timeout = httpx.Timeout(idle_timeout, connect=30.0)
+        for attempt in range(self.config.stream_stall_retries + 1):
+            try:
+                async with self.async_client.messages.stream(
+                    timeout=timeout, **kwargs
+                ) as stream:
+                    last_chunk_time = time.monotonic()
+                    async for event in stream:
+                        now = time.monotonic()
+                        if now - last_chunk_time > idle_timeout:
+                            raise APITimeoutError(request=stream.response.request)
+                        if event.type != "ping":
+                            last_chunk_time = now
+                    return await stream.get_final_message()
+            except (APITimeoutError, httpx.TimeoutException):
+                if attempt == self.config.stream_stall_retries:
+                    raise
+                logger.warning(
+                    f"Stream stalled for {idle_timeout:.0f}s, retrying "
+                    f"({attempt + 1}/{self.config.stream_stall_retries})"
+                )
+
+    def _execute_steps_parallel(self, steps: list, request_id: str = "", on_done=None) -> list:
+        """Execute planned steps concurrently, returning results in step order.
+
+        Tools are sync pandas code, so they run on a small thread pool.
+        ``on_done(step)`` is called from this thread as each step finishes.
+        """
+        if not steps:
+            return []
+
+        # Load data once up front so worker threads don't race on the lazy load
+        self.data_index
+
+        with ThreadPoolExecutor(max_workers=self.config.max_parallel_tools) as executor:
+            futures = {
+                executor.submit(
+                    self.execute_tool, step["tool"], step.get("params", {}), request_id
+                ): i
+                for i, step in enumerate(steps)
+            }
+            results = [None] * len(steps)
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                if on_done:
+                    on_done(steps[i])
+        return results
+
     async def analyze(self, prompt: str, max_rounds: int = 5) -> AsyncIterator[dict]:
         """
         Run autonomous analysis on the given prompt.
@@ -2702,7 +3198,7 @@ class DrMaxAgent:
         - {"type": "response", "content": "..."}
         - {"type": "done", "content": "...", "total_rounds": N}
         """
-        if not ANTHROPIC_AVAILABLE or not self.client:
+        if not ANTHROPIC_AVAILABLE or not self.async_client:
             yield {
                 "type": "error",
                 "content": "Anthropic SDK not available. Install with: pip install anthropic",
@@ -2713,10 +3209,10 @@ class DrMaxAgent:
 
         for round_num in range(max_rounds):
             # Call Claude (using architect model for async flow)
-            response = self.client.messages.create(
+            response = await self._astream_message(
                 model=self.config.architect_model,
                 max_tokens=self.config.architect_max_tokens,
-                system=AGENT_SYSTEM_PROMPT,
+                system=AGENT_SYSTEM_BLOCKS,
                 tools=self.get_tools(),
                 messages=messages,
             )
@@ -2724,6 +3220,7 @@ class DrMaxAgent:
             # Process response
             assistant_content = []
             has_tool_use = False
+            tool_calls = []  # (tool_use block, assistant content ending with it)
 
             for block in response.content:
                 if block.type == "text":
@@ -2737,17 +3234,6 @@ class DrMaxAgent:
                     has_tool_use = True
                     yield {"type": "tool_use", "tool": block.name, "input": block.input}
 
-                    # Execute tool
-                    tool_result = self.execute_tool(block.name, block.input)
-
-                    yield {
-                        "type": "tool_result",
-                        "tool": block.name,
-                        "content": tool_result[:500] + "..."
-                        if len(tool_result) > 500
-                        else tool_result,
-                    }
-
                     assistant_content.append(
                         {
                             "type": "tool_use",
@@ -2756,23 +3242,45 @@ class DrMaxAgent:
                             "input": block.input,
                         }
                     )
-
-                    # Add tool result to messages
-                    messages.append({"role": "assistant", "content": assistant_content})
-                    messages.append(
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "tool_result",
-                                    "tool_use_id": block.id,
-                                    "content": tool_result,
-                                }
-                            ],
-                        }
-                    )
+                    tool_calls.append((block, assistant_content))
                     assistant_content = []
 
+            # Execute this round's tools concurrently (sync pandas code, so
+            # each runs in a worker thread); load data first so the threads
+            # don't race on the lazy load
+            if tool_calls:
+                self.data_index
+            tool_results = await asyncio.gather(
+                *(
+                    asyncio.to_thread(self.execute_tool, block.name, block.input)
+                    for block, _ in tool_calls
+                )
+            )
+
+            for (block, content), tool_result in zip(tool_calls, tool_results):
+                yield {
+                    "type": "tool_result",
+                    "tool": block.name,
+                    "content": tool_result[:500] + "..."
+                    if len(tool_result) > 500
+                    else tool_result,
+                }
+
+                # Add tool result to messages
+                messages.append({"role": "assistant", "content": content})
+                messages.append(
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "tool_result",
+                                "tool_use_id": block.id,
+                                "content": tool_result,
+                            }
+                        ],
+                    }
+                )
+
             # If no tool use, we're done
             if not has_tool_use:
                 yield {
@@ -2805,8 +3313,6 @@ class DrMaxAgent:
 
         Returns final response and metadata.
         """
-        import time
-
         start_time = time.time()
 
         def emit(event):
@@ -2827,44 +3333,60 @@ class DrMaxAgent:
         emit({"phase": "planning", "status": "start"})
 
         plan_start = time.time()
-        emit({"phase": "ai_response", "status": "start", "model": "sonnet"})
-        try:
-            plan_response = self.client.messages.create(
-                model=self.config.architect_model,
-                max_tokens=self.config.architect_max_tokens,
-                system=ARCHITECT_PLAN_PROMPT,
-                messages=[{"role": "user", "content": prompt}],
-            )
-        except Exception as api_error:
-            error_type = type(api_error).__name__
-            error_msg = str(api_error)
-            logger.error(
-                f"API error in planning: {error_type}: {error_msg}",
-                extra={"request_id": request_id},
-            )
-            emit({"phase": "error", "message": f"API error: {error_type}"})
-            # Check if API key is set
-            import os as agent_os
+        # Repeated questions reuse the stored plan and skip the architect call
+        plan_text = self._plan_cache.get(prompt)
+        plan_cached = plan_text is not None
+        if plan_cached:
+            logger.info("Plan cache hit", extra={"request_id": request_id})
+        else:
+            emit({"phase": "ai_response", "status": "start", "model": "sonnet"})
+            # The architect call is network-bound; compute the common tools meanwhile
+            prefetch_pool = ThreadPoolExecutor(max_workers=1)
+            prefetch_pool.submit(self._prefetch_tools, request_id)
+            try:
+                plan_response = self._stream_message(
+                    model=self.config.architect_model,
+                    max_tokens=self.config.architect_max_tokens,
+                    system=ARCHITECT_PLAN_BLOCKS,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+            except Exception as api_error:
+                error_type = type(api_error).__name__
+                error_msg = str(api_error)
+                logger.error(
+                    f"API error in planning: {error_type}: {error_msg}",
+                    extra={"request_id": request_id},
+                )
+                emit({"phase": "error", "message": f"API error: {error_type}"})
+                # Check if API key is set
+                api_key = os.environ.get("ANTHROPIC_API_KEY", "")
+                logger.debug(
+                    f"API key set: {bool(api_key)}, length: {len(api_key)}",
+                    extra={"request_id": request_id},
+                )
+                return {
+                    "error": f"Anthropic API error: {error_type}",
+                    "error_detail": error_msg[:200],
+                    "response": None,
+                }
+            finally:
+                # Steps start after the warm-up, so planned calls to it hit the cache
+                prefetch_pool.shutdown(wait=True)
 
-            api_key = agent_os.environ.get("ANTHROPIC_API_KEY", "")
-            logger.debug(
-                f"API key set: {bool(api_key)}, length: {len(api_key)}",
-                extra={"request_id": request_id},
+            emit(
+                {
+                    "phase": "ai_response",
+                    "status": "complete",
+                    "duration": round(time.time() - plan_start, 2),
+                }
             )
-            return {
-                "error": f"Anthropic API error: {error_type}",
-                "error_detail": error_msg[:200],
-                "response": None,
-            }
+            plan_text = ""
+            for block in plan_response.content:
+                if block.type == "text":
+                    plan_text = block.text
+                    break
 
         plan_duration = time.time() - plan_start
-        emit(
-            {
-                "phase": "ai_response",
-                "status": "complete",
-                "duration": round(plan_duration, 2),
-            }
-        )
         emit(
             {
                 "phase": "planning",
@@ -2873,23 +3395,16 @@ class DrMaxAgent:
             }
         )
 
-        plan_text = ""
-        for block in plan_response.content:
-            if block.type == "text":
-                plan_text = block.text
-                break
 
         # Parse and validate plan
-        import re
-
         steps = []
         plan_analysis = None
         synthesis_focus = None
         try:
-            # Try to extract JSON from response
-            json_match = re.search(r"\{[\s\S]*\}", plan_text)
-            if json_match:
-                plan_json = json.loads(json_match.group())
+            # Try to extract JSON from response; prose-only replies skip the scan
+            plan_json_text = _find_json_object(plan_text) if "{" in plan_text else None
+            if plan_json_text:
+                plan_json = _json_loads(plan_json_text)
                 plan_analysis = plan_json.get("analysis", None)
                 synthesis_focus = plan_json.get("synthesis_focus", None)
                 logger.info(
@@ -2906,6 +3421,8 @@ class DrMaxAgent:
                     logger.info(
                         f"Steps: {len(steps)}", extra={"request_id": request_id}
                     )
+                    if steps and not plan_cached:
+                        self._plan_cache.put(prompt, plan_text)
                 else:
                     logger.warning(
                         f"Plan validation failed: {error_msg}",
@@ -2931,41 +3448,49 @@ class DrMaxAgent:
         if steps:
             # Execute planned steps (respect config limit)
             max_steps = min(len(steps), self.config.max_plan_steps)
+            planned = []
             for i, step in enumerate(steps[:max_steps]):
                 # P2: Check tool call limit
-                if tool_call_count >= self.config.max_tool_calls:
+                if len(planned) >= self.config.max_tool_calls:
                     logger.warning(
                         f"LIMIT: Max tool calls ({self.config.max_tool_calls}) reached",
                         extra={"request_id": request_id},
                     )
                     break
 
-                tool_name = step.get("tool", "")
-                tool_params = step.get("params", {})
-
                 # Steps are already validated, but double-check against ALLOWED_TOOLS
-                if tool_name in ALLOWED_TOOLS:
+                if step.get("tool", "") in ALLOWED_TOOLS:
                     logger.debug(
-                        f"Step {i + 1}: {tool_name}", extra={"request_id": request_id}
-                    )
-                    result = self.execute_tool(tool_name, tool_params, request_id)
-                    tools_used.append(tool_name)
-                    tool_results.append(
-                        {
-                            "tool": tool_name,
-                            "purpose": step.get("purpose", ""),
-                            "result": result,
-                        }
-                    )
-                    tool_call_count += 1
-                    emit(
-                        {
-                            "phase": "executing",
-                            "tool": tool_name,
-                            "index": tool_call_count,
-                            "total": len(steps),
-                        }
+                        f"Step {i + 1}: {step['tool']}", extra={"request_id": request_id}
                     )
+                    planned.append(step)
+
+            completed = 0
+
+            def on_step_done(step):
+                nonlocal completed
+                completed += 1
+                emit(
+                    {
+                        "phase": "executing",
+                        "tool": step["tool"],
+                        "index": completed,
+                        "total": len(steps),
+                    }
+                )
+
+            # Planned steps are independent, so run them concurrently
+            results = self._execute_steps_parallel(planned, request_id, on_step_done)
+            for step, result in zip(planned, results):
+                tools_used.append(step["tool"])
+                tool_results.append(
+                    {
+                        "tool": step["tool"],
+                        "purpose": step.get("purpose", ""),
+                        "result": result,
+                    }
+                )
+            tool_call_count += len(planned)
         else:
             # Fallback: Let Haiku decide which tools to use
             logger.info(
@@ -2982,10 +3507,10 @@ class DrMaxAgent:
                     )
                     break
 
-                haiku_response = self.client.messages.create(
+                haiku_response = self._stream_message(
                     model=self.config.worker_model,
                     max_tokens=self.config.worker_max_tokens,
-                    system=WORKER_PROMPT,
+                    system=WORKER_BLOCKS,
                     tools=self.get_tools(),
                     messages=haiku_messages,
                 )
@@ -3092,7 +3617,9 @@ VÝSLEDKY Z NÁSTROJOV:
             if len(result_str) > 4000:
                 # Try to truncate JSON smartly (at array item boundary)
                 try:
-                    result_json = json.loads(result_str)
+                    # Trim a copy of the tool's own result rather than parsing its JSON back
+                    data = getattr(result_str, "data", None)
+                    result_json = dict(data) if isinstance(data, dict) else _json_loads(result_str)
                     # Limit arrays to keep size manageable
                     if "peers" in result_json:
                         result_json["peers"] = result_json["peers"][:3]
@@ -3103,7 +3630,7 @@ VÝSLEDKY Z NÁSTROJOV:
                             result_json["_note"] = (
                                 f"Zobrazených 20 z {result_json.get('count', 'viacerých')}"
                             )
-                    result_str = json.dumps(result_json, ensure_ascii=False)
+                    result_str = _json_dumps(result_json)
                 except (json.JSONDecodeError, KeyError):
                     # Fallback: just truncate but ensure valid ending
                     result_str = result_str[:4000] + "... (skrátené)"
@@ -3113,10 +3640,10 @@ VÝSLEDKY Z NÁSTROJOV:
 
         # Use Haiku for faster synthesis (3x faster than Sonnet)
         synth_start = time.time()
-        synthesis_response = self.client.messages.create(
+        synthesis_response = self._stream_message(
             model=self.config.worker_model,  # Haiku - faster synthesis
             max_tokens=self.config.architect_max_tokens,
-            system=ARCHITECT_SYNTHESIZE_PROMPT,
+            system=ARCHITECT_SYNTHESIZE_BLOCKS,
             messages=[{"role": "user", "content": synthesis_input}],
         )
         synth_duration = time.time() - synth_start
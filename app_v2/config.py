@@ -169,6 +169,8 @@ AGENT_ARCHITECT_MAX_TOKENS = int(get_optional_env('AGENT_ARCHITECT_MAX_TOKENS',
 AGENT_WORKER_MAX_TOKENS = int(get_optional_env('AGENT_WORKER_MAX_TOKENS', '2048'))
 AGENT_MAX_TOOL_CALLS = int(get_optional_env('AGENT_MAX_TOOL_CALLS', '10'))
 AGENT_MAX_PLAN_STEPS = int(get_optional_env('AGENT_MAX_PLAN_STEPS', '5'))
+# Abort a streamed Claude response that has been silent this long (seconds)
+AGENT_STREAM_IDLE_TIMEOUT = float(get_optional_env('AGENT_STREAM_IDLE_TIMEOUT', '30'))
 
 # Tool execution timeouts (in seconds)
 TOOL_TIMEOUTS: dict = {
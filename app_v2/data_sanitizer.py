@@ -194,13 +194,13 @@ def compare_to_peers(
         (same_segment['id'] != pharmacy_id)
     ]
 
-    # Sort by bloky similarity
-    peers['bloky_diff'] = abs(peers['bloky'] - target['bloky'])
-    peers = peers.sort_values('bloky_diff').head(n_peers)
+    # Closest n_peers by bloky (partial selection, no full sort)
+    peers = peers.assign(bloky_diff=(peers['bloky'] - target['bloky']).abs())
+    peers = peers.nsmallest(n_peers, 'bloky_diff').drop(columns=['bloky_diff'])
 
     return {
         'target': target.to_dict(),
-        'peers': peers.drop(columns=['bloky_diff']).to_dict('records'),
+        'peers': peers.to_dict('records'),
         'segment': target['typ'],
         'comparison_note': f"Porovnanie s {len(peers)} lekárňami s podobným objemom ({int(target['bloky']/1000)}k ± 20% blokov)"
     }
@@ -0,0 +1,28 @@
+"""
+Convert the analysis CSV inputs to Parquet.
+
+Parquet keeps column types and supports column projection, so the analysis
+scripts load only the columns they use without re-parsing text on every run.
+Re-run this after the source CSVs change.
+
+Requires pyarrow (pip install pyarrow).
+"""
+
+import pandas as pd
+from pathlib import Path
+
+# Paths
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
+SOURCES = ["ml_ready_v3.csv", "revenue_annual.csv"]
+
+for name in SOURCES:
+    csv_path = DATA_DIR / name
+    parquet_path = csv_path.with_suffix(".parquet")
+
+    df = pd.read_csv(csv_path)
+    df.to_parquet(parquet_path, engine="pyarrow", index=False)
+
+    csv_kb = csv_path.stat().st_size / 1024
+    parquet_kb = parquet_path.stat().st_size / 1024
+    print(f"{name}: {len(df)} rows, {csv_kb:.0f} KB -> {parquet_path.name} {parquet_kb:.0f} KB")
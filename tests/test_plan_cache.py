@@ -0,0 +1,46 @@
+"""PlanCache must not reuse a plan for a question that means something else."""
+
+from app_v2.claude_agent import PlanCache
+
+PLAN = '{"steps": [{"tool": "get_city_summary", "params": {"mesto": "Košice"}}]}'
+
+CITY_PROMPT = (
+    "Aké sú hlavné problémy s personálom v meste {city} a ktoré lekárne tam "
+    "majú najvyššie ohrozené tržby a nízku produktivitu"
+)
+STAFFING_PROMPT = (
+    "Ukáž mi všetky {staffing} lekárne v regióne RR11 zoradené podľa "
+    "ohrozených tržieb a navrhni konkrétne kroky pre regionálneho manažéra"
+)
+
+
+def test_identical_question_hits():
+    cache = PlanCache()
+    cache.put(CITY_PROMPT.format(city="Košice"), PLAN)
+    # Case, diacritics and punctuation are normalized away
+    prompt = CITY_PROMPT.format(city="KOSICE").replace("Aké", "ake") + "?"
+    assert cache.get(prompt) == PLAN
+
+
+def test_region_code_case_hits():
+    cache = PlanCache()
+    cache.put("Súhrn za RR11", PLAN)
+    assert cache.get("Súhrn za rr11") == PLAN
+
+
+def test_city_swap_misses():
+    cache = PlanCache()
+    cache.put(CITY_PROMPT.format(city="Košice"), PLAN)
+    assert cache.get(CITY_PROMPT.format(city="Nitra")) is None
+
+
+def test_antonym_swap_misses():
+    cache = PlanCache()
+    cache.put(STAFFING_PROMPT.format(staffing="poddimenzované"), PLAN)
+    assert cache.get(STAFFING_PROMPT.format(staffing="naddimenzované")) is None
+
+
+def test_region_swap_misses():
+    cache = PlanCache()
+    cache.put(STAFFING_PROMPT.format(staffing="poddimenzované"), PLAN)
+    assert cache.get(STAFFING_PROMPT.format(staffing="poddimenzované").replace("RR11", "RR12")) is None